@@ -4,14 +4,31 @@ Chart Data API endpoints for managing user analytics data.
 This module provides endpoints for saving and retrieving user chart data
 from Supabase, supporting the frontend dashboard functionality.
 """
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from core.chart_schema import STRICT, ChartData, validate_chart_data, validate_chart_data_patch
+from core.circuit_breaker import CircuitOpenError
+from core.compression import negotiate_encoding, precompress
+from core.config import get_settings
 from core.db import get_db_client
+from core.defaults import DEFAULT_CHART_DATA, DEFAULT_CHART_ETAG, DEFAULT_CHART_RESPONSE_BYTES
+from core.serialization import decode_json, json_body, read_body, validation_errors
+from core.series import window_series
+from core.tracing import TracedRoute
+from core.utils import compute_etag, encoding_etag, etag_matches, matching_etag, encode_cursor, decode_cursor
+from helper.json_patch import apply_json_patch, JsonPatchError
 import logging
+import math
+import orjson
+import re
+import uuid
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # =============================================================================
 # PYDANTIC MODELS
@@ -19,35 +36,73 @@ logger = logging.getLogger(__name__)
 
 class ChartDataRequest(BaseModel):
     """Request model for chart data operations."""
+    model_config = STRICT
     email: str
-    chart_data: Dict[str, Any]
+    chart_data: ChartData
 
 class ChartDataResponse(BaseModel):
     """Response model for chart data retrieval."""
+    # No route declares it, so its schema is built on first use
+    model_config = ConfigDict(defer_build=True)
     email: str
-    chart_data: Dict[str, Any]
+    chart_data: ChartData
     is_existing: bool
     created_at: str
     updated_at: str
 
 class UserChartDataResponse(BaseModel):
     """Response model for user chart data with defaults."""
-    data: Dict[str, Any]
+    data: ChartData
     is_existing: bool
 
-# Default chart data structure
-DEFAULT_CHART_DATA = {
-    "daily_call_volume": [45, 52, 48, 61, 55, 67, 59],
-    "average_call_duration": [120, 135, 142, 128, 151, 139, 145],
-    "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
-    "agent_performance": [
-        {"name": "Agent Alpha", "calls": 245, "rating": 4.8},
-        {"name": "Agent Beta", "calls": 189, "rating": 4.6},
-        {"name": "Agent Gamma", "calls": 167, "rating": 4.7},
-        {"name": "Agent Delta", "calls": 203, "rating": 4.5}
-    ],
-    "conversion_rate": [72, 68, 75, 71, 79, 74, 77]
-}
+class BatchGetRequest(BaseModel):
+    """Request model for reading many users' chart data."""
+    emails: List[str] = Field(..., min_length=1, max_length=settings.CHART_BATCH_MAX_ITEMS)
+
+class BatchUpsertRequest(BaseModel):
+    """Request model for saving many users' chart data."""
+    model_config = STRICT
+    items: List[ChartDataRequest] = Field(..., min_length=1, max_length=settings.CHART_BATCH_MAX_ITEMS)
+
+# Browsers must revalidate with If-None-Match before reusing a cached copy
+CHART_DATA_CACHE_CONTROL = "private, no-cache"
+
+# Marks a response built from the last known copy while the database is unavailable
+STALE_HEADERS = {"Warning": '110 - "Response is Stale"', "X-Data-Stale": "true"}
+
+
+def database_unavailable(error: Exception) -> HTTPException:
+    """
+    Build the 503 for a request the database cannot serve right now.
+    
+    Args:
+        error: The database failure, e.g. CircuitOpenError
+        
+    Returns:
+        HTTPException with Retry-After set when the circuit breaker is open
+    """
+    headers = None
+    if isinstance(error, CircuitOpenError):
+        headers = {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    return HTTPException(status_code=503, detail="Chart data is temporarily unavailable", headers=headers)
+
+# The default body never changes, so compress it once per encoding
+DEFAULT_CHART_RESPONSE_VARIANTS = (
+    precompress(DEFAULT_CHART_RESPONSE_BYTES) if settings.COMPRESSION_ENABLED else {}
+)
+
+# Media types accepted by PATCH /chart-data/{email}
+MERGE_PATCH_MEDIA_TYPE = "application/merge-patch+json"
+JSON_PATCH_MEDIA_TYPE = "application/json-patch+json"
+
+# Attempts for a JSON Patch without If-Match that races another writer
+JSON_PATCH_MAX_ATTEMPTS = 3
+
+# Streaming format for the admin user listing
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Shape of a PostgREST timestamptz value embedded in listing cursors
+TIMESTAMP_PATTERN = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}[T ][0-9:.]+(Z|[+-][0-9:]+)?$")
 
 # =============================================================================
 # ENDPOINTS
@@ -56,52 +111,166 @@ DEFAULT_CHART_DATA = {
 @router.get("/chart-data/{email}", response_model=UserChartDataResponse)
 async def get_user_chart_data(
     email: str,
+    request: Request,
+    start: Optional[int] = Query(None, alias="from"),
+    stop: Optional[int] = Query(None, alias="to"),
+    points: Optional[int] = Query(None, ge=1),
     db_client = Depends(get_db_client)
 ):
     """
     Get user's chart data from Supabase.
     
+    Responses carry a strong ETag derived from the row's ``updated_at``.
+    A matching ``If-None-Match`` is answered with 304 from the cache or a
+    ``select("updated_at")`` without fetching the chart data itself.
+    
+    ``from`` and ``to`` select a range of every series field
+    (CHART_SERIES_FIELDS) as slice indices, so ``from=-30`` returns the
+    last 30 points. ``points`` then downsamples each range to at most that
+    many bucket means.
+    
+    If the database cannot be read, the last known copy of the user's data
+    is served with ``Warning`` and ``X-Data-Stale`` headers; without one
+    the request fails with 503 rather than returning the default dataset,
+    which a client could save over the user's real data.
+    
     Args:
         email: User's email address
+        request: The incoming request
+        start: First point of each series (``from``; negative counts from the end)
+        stop: Point to stop before (``to``)
+        points: Maximum number of points per series
         db_client: Database client instance
         
     Returns:
         Chart data (either saved or default) with existence flag
+        
+    Raises:
+        HTTPException: 503 if the database is unavailable and no copy is known
     """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        try:
+            version = await db_client.get_user_chart_version(email)
+            etag = compute_etag(email, version) if version else DEFAULT_CHART_ETAG
+            matched = matching_etag(if_none_match, etag)
+            if matched is not None:
+                # Echo the client's ETag, which names its encoding
+                return Response(
+                    status_code=304,
+                    headers={"ETag": matched, "Cache-Control": CHART_DATA_CACHE_CONTROL}
+                )
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error(f"Error checking chart data version for {email}: {str(e)}")
+    
     try:
         # Query user's chart data
         user_data = await db_client.get_user_chart_data(email)
-        
-        if user_data:
-            # User has existing data
-            return UserChartDataResponse(
-                data=user_data["chart_data"],
-                is_existing=True
-            )
-        else:
-            # Return default data for new user
-            return UserChartDataResponse(
-                data=DEFAULT_CHART_DATA,
-                is_existing=False
-            )
-            
     except Exception as e:
-        logger.error(f"Error fetching chart data for {email}: {str(e)}")
-        # Return default data on error
-        return UserChartDataResponse(
-            data=DEFAULT_CHART_DATA,
-            is_existing=False
+        raise database_unavailable(e)
+    
+    if not user_data:
+        # Return default data for new user
+        return _default_chart_response(request, window=(start, stop, points))
+    
+    headers = {
+        "ETag": compute_etag(email, user_data["updated_at"]),
+        "Cache-Control": CHART_DATA_CACHE_CONTROL
+    }
+    if user_data.get("stale"):
+        headers.update(STALE_HEADERS)
+        matched = matching_etag(if_none_match, headers["ETag"])
+        if matched is not None:
+            return Response(status_code=304, headers={**headers, "ETag": matched})
+    
+    # Stored data was validated on write, so skip response_model
+    # re-validation and encode it straight to bytes
+    chart_data = _window_chart_data(user_data["chart_data"], start, stop, points)
+    return Response(
+        content=orjson.dumps({"data": chart_data, "is_existing": True}),
+        media_type="application/json",
+        headers=headers
+    )
+
+
+def _window_chart_data(
+    chart_data: Dict[str, Any],
+    start: Optional[int],
+    stop: Optional[int],
+    points: Optional[int]
+) -> Dict[str, Any]:
+    """
+    Apply a range and downsampling request to every series of a document.
+    
+    Args:
+        chart_data: Stored chart data document
+        start: First point of each series
+        stop: Point to stop before
+        points: Maximum number of points per series
+        
+    Returns:
+        The document with each series windowed (unchanged without parameters)
+    """
+    if start is None and stop is None and points is None:
+        return chart_data
+    windowed = dict(chart_data)
+    for field in settings.CHART_SERIES_FIELDS:
+        if isinstance(windowed.get(field), list):
+            windowed[field] = window_series(windowed[field], start, stop, points)
+    return windowed
+
+
+def _default_chart_response(
+    request: Request,
+    window: Tuple[Optional[int], Optional[int], Optional[int]]
+) -> Response:
+    """
+    Build the response for users without saved data from pre-encoded bytes.
+    
+    Clients accepting a compressed encoding get the precompressed body,
+    which the compression middleware passes through as it is. Windowed
+    requests are encoded per request instead.
+    
+    Args:
+        request: The incoming request, for Accept-Encoding
+        window: The ``from``, ``to`` and ``points`` query parameters
+        
+    Returns:
+        Response carrying the serialized default chart data
+    """
+    headers = {"ETag": DEFAULT_CHART_ETAG, "Cache-Control": CHART_DATA_CACHE_CONTROL}
+    if any(param is not None for param in window):
+        chart_data = _window_chart_data(DEFAULT_CHART_DATA, *window)
+        return Response(
+            content=orjson.dumps({"data": chart_data, "is_existing": False}),
+            media_type="application/json",
+            headers=headers
         )
+    content = DEFAULT_CHART_RESPONSE_BYTES
+    if DEFAULT_CHART_RESPONSE_VARIANTS:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), DEFAULT_CHART_RESPONSE_VARIANTS)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            headers["ETag"] = encoding_etag(DEFAULT_CHART_ETAG, encoding)
+            content = DEFAULT_CHART_RESPONSE_VARIANTS[encoding]
+    return Response(content=content, media_type="application/json", headers=headers)
 
 
 @router.post("/chart-data", response_model=Dict[str, Any])
 async def save_user_chart_data(
-    request: ChartDataRequest,
+    request: ChartDataRequest = Depends(json_body(ChartDataRequest, settings.CHART_DATA_MAX_BODY_BYTES)),
     db_client = Depends(get_db_client)
 ):
     """
     Save or update user's chart data in Supabase.
     
+    The body is validated against the ChartData schema in one pass over
+    the raw bytes. Bodies over CHART_DATA_MAX_BODY_BYTES are refused with
+    413 before they are parsed; invalid documents get 422.
+    
     Args:
         request: Chart data request with email and data
         db_client: Database client instance
@@ -111,22 +280,270 @@ async def save_user_chart_data(
     """
     try:
         # Save chart data using the database client
-        success = await db_client.save_chart_data(request.email, request.chart_data)
+        updated_at = await db_client.save_chart_data(request.email, request.chart_data)
         
-        if success:
+        if updated_at:
             return {
                 "success": True,
                 "message": "Chart data saved successfully",
-                "email": request.email
+                "email": request.email,
+                "updated_at": updated_at
             }
         else:
             raise HTTPException(status_code=500, detail="Failed to save chart data")
         
+    except CircuitOpenError as e:
+        raise database_unavailable(e)
     except Exception as e:
         logger.error(f"Error saving chart data for {request.email}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to save chart data: {str(e)}")
 
 
+@router.post("/chart-data/batch-get", response_model=Dict[str, Any])
+async def batch_get_chart_data(
+    request: BatchGetRequest,
+    db_client = Depends(get_db_client)
+):
+    """
+    Get chart data for many users in one request.
+    
+    Users without saved data get the default dataset, exactly like the
+    single-user endpoint.
+    
+    Args:
+        request: Batch request with the users' emails
+        db_client: Database client instance
+        
+    Returns:
+        Per-email results in request order with data and existence flag
+    """
+    try:
+        rows = await db_client.get_many_chart_data(request.emails)
+        
+    except CircuitOpenError as e:
+        raise database_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error batch fetching chart data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch chart data: {str(e)}")
+    
+    results = []
+    for email in request.emails:
+        row = rows.get(email)
+        results.append({
+            "email": email,
+            "status": "found" if row else "default",
+            "data": row["chart_data"] if row else DEFAULT_CHART_DATA,
+            "is_existing": row is not None
+        })
+    
+    # Stored data was validated on write, so skip response_model serialization
+    return ORJSONResponse(content={
+        "success": True,
+        "results": results
+    })
+
+
+@router.post("/chart-data/batch-upsert", response_model=Dict[str, Any])
+async def batch_upsert_chart_data(
+    request: BatchUpsertRequest = Depends(json_body(BatchUpsertRequest, settings.CHART_BATCH_MAX_BODY_BYTES)),
+    db_client = Depends(get_db_client)
+):
+    """
+    Save chart data for many users with a single multi-row upsert.
+    
+    The upsert is atomic, so a database failure fails the whole batch. If
+    an email appears more than once, its last item is saved and the
+    earlier ones are reported as ``superseded``. Every item is validated
+    against the ChartData schema; bodies over CHART_BATCH_MAX_BODY_BYTES
+    are refused with 413.
+    
+    Args:
+        request: Batch request with email and chart data items
+        db_client: Database client instance
+        
+    Returns:
+        Per-item save status in request order
+    """
+    # Postgres rejects an upsert that touches the same row twice
+    latest = {item.email: index for index, item in enumerate(request.items)}
+    items = {item.email: item.chart_data for item in request.items}
+    
+    try:
+        saved = await db_client.save_many_chart_data(items)
+        
+    except CircuitOpenError as e:
+        raise database_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error batch saving chart data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to save chart data: {str(e)}")
+    
+    results = []
+    for index, item in enumerate(request.items):
+        if latest[item.email] != index:
+            results.append({"email": item.email, "status": "superseded"})
+        elif item.email in saved:
+            results.append({"email": item.email, "status": "saved", "updated_at": saved[item.email]})
+        else:
+            results.append({"email": item.email, "status": "error", "error": "No data returned"})
+    
+    return {
+        "success": len(saved) == len(items),
+        "saved": len(saved),
+        "results": results
+    }
+
+
+@router.patch("/chart-data/{email}", response_model=Dict[str, Any])
+async def patch_user_chart_data(
+    email: str,
+    request: Request,
+    response: Response,
+    db_client = Depends(get_db_client)
+):
+    """
+    Partially update user's chart data.
+    
+    Accepts an RFC 7396 merge patch (``application/merge-patch+json``),
+    which is applied inside Postgres, or an RFC 6902 JSON Patch
+    (``application/json-patch+json``). Send the ETag from a previous GET in
+    ``If-Match`` to reject the patch with 412 if the data changed since.
+    
+    Merge patches are validated against the ChartData schema before they
+    are sent to the database; JSON Patches are applied here and the
+    resulting document is validated. Either fails with 422.
+    
+    Args:
+        email: User's email address
+        request: The incoming request carrying the patch document
+        response: Response used to attach the new ETag
+        db_client: Database client instance
+        
+    Returns:
+        Success response with the new ``updated_at``
+    """
+    body = await read_body(request, settings.CHART_DATA_MAX_BODY_BYTES)
+    try:
+        patch = decode_json(body)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Patch body must be valid JSON")
+    
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    is_json_patch = media_type == JSON_PATCH_MEDIA_TYPE or (
+        media_type != MERGE_PATCH_MEDIA_TYPE and isinstance(patch, list)
+    )
+    if_match = request.headers.get("if-match")
+    
+    try:
+        if is_json_patch:
+            updated_at = await _apply_json_patch(db_client, email, patch, if_match)
+        else:
+            if not isinstance(patch, dict):
+                raise HTTPException(status_code=400, detail="Merge patch must be a JSON object")
+            try:
+                patch = validate_chart_data_patch(patch)
+            except ValidationError as e:
+                raise RequestValidationError(validation_errors(e))
+            updated_at = await _apply_merge_patch(db_client, email, patch, if_match)
+        
+        response.headers["ETag"] = compute_etag(email, updated_at)
+        return {
+            "success": True,
+            "message": "Chart data updated successfully",
+            "email": email,
+            "updated_at": updated_at
+        }
+        
+    except (HTTPException, RequestValidationError):
+        raise
+    except CircuitOpenError as e:
+        raise database_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error patching chart data for {email}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to patch chart data: {str(e)}")
+
+
+async def _current_version(db_client, email: str, if_match: Optional[str]) -> str:
+    """
+    Get the row version a patch applies to, checking If-Match if present.
+    
+    Args:
+        db_client: Database client instance
+        email: User's email address
+        if_match: Raw If-Match header value, if any
+        
+    Returns:
+        The row's current ``updated_at``
+        
+    Raises:
+        HTTPException: 404 if the user has no data, 412 if the ETag is stale
+    """
+    version = await db_client.get_user_chart_version(email)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"No chart data for {email}")
+    if if_match and not etag_matches(if_match, compute_etag(email, version), weak=False):
+        raise HTTPException(status_code=412, detail="Chart data was modified since it was read")
+    return version
+
+
+async def _apply_merge_patch(
+    db_client,
+    email: str,
+    patch: Dict[str, Any],
+    if_match: Optional[str]
+) -> str:
+    """
+    Apply a merge patch server-side, honouring If-Match.
+    
+    Returns:
+        The new ``updated_at``
+    """
+    expected = await _current_version(db_client, email, if_match) if if_match else None
+    updated_at = await db_client.merge_patch_chart_data(email, patch, expected)
+    if updated_at:
+        return updated_at
+    
+    # Nothing matched: either the row is gone or If-Match went stale
+    await _current_version(db_client, email, None)
+    raise HTTPException(status_code=412, detail="Chart data was modified since it was read")
+
+
+async def _apply_json_patch(
+    db_client,
+    email: str,
+    operations: List[Dict[str, Any]],
+    if_match: Optional[str]
+) -> str:
+    """
+    Apply a JSON Patch with a conditional update on ``updated_at``.
+    
+    Without If-Match, a write that races another writer is retried on the
+    fresh document a few times before giving up with 409.
+    
+    Returns:
+        The new ``updated_at``
+    """
+    for _ in range(JSON_PATCH_MAX_ATTEMPTS):
+        version = await _current_version(db_client, email, if_match)
+        user_data = await db_client.get_user_chart_data(email, allow_stale=False)
+        
+        if user_data and user_data["updated_at"] == version:
+            try:
+                patched = validate_chart_data(apply_json_patch(user_data["chart_data"], operations))
+            except JsonPatchError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            except ValidationError as e:
+                raise RequestValidationError(validation_errors(e))
+            
+            updated_at = await db_client.update_chart_data_if_unmodified(email, patched, version)
+            if updated_at:
+                return updated_at
+        
+        if if_match:
+            raise HTTPException(status_code=412, detail="Chart data was modified since it was read")
+    
+    raise HTTPException(status_code=409, detail="Chart data kept changing, please retry")
+
+
 @router.delete("/chart-data/{email}")
 async def delete_user_chart_data(
     email: str,
@@ -143,8 +560,7 @@ async def delete_user_chart_data(
         Success response
     """
     try:
-        client = db_client.get_client()
-        client.table("chart_data").delete().eq("email", email).execute()
+        await db_client.delete_user_chart_data(email)
         
         return {
             "success": True,
@@ -152,32 +568,135 @@ async def delete_user_chart_data(
             "email": email
         }
         
+    except CircuitOpenError as e:
+        raise database_unavailable(e)
     except Exception as e:
         logger.error(f"Error deleting chart data for {email}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to delete chart data: {str(e)}")
 
 
+def _decode_user_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode and validate a user listing cursor.
+    
+    Args:
+        cursor: Opaque cursor from a previous page
+        
+    Returns:
+        Tuple of the last row's ``updated_at`` and ``id``
+        
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        updated_at, row_id = decode_cursor(cursor, 2)
+        if not isinstance(updated_at, str) or not TIMESTAMP_PATTERN.match(updated_at):
+            raise ValueError("Invalid cursor")
+        return updated_at, str(uuid.UUID(str(row_id)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _user_cursor(row: Dict[str, Any]) -> str:
+    """Build the cursor pointing just past a listed row."""
+    return encode_cursor(row["updated_at"], row["id"])
+
+
 @router.get("/chart-data")
-async def list_all_users(db_client = Depends(get_db_client)):
+async def list_all_users(
+    request: Request,
+    limit: int = Query(settings.ADMIN_LIST_DEFAULT_LIMIT, ge=1, le=settings.ADMIN_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    count: str = Query("estimated", pattern="^(exact|planned|estimated|none)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db_client = Depends(get_db_client)
+):
     """
-    List all users with chart data (for admin purposes).
+    List users with chart data (for admin purposes).
+    
+    Results are keyset-paginated on ``(updated_at, id)``: pass the
+    ``next_cursor`` of one page as ``cursor`` to get the next. The first
+    page returns the total row count in ``X-Total-Count``. With ``format=ndjson`` (or
+    ``Accept: application/x-ndjson``) every remaining page is streamed as
+    newline-delimited JSON, ``limit`` rows per query, in constant memory.
     
     Args:
+        request: The incoming request
+        limit: Page size
+        cursor: Cursor returned by the previous page
+        count: PostgREST count method, or "none" to skip counting
+        format: "json" for one page, "ndjson" to stream all pages
         db_client: Database client instance
         
     Returns:
-        List of users with their basic info
+        One page of users with the next cursor, or an NDJSON stream
     """
+    after = _decode_user_cursor(cursor) if cursor else None
+    # Only the first page pays for counting; later pages reuse its total
+    count_method = None if count == "none" or after else count
+    stream = format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    
     try:
-        client = db_client.get_client()
-        response = client.table("chart_data").select("email, created_at, updated_at").execute()
-        
-        return {
-            "success": True,
-            "users": response.data,
-            "total": len(response.data) if response.data else 0
-        }
+        # Fetch one extra row to know whether another page follows
+        page_size = limit if stream else limit + 1
+        users, total = await db_client.list_users_page(page_size, after, count_method)
         
+    except CircuitOpenError as e:
+        raise database_unavailable(e)
     except Exception as e:
         logger.error(f"Error listing users: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to list users: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to list users: {str(e)}")
+    
+    headers = {"X-Total-Count": str(total)} if total is not None else {}
+    
+    if stream:
+        return StreamingResponse(
+            _stream_users(db_client, users, limit),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers
+        )
+    
+    has_more = len(users) > limit
+    users = users[:limit]
+    return ORJSONResponse(
+        content={
+            "success": True,
+            "users": users,
+            "total": total,
+            "next_cursor": _user_cursor(users[-1]) if has_more else None
+        },
+        headers=headers
+    )
+
+
+async def _stream_users(
+    db_client,
+    first_page: List[Dict[str, Any]],
+    limit: int
+) -> AsyncIterator[bytes]:
+    """
+    Yield users as NDJSON lines, fetching the following pages lazily.
+    
+    Args:
+        db_client: Database client instance
+        first_page: The already fetched first page
+        limit: Page size for the following queries
+        
+    Yields:
+        One encoded JSON line per user
+    """
+    page = first_page
+    while page:
+        for row in page:
+            yield orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+        if len(page) < limit:
+            return
+        try:
+            page, _ = await db_client.list_users_page(
+                limit, (page[-1]["updated_at"], page[-1]["id"])
+            )
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error streaming users: {str(e)}")
+            yield orjson.dumps({"error": "Failed to list users"}, option=orjson.OPT_APPEND_NEWLINE)
+            return
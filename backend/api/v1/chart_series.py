@@ -0,0 +1,364 @@
+"""
+Chart series API endpoints.
+
+This module serves single chart series and the aggregated views the
+dashboard charts plot from them (bucket statistics, rolling means and
+LTTB downsampling), so long series do not have to be shipped to and
+reduced in the browser.
+
+Aggregates are computed on a memo miss only. Ranges of at least
+CHART_SERIES_THREAD_MIN_POINTS points are computed and encoded on a
+pool of CHART_SERIES_THREADS threads, so a large LTTB or percentile
+computation does not stall every other request on the event loop. LTTB
+holds the GIL for most of its run, so a small pool leaves the event loop
+its share of the interpreter.
+
+``from`` and ``to`` select a range of the series as slice indices, as on
+GET /chart-data/{email}. Indices in responses are positions in the full
+series.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from core.cache import MemoryCacheBackend, ReadThroughCache, TTLCache
+from core.config import get_settings
+from core.db import get_db_client
+from core.defaults import DEFAULT_CHART_DATA, DEFAULT_CHART_ETAG
+from core.logger import get_logger
+from core.tracing import TracedRoute
+from core.utils import compute_etag, matching_etag
+from helper.series_aggregation import (
+    SeriesAggregationError, as_float_array, bucket_stats, lttb, parse_stats, rolling_mean
+)
+from .chart_data import CHART_DATA_CACHE_CONTROL, STALE_HEADERS, database_unavailable
+import orjson
+
+router = APIRouter(route_class=TracedRoute)
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Encoded aggregate bodies, keyed by the row's updated_at: a save makes
+# earlier entries unreachable, so nothing needs invalidating and the TTL
+# and size bounds reclaim them
+series_memo = ReadThroughCache(MemoryCacheBackend(TTLCache(
+    max_entries=settings.CHART_SERIES_MEMO_MAX_ENTRIES,
+    max_bytes=settings.CHART_SERIES_MEMO_MAX_BYTES,
+    ttl_seconds=settings.CHART_SERIES_MEMO_TTL_SECONDS,
+    negative_ttl_seconds=0
+)), name="chart_series")
+
+# Aggregations of long ranges run here rather than on the event loop
+series_executor = ThreadPoolExecutor(max_workers=settings.CHART_SERIES_THREADS, thread_name_prefix="chart-series")
+
+FromQuery = Query(None, alias="from")
+ToQuery = Query(None, alias="to")
+
+
+class _Series:
+    """A requested range of one user's series and the version it was read at."""
+
+    __slots__ = ("email", "name", "version", "etag", "values", "start", "stop", "stale")
+
+    def __init__(
+        self,
+        email: str,
+        name: str,
+        version: str,
+        etag: str,
+        values: List[Any],
+        start: int,
+        stop: int,
+        stale: bool = False
+    ):
+        self.email = email
+        self.name = name
+        self.version = version
+        self.etag = etag
+        self.values = values
+        self.start = start
+        self.stop = stop
+        self.stale = stale
+
+    @property
+    def window(self) -> List[Any]:
+        """The selected range."""
+        return self.values[self.start:self.stop]
+
+    def body(self, **fields: Any) -> Dict[str, Any]:
+        """Build a response body with the fields common to every view."""
+        return {"name": self.name, "total": len(self.values), "start": self.start, **fields}
+
+
+async def _load_series(
+    db_client,
+    email: str,
+    name: str,
+    start: Optional[int],
+    stop: Optional[int]
+) -> _Series:
+    """
+    Read a user's series, falling back to the default dataset.
+
+    Args:
+        db_client: Database client instance
+        email: User's email address
+        name: Series field name (one of CHART_SERIES_FIELDS)
+        start: ``from`` slice index
+        stop: ``to`` slice index
+
+    Returns:
+        The series with its range resolved to absolute indices
+
+    Raises:
+        HTTPException: 404 if the name is not a series field or the stored
+            value is not a list, 503 if the database is unavailable and no
+            copy of the user's data is known
+    """
+    if name not in settings.CHART_SERIES_FIELDS:
+        raise HTTPException(status_code=404, detail=f"Unknown series: {name}")
+
+    try:
+        user_data = await db_client.get_user_chart_data(email)
+    except Exception as e:
+        raise database_unavailable(e)
+    if user_data:
+        chart_data, version = user_data["chart_data"], user_data["updated_at"]
+        etag = compute_etag(email, version)
+    else:
+        chart_data, version, etag = DEFAULT_CHART_DATA, "default", DEFAULT_CHART_ETAG
+
+    values = chart_data.get(name)
+    if not isinstance(values, list):
+        raise HTTPException(status_code=404, detail=f"No series {name} for {email}")
+
+    first, last, _ = slice(start, stop).indices(len(values))
+    stale = bool(user_data and user_data.get("stale"))
+    return _Series(email, name, version, etag, values, first, max(first, last), stale)
+
+
+async def _series_response(
+    request: Request,
+    series: _Series,
+    view: str,
+    params: Tuple[Any, ...],
+    compute: Optional[Callable[[], Dict[str, Any]]] = None,
+    body: Optional[Dict[str, Any]] = None
+) -> Response:
+    """
+    Answer with 304, a memoized aggregate, or a freshly computed body.
+
+    Args:
+        request: The incoming request, for If-None-Match
+        series: The loaded series
+        view: Name of the view, part of the memo key
+        params: View parameters, part of the memo key
+        compute: Builds the body on a memo miss (memoized views)
+        body: The body itself (views cheap enough not to memoize)
+
+    Returns:
+        Response with the series ETag
+
+    Raises:
+        HTTPException: 404 if the series does not hold only numbers
+    """
+    headers = {"ETag": series.etag, "Cache-Control": CHART_DATA_CACHE_CONTROL}
+    if series.stale:
+        headers.update(STALE_HEADERS)
+    matched = matching_etag(request.headers.get("if-none-match"), series.etag)
+    if matched is not None:
+        return Response(status_code=304, headers={**headers, "ETag": matched})
+
+    if body is not None:
+        content = orjson.dumps(body)
+    else:
+        key = repr((series.email, series.name, series.version, view, series.start, series.stop, params))
+        try:
+            content = await series_memo.get_or_load(key, _as_loader(compute, series.stop - series.start))
+        except SeriesAggregationError as e:
+            raise HTTPException(status_code=404, detail=f"No numeric series {series.name}: {e}")
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _as_loader(compute: Callable[[], Dict[str, Any]], points: int) -> Callable[[], Awaitable[bytes]]:
+    """
+    Wrap a synchronous computation as a cache loader of encoded bodies.
+
+    Args:
+        compute: Builds the response body
+        points: Length of the range it aggregates; at least
+            CHART_SERIES_THREAD_MIN_POINTS runs it on a worker thread
+
+    Returns:
+        Coroutine factory returning the encoded body
+    """
+    def encode() -> bytes:
+        return orjson.dumps(compute())
+
+    async def loader() -> bytes:
+        if points >= settings.CHART_SERIES_THREAD_MIN_POINTS:
+            return await asyncio.get_running_loop().run_in_executor(series_executor, encode)
+        return encode()
+    return loader
+
+
+# =============================================================================
+# API ENDPOINTS
+# =============================================================================
+
+@router.get("/chart-data/{email}/series/{name}")
+async def get_series(
+    email: str,
+    name: str,
+    request: Request,
+    start: Optional[int] = FromQuery,
+    stop: Optional[int] = ToQuery,
+    db_client = Depends(get_db_client)
+):
+    """
+    Get a range of one series as raw points.
+
+    Args:
+        email: User's email address
+        name: Series field name
+        request: The incoming request
+        start: First point (``from``; negative counts from the end)
+        stop: Point to stop before (``to``)
+        db_client: Database client instance
+
+    Returns:
+        The series name, its total length, the range start and the points
+    """
+    series = await _load_series(db_client, email, name, start, stop)
+    return await _series_response(request, series, "raw", (), body=series.body(values=series.window))
+
+
+@router.get("/chart-data/{email}/series/{name}/buckets")
+async def get_series_buckets(
+    email: str,
+    name: str,
+    request: Request,
+    start: Optional[int] = FromQuery,
+    stop: Optional[int] = ToQuery,
+    buckets: int = Query(100, ge=1, le=settings.CHART_SERIES_MAX_POINTS),
+    stats: str = Query("mean", max_length=200),
+    db_client = Depends(get_db_client)
+):
+    """
+    Get statistics per equal-width bucket of a series range.
+
+    Args:
+        email: User's email address
+        name: Series field name
+        request: The incoming request
+        start: First point (``from``; negative counts from the end)
+        stop: Point to stop before (``to``)
+        buckets: Number of buckets (fewer if the range is shorter)
+        stats: Comma-separated statistics: sum, mean, min, max, count and
+            percentiles such as p50 or p95
+        db_client: Database client instance
+
+    Returns:
+        Each bucket's first index in ``x`` and one list per statistic
+
+    Raises:
+        HTTPException: 400 for an unknown statistic
+    """
+    try:
+        names = parse_stats(stats)
+    except SeriesAggregationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    series = await _load_series(db_client, email, name, start, stop)
+
+    def compute() -> Dict[str, Any]:
+        if series.start == series.stop:
+            return series.body(x=[], stats={stat: [] for stat in names})
+        values = as_float_array(series.window)
+        starts, results = bucket_stats(values, buckets, names)
+        return series.body(
+            x=(starts + series.start).tolist(),
+            stats={stat: results[stat].tolist() for stat in names}
+        )
+
+    return await _series_response(request, series, "buckets", (buckets, tuple(names)), compute)
+
+
+@router.get("/chart-data/{email}/series/{name}/rolling")
+async def get_series_rolling(
+    email: str,
+    name: str,
+    request: Request,
+    start: Optional[int] = FromQuery,
+    stop: Optional[int] = ToQuery,
+    window: int = Query(7, ge=1, le=settings.CHART_SERIES_MAX_POINTS),
+    db_client = Depends(get_db_client)
+):
+    """
+    Get the trailing rolling mean of a series range.
+
+    Windows reach back before ``from`` when earlier points exist, so a
+    range shows the same values as the full series.
+
+    Args:
+        email: User's email address
+        name: Series field name
+        request: The incoming request
+        start: First point (``from``; negative counts from the end)
+        stop: Point to stop before (``to``)
+        window: Points per window
+        db_client: Database client instance
+
+    Returns:
+        One rolling mean per point of the range
+    """
+    series = await _load_series(db_client, email, name, start, stop)
+
+    def compute() -> Dict[str, Any]:
+        lead = max(0, series.start - window + 1)
+        values = as_float_array(series.values[lead:series.stop])
+        means = rolling_mean(values, window)[series.start - lead:] if len(values) else values
+        return series.body(window=window, values=means.tolist())
+
+    return await _series_response(request, series, "rolling", (window,), compute)
+
+
+@router.get("/chart-data/{email}/series/{name}/lttb")
+async def get_series_lttb(
+    email: str,
+    name: str,
+    request: Request,
+    start: Optional[int] = FromQuery,
+    stop: Optional[int] = ToQuery,
+    points: int = Query(500, ge=3, le=settings.CHART_SERIES_MAX_POINTS),
+    db_client = Depends(get_db_client)
+):
+    """
+    Downsample a series range to a point count with LTTB.
+
+    Unlike bucket means, Largest-Triangle-Three-Buckets keeps actual points
+    and preserves the peaks and troughs a line chart should show.
+
+    Args:
+        email: User's email address
+        name: Series field name
+        request: The incoming request
+        start: First point (``from``; negative counts from the end)
+        stop: Point to stop before (``to``)
+        points: Maximum number of points to return
+        db_client: Database client instance
+
+    Returns:
+        The kept points' indices in ``x`` and their values
+    """
+    series = await _load_series(db_client, email, name, start, stop)
+
+    def compute() -> Dict[str, Any]:
+        window = series.window
+        indices = lttb(as_float_array(window), points).tolist()
+        return series.body(
+            x=[series.start + i for i in indices],
+            values=[window[i] for i in indices]
+        )
+
+    return await _series_response(request, series, "lttb", (points,), compute)
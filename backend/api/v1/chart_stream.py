@@ -0,0 +1,198 @@
+"""
+Chart data stream API endpoint.
+
+GET /chart-data/{email}/stream keeps a Server-Sent Events connection open
+and pushes the user's chart data as it changes, so dashboards do not have
+to poll GET /chart-data/{email}. The first event is a snapshot of the
+current data; after that the stream carries only what each save, PATCH or
+delete changed (see core/chart_events.py for the event types).
+
+An idle stream costs no database queries: the snapshot is read once per
+connection, or not at all when the hub already holds the user's current
+document, and changes are pushed by the hub as the writes happen.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from core.chart_events import ChartEventHub, Subscription, encode_event, get_chart_event_hub
+from core.compression import EVENT_STREAM_TYPE
+from core.config import get_settings
+from core.db import get_db_client
+from core.defaults import DEFAULT_CHART_DATA
+from core.tracing import TracedRoute
+from .chart_data import database_unavailable
+
+router = APIRouter(route_class=TracedRoute)
+settings = get_settings()
+
+# Comment line sent when a stream has been idle for a heartbeat interval,
+# so proxies keep the connection open and dead clients are noticed
+HEARTBEAT_FRAME = b": ping\n\n"
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+async def _snapshot(
+    db_client,
+    hub: ChartEventHub,
+    email: str,
+    last_event_id: Optional[str]
+) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Build the snapshot event a new connection starts with.
+
+    The hub's copy of the document is used when it has one; otherwise the
+    row is read once and becomes the hub's base for later deltas (unless
+    it is a stale copy served while the database is unavailable).
+
+    Args:
+        db_client: Database client instance
+        hub: Chart event hub
+        email: User's email address
+        last_event_id: Last-Event-ID sent by a reconnecting client
+
+    Returns:
+        Tuple of the snapshot frame (None if the client already has this
+        version) and the version the client holds after it
+
+    Raises:
+        HTTPException: 503 if the database is unavailable and no copy is known
+    """
+    current = hub.current(email)
+    if current is not None:
+        document, version = current
+        body: Dict[str, Any] = {"data": document, "is_existing": True, "updated_at": version}
+    else:
+        try:
+            user_data = await db_client.get_user_chart_data(email)
+        except Exception as e:
+            raise database_unavailable(e)
+        if not user_data:
+            body = {"data": DEFAULT_CHART_DATA, "is_existing": False, "updated_at": None}
+            return encode_event("snapshot", body), None
+        version = user_data["updated_at"]
+        body = {"data": user_data["chart_data"], "is_existing": True, "updated_at": version}
+        if user_data.get("stale"):
+            body["stale"] = True
+        else:
+            hub.seed(email, user_data["chart_data"], version)
+
+    if last_event_id is not None and last_event_id == version:
+        return None, version
+    return encode_event("snapshot", body, version), version
+
+
+async def _event_stream(
+    hub: ChartEventHub,
+    subscription: Subscription,
+    first_frame: bytes,
+    version: Optional[str]
+) -> AsyncIterator[bytes]:
+    """
+    Yield the snapshot, then the user's events until the client leaves.
+
+    Args:
+        hub: Chart event hub
+        subscription: The connection's subscription, released on exit
+        first_frame: Reconnection delay and the snapshot, if any
+        version: Version of the data the client holds after the first frame
+
+    Yields:
+        Encoded SSE frames and heartbeats
+    """
+    try:
+        yield first_frame
+        # Idle streams should not keep their snapshot alive
+        del first_frame
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), settings.CHART_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_FRAME
+                continue
+            if item is None:
+                # Evicted for falling behind; the client reconnects and resyncs
+                yield encode_event("evicted", {"reason": "slow consumer"})
+                return
+            event_version, frame = item
+            # Events older than the snapshot were already included in it
+            if event_version is not None and version is not None and event_version <= version:
+                continue
+            version = event_version
+            yield frame
+    finally:
+        hub.unsubscribe(subscription)
+
+
+# =============================================================================
+# API ENDPOINTS
+# =============================================================================
+
+@router.get("/chart-data/{email}/stream")
+async def stream_chart_data(
+    email: str,
+    request: Request,
+    db_client = Depends(get_db_client),
+    hub: ChartEventHub = Depends(get_chart_event_hub)
+):
+    """
+    Stream a user's chart data changes as Server-Sent Events.
+
+    Events:
+
+    - ``snapshot``: ``{"data", "is_existing", "updated_at"}``, the whole
+      document; sent first, and whenever a delta cannot be expressed
+    - ``patch``: ``{"patch", "updated_at"}``, an RFC 7396 merge patch to
+      apply to the client's copy
+    - ``reload``: the data changed in a way the stream cannot express;
+      re-read it with GET /chart-data/{email}
+    - ``deleted``: the user's data was deleted
+    - ``evicted``: the client fell too far behind and the stream ends
+
+    Event ids are the row's ``updated_at``. A client reconnecting with a
+    ``Last-Event-ID`` equal to the current version is not sent the
+    snapshot again.
+
+    Args:
+        email: User's email address
+        request: The incoming request, for Last-Event-ID
+        db_client: Database client instance
+        hub: Chart event hub
+
+    Returns:
+        StreamingResponse of ``text/event-stream``
+
+    Raises:
+        HTTPException: 503 if the worker holds CHART_STREAM_MAX_CONNECTIONS
+            streams, or the database is unavailable and no copy is known
+    """
+    if hub.connections >= settings.CHART_STREAM_MAX_CONNECTIONS:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open chart data streams",
+            headers={"Retry-After": str(max(1, settings.CHART_STREAM_RETRY_MS // 1000))}
+        )
+
+    # Subscribe before reading, so a save made meanwhile is not missed
+    subscription = hub.subscribe(email)
+    try:
+        snapshot, version = await _snapshot(db_client, hub, email, request.headers.get("last-event-id"))
+    except BaseException:
+        hub.unsubscribe(subscription)
+        raise
+
+    first_frame = f"retry: {settings.CHART_STREAM_RETRY_MS}\n\n".encode()
+    if snapshot is not None:
+        first_frame += snapshot
+    return StreamingResponse(
+        _event_stream(hub, subscription, first_frame, version),
+        media_type=EVENT_STREAM_TYPE,
+        headers=STREAM_HEADERS
+    )
@@ -7,6 +7,9 @@ and registers them with the main API router.
 """
 from fastapi import APIRouter
 from .chart_data import router as chart_data_router
+from .chart_series import router as chart_series_router
+from .chart_stream import router as chart_stream_router
+from .webhook import router as webhook_router
 
 # Create the main v1 API router
 api_v1_router = APIRouter()
@@ -31,4 +34,23 @@ def initialize_v1_routes(app_router: APIRouter) -> None:
         chart_data_router,
         prefix="/api/v1",
         tags=["Chart Data"]
-    )
\ No newline at end of file
+    )
+    app_router.include_router(
+        chart_series_router,
+        prefix="/api/v1",
+        tags=["Chart Data"]
+    )
+    app_router.include_router(
+        chart_stream_router,
+        prefix="/api/v1",
+        tags=["Chart Data"]
+    )
+    
+    # =============================================================================
+    # WEBHOOK ENDPOINTS
+    # =============================================================================
+    app_router.include_router(
+        webhook_router,
+        prefix="/v1",
+        tags=["Webhooks"]
+    )
@@ -0,0 +1,131 @@
+"""
+Transaction webhook API endpoints.
+
+This module accepts transaction webhooks for background processing and
+reports the processing status of individual transactions.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from core.db import get_db_client
+from core.logger import get_logger
+from core.tracing import TracedRoute
+from core.utils import ResponseFormatter, compute_idempotency_key
+from helper.transaction_processor import get_transaction_processor
+
+router = APIRouter(route_class=TracedRoute)
+logger = get_logger(__name__)
+
+# Seconds a sender should wait before retrying a webhook rejected with 429
+QUEUE_FULL_RETRY_AFTER_SECONDS = 1
+
+# =============================================================================
+# PYDANTIC MODELS
+# =============================================================================
+
+class TransactionWebhookRequest(BaseModel):
+    """Request model for an incoming transaction webhook."""
+    transaction_id: str = Field(..., min_length=1, max_length=128)
+    source_account: str = Field(..., min_length=1, max_length=128)
+    destination_account: str = Field(..., min_length=1, max_length=128)
+    amount: float = Field(..., gt=0)
+    currency: str = Field(..., pattern=r"^[A-Z]{3}$")
+
+class TransactionStatusResponse(BaseModel):
+    """Response model for a transaction's processing status."""
+    transaction_id: str
+    source_account: str
+    destination_account: str
+    amount: float
+    currency: str
+    status: str
+    created_at: str
+    processed_at: Optional[str] = None
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+@router.post("/webhook/transaction", status_code=202, response_model=Dict[str, Any])
+async def receive_transaction_webhook(
+    request: TransactionWebhookRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    processor = Depends(get_transaction_processor)
+):
+    """
+    Accept a transaction webhook for background processing.
+    
+    The transaction is only validated and queued here; it is processed
+    after PROCESSING_DELAY_SECONDS by the transaction workers. A repeated
+    delivery (same Idempotency-Key header, or same payload when the
+    header is absent) gets the original 202 response back without being
+    queued again.
+    
+    Args:
+        request: Validated transaction payload
+        response: Outgoing response, marked when replaying a duplicate
+        idempotency_key: Optional Idempotency-Key header
+        processor: Transaction processor instance
+        
+    Returns:
+        202 Accepted response
+        
+    Raises:
+        HTTPException: 429 if the queue is full, 503 while shutting down
+    """
+    payload = request.model_dump()
+    key = compute_idempotency_key(payload, idempotency_key)
+    original = processor.find_accepted(key)
+    if original is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return original
+
+    if not processor.accepting:
+        raise HTTPException(status_code=503, detail="Service is shutting down")
+
+    if not processor.submit(payload):
+        raise HTTPException(
+            status_code=429,
+            detail="Transaction queue is full, retry later",
+            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER_SECONDS)}
+        )
+
+    accepted = ResponseFormatter.accepted(f"Transaction {request.transaction_id} accepted for processing")
+    processor.remember_accepted(key, accepted)
+    return accepted
+
+
+@router.get("/status/{transaction_id}", response_model=TransactionStatusResponse)
+async def get_transaction_status(
+    transaction_id: str,
+    processor = Depends(get_transaction_processor),
+    db_client = Depends(get_db_client)
+):
+    """
+    Get the processing status of a transaction.
+    
+    Args:
+        transaction_id: The sender's transaction identifier
+        processor: Transaction processor instance
+        db_client: Database client instance
+        
+    Returns:
+        The transaction with its status (PROCESSING, PROCESSED or FAILED)
+        
+    Raises:
+        HTTPException: 404 if the transaction is unknown, 500 on database errors
+    """
+    transaction = processor.get_status(transaction_id)
+    if transaction is not None:
+        return transaction
+
+    try:
+        transaction = await db_client.get_transaction(transaction_id)
+    except Exception as e:
+        logger.error("Error fetching transaction", extra={"transaction_id": transaction_id, "error": str(e)})
+        raise HTTPException(status_code=500, detail="Failed to fetch transaction status")
+
+    if transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return transaction
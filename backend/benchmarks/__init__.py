@@ -0,0 +1 @@
+"""Benchmark scripts for the chart data service."""
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Minimal ASGI request driver shared by the benchmarks.
+
+Calling the application directly, rather than through an HTTP client,
+keeps client-side work out of the measurements.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+
+async def call_asgi(
+    app: Any,
+    method: str,
+    path: str,
+    body: bytes = b"",
+    headers: Optional[List[Tuple[bytes, bytes]]] = None,
+    response_body: Optional[bytearray] = None,
+    response_headers: Optional[Dict[str, str]] = None
+) -> int:
+    """
+    Run one request through an ASGI app and return its status code.
+
+    Args:
+        app: Application under test
+        method: HTTP method
+        path: Request path, optionally with a query string
+        body: Request body
+        headers: Extra request headers
+        response_body: Buffer the response body is appended to, if given
+        response_headers: Dict the response headers are stored in, if given
+            (names lower-cased)
+
+    Returns:
+        int: Response status code
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "scheme": "http",
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 1234),
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *(headers or []),
+        ],
+    }
+    sent = False
+    finished = asyncio.Event()
+    status = 0
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if sent:
+            # Only report a disconnect once the response is complete
+            await finished.wait()
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            if response_headers is not None:
+                response_headers.update(
+                    (name.decode("latin-1").lower(), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                )
+        elif message["type"] == "http.response.body":
+            if response_body is not None:
+                response_body.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    finished.set()
+    return status
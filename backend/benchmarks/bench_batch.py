@@ -0,0 +1,231 @@
+"""
+Benchmark of the batch endpoints against single-user requests.
+
+Runs the full application against the PostgREST stand-in, whose
+responses are delayed by --latency-ms, and compares the two ways a client
+can read or save --items users' chart data:
+
+- reads: --items GET /chart-data/{email} requests, --concurrency in
+  flight, against one POST /chart-data/batch-get
+- writes: --items POST /chart-data requests, --concurrency in flight,
+  against one POST /chart-data/batch-upsert
+
+Each comparison runs --rounds times and reports the median wall time and
+the database requests issued.
+
+Exits with status 1 if a request fails or reports an item as not found
+or not saved, if a batch is less than --min-speedup times faster than
+the single requests, or if it issues more database requests than it
+should: one per CHART_BATCH_READ_CHUNK_SIZE emails for batch-get, one
+for batch-upsert.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_batch [--items N] [--concurrency N]
+        [--latency-ms MS] [--rounds N] [--min-speedup X]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("CHART_CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import math  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Callable, Dict, List, Tuple  # noqa: E402
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from benchmarks.postgrest_stub import PostgrestStub  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import DatabaseClient, get_db_client  # noqa: E402
+from core.defaults import DEFAULT_CHART_DATA  # noqa: E402
+from main import app  # noqa: E402
+
+settings = get_settings()
+
+# A request: method, path and body
+Request = Tuple[str, str, bytes]
+
+
+async def send_all(requests: List[Request], concurrency: int) -> List[Tuple[int, bytes]]:
+    """
+    Send requests with a fixed number in flight.
+
+    Returns:
+        Status and response body of each request, in request order
+    """
+    responses: List[Tuple[int, bytes]] = [(0, b"")] * len(requests)
+    remaining = iter(range(len(requests)))
+
+    async def worker() -> None:
+        for index in remaining:
+            method, path, body = requests[index]
+            buffer = bytearray()
+            status = await call_asgi(app, method, path, body, response_body=buffer)
+            responses[index] = (status, bytes(buffer))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return responses
+
+
+async def timed(
+    stub: PostgrestStub, requests: List[Request], concurrency: int
+) -> Tuple[float, int, List[Tuple[int, bytes]]]:
+    """
+    Send requests and measure them.
+
+    Returns:
+        Wall time in seconds, database requests issued and the responses
+    """
+    calls_before = stub.calls
+    start = time.perf_counter()
+    responses = await send_all(requests, concurrency)
+    return time.perf_counter() - start, stub.calls - calls_before, responses
+
+
+def item_statuses(responses: List[Tuple[int, bytes]]) -> List[str]:
+    """Per-item statuses reported by successful batch responses."""
+    return [
+        result["status"]
+        for status, body in responses if status == 200
+        for result in orjson.loads(body)["results"]
+    ]
+
+
+async def compare(
+    label: str,
+    stub: PostgrestStub,
+    make_singles: Callable[[int], List[Request]],
+    make_batch: Callable[[int], Request],
+    expected_status: str,
+    batch_calls: int,
+    args: argparse.Namespace
+) -> List[str]:
+    """
+    Run one single-versus-batch comparison, print it and check it.
+
+    Args:
+        label: Name of the comparison
+        stub: PostgREST stand-in serving the database
+        make_singles: Builds the single requests of a round
+        make_batch: Builds the batch request of a round
+        expected_status: Status every batch item must report
+        batch_calls: Most database requests the batch may issue
+        args: Command line arguments
+
+    Returns:
+        Descriptions of the failed checks
+    """
+    failures = []
+    single_times, batch_times = [], []
+    single_calls = batch_calls_seen = 0
+    for round_number in range(args.rounds):
+        elapsed, single_calls, responses = await timed(stub, make_singles(round_number), args.concurrency)
+        single_times.append(elapsed)
+        failed = sum(status != 200 for status, _ in responses)
+        if failed:
+            failures.append(f"{label}: {failed} of {args.items} single requests failed")
+
+        elapsed, batch_calls_seen, responses = await timed(stub, [make_batch(round_number)], 1)
+        batch_times.append(elapsed)
+        statuses = item_statuses(responses)
+        if responses[0][0] != 200:
+            failures.append(f"{label}: batch request answered {responses[0][0]}")
+        elif statuses.count(expected_status) != args.items:
+            failures.append(
+                f"{label}: batch reported {statuses.count(expected_status)} of {args.items} items {expected_status}"
+            )
+
+    single_ms = statistics.median(single_times) * 1000
+    batch_ms = statistics.median(batch_times) * 1000
+    speedup = single_ms / batch_ms
+    print(
+        f"{label:<7} {single_ms:>10.1f} {single_calls:>10} {batch_ms:>10.1f} {batch_calls_seen:>10} "
+        f"{speedup:>8.1f}x"
+    )
+    if speedup < args.min_speedup:
+        failures.append(f"{label}: batch only {speedup:.1f}x faster, expected at least {args.min_speedup:g}x")
+    if batch_calls_seen > batch_calls:
+        failures.append(f"{label}: batch issued {batch_calls_seen} database requests, expected at most {batch_calls}")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run both comparisons and return the exit status."""
+    stub = PostgrestStub(latency_ms=args.latency_ms)
+    emails = [f"batch-{i}@bench.example" for i in range(args.items)]
+    stub.seed_rows(DEFAULT_CHART_DATA, emails)
+    database = DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+    app.dependency_overrides[get_db_client] = lambda: database
+    await database.start()
+
+    def chart_data(round_number: int) -> Dict[str, Any]:
+        return {**DEFAULT_CHART_DATA, "daily_call_volume": [round_number] * 7}
+
+    def get_singles(round_number: int) -> List[Request]:
+        return [("GET", f"/api/v1/chart-data/{email}", b"") for email in emails]
+
+    def get_batch(round_number: int) -> Request:
+        return ("POST", "/api/v1/chart-data/batch-get", orjson.dumps({"emails": emails}))
+
+    def post_singles(round_number: int) -> List[Request]:
+        return [
+            ("POST", "/api/v1/chart-data", orjson.dumps({"email": email, "chart_data": chart_data(round_number)}))
+            for email in emails
+        ]
+
+    def post_batch(round_number: int) -> Request:
+        items = [{"email": email, "chart_data": chart_data(round_number)} for email in emails]
+        return ("POST", "/api/v1/chart-data/batch-upsert", orjson.dumps({"items": items}))
+
+    print(
+        f"{args.items} users, single requests {args.concurrency} in flight, stub latency "
+        f"{args.latency_ms} ms, median of {args.rounds} rounds"
+    )
+    print(f"{'':<7} {'single ms':>10} {'single db':>10} {'batch ms':>10} {'batch db':>10} {'speedup':>9}")
+    failures: List[str] = []
+    try:
+        failures += await compare(
+            "reads", stub, get_singles, get_batch, "found",
+            math.ceil(args.items / settings.CHART_BATCH_READ_CHUNK_SIZE), args
+        )
+        failures += await compare("writes", stub, post_singles, post_batch, "saved", 1, args)
+    finally:
+        await database.close()
+        app.dependency_overrides.pop(get_db_client, None)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("All checks passed")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=100, help="Users read and saved per round")
+    parser.add_argument("--concurrency", type=int, default=10, help="Single requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Stub response delay")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per comparison")
+    parser.add_argument(
+        "--min-speedup", type=float, default=5.0,
+        help="Fail if a batch is less than this many times faster than the single requests"
+    )
+    args = parser.parse_args()
+    if not 0 < args.items <= settings.CHART_BATCH_MAX_ITEMS:
+        parser.error(f"--items must be between 1 and CHART_BATCH_MAX_ITEMS ({settings.CHART_BATCH_MAX_ITEMS})")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Outage drill for the database circuit breaker and stale reads.
+
+Runs the full application against the PostgREST stand-in, reads a set of
+users while the stand-in is healthy, then injects an outage and checks
+how the chart data endpoints behave until the stand-in recovers:
+
+- errors: every PostgREST request fails with 503
+- slow: every PostgREST request takes --slow-ms (above
+  CIRCUIT_BREAKER_SLOW_CALL_SECONDS)
+
+During the outage, reads of known users must be answered with their last
+known data marked stale (never the default dataset), reads of unknown
+users and writes must fail fast with 503 once the circuit is open, and
+only a bounded number of requests may reach the database. After the
+outage, the breaker must close again through half-open probes.
+
+Prints per-phase statuses and latencies and exits with status 1 if any
+check fails.
+
+The breaker is configured for a short drill (0.5 s open time) unless the
+CIRCUIT_BREAKER_* settings are set in the environment.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_circuit_breaker [--users N] [--requests N] [--slow-ms MS]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("CHART_CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+os.environ.setdefault("CIRCUIT_BREAKER_OPEN_SECONDS", "0.5")
+os.environ.setdefault("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "0.1")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Dict, List, Tuple  # noqa: E402
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from benchmarks.postgrest_stub import PostgrestStub  # noqa: E402
+from core.circuit_breaker import CLOSED, OPEN  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import DatabaseClient, get_db_client  # noqa: E402
+from core.defaults import DEFAULT_CHART_DATA  # noqa: E402
+from main import app  # noqa: E402
+
+settings = get_settings()
+
+KNOWN_DATA = {"daily_call_volume": [7, 7, 7], "call_sentiment": {"positive": 1}}
+
+
+class Phase:
+    """Responses collected during one phase of the drill."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.statuses: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.stale = 0
+        self.stub_calls = 0
+
+    def add(self, label: str, status: int, latency: float, stale: bool) -> None:
+        key = f"{label} {status}"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self.latencies.append(latency)
+        self.stale += stale
+
+    def line(self) -> str:
+        p50 = statistics.median(self.latencies) * 1000 if self.latencies else 0.0
+        worst = max(self.latencies) * 1000 if self.latencies else 0.0
+        return (
+            f"{self.name:<10} {len(self.latencies):>6} {self.stale:>6} {p50:>8.2f} {worst:>8.2f} "
+            f"{self.stub_calls:>6}  {self.statuses}"
+        )
+
+
+async def send(method: str, path: str, body: bytes = b"") -> Tuple[int, Dict[str, str], Any, float]:
+    """
+    Send one request to the application.
+
+    Returns:
+        Tuple of status, response headers, decoded JSON body (or None) and latency in seconds
+    """
+    headers: Dict[str, str] = {}
+    content = bytearray()
+    start = time.perf_counter()
+    status = await call_asgi(app, method, path, body, response_body=content, response_headers=headers)
+    latency = time.perf_counter() - start
+    try:
+        decoded = orjson.loads(bytes(content)) if content else None
+    except orjson.JSONDecodeError:
+        decoded = None
+    return status, headers, decoded, latency
+
+
+async def drill(mode: str, users: int, requests: int, slow_ms: float) -> List[str]:
+    """
+    Run the drill for one outage mode and return the failed checks.
+
+    Args:
+        mode: "errors" or "slow"
+        users: Number of users read before the outage
+        requests: Reads of known users sent during the outage
+        slow_ms: Stand-in latency in the "slow" mode
+
+    Returns:
+        Descriptions of the failed checks
+    """
+    stub = PostgrestStub()
+    known = [f"known-{i}@drill.example" for i in range(users)]
+    stub.seed_rows(KNOWN_DATA, known)
+    database = DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+    app.dependency_overrides[get_db_client] = lambda: database
+    failures: List[str] = []
+
+    def fail(message: str) -> None:
+        failures.append(f"{mode}: {message}")
+
+    try:
+        healthy = Phase("healthy")
+        for email in known:
+            status, headers, body, latency = await send("GET", f"/api/v1/chart-data/{email}")
+            healthy.add("get", status, latency, "x-data-stale" in headers)
+        healthy.stub_calls = stub.calls
+
+        # Outage
+        if mode == "errors":
+            stub.error_rate = 1.0
+        else:
+            stub.latency_ms = slow_ms
+        outage = Phase("outage")
+        calls_before = stub.calls
+        for i in range(requests):
+            email = known[i % users]
+            status, headers, body, latency = await send("GET", f"/api/v1/chart-data/{email}")
+            stale = "x-data-stale" in headers
+            outage.add("get", status, latency, stale)
+            if status != 200 or not (body or {}).get("is_existing"):
+                fail(f"known user read answered {status} {body}")
+            elif mode == "errors" and not stale:
+                fail("read during an error outage was not marked stale")
+
+        open_phase = Phase("open")
+        if database.breaker.state != OPEN:
+            fail(f"breaker is {database.breaker.state} after the outage reads")
+        for i in range(10):
+            checks = [
+                ("get-new", "GET", f"/api/v1/chart-data/unknown-{i}@drill.example", b""),
+                ("post", "POST", "/api/v1/chart-data",
+                 orjson.dumps({"email": known[0], "chart_data": {**DEFAULT_CHART_DATA, "daily_call_volume": [0]}})),
+                ("delete", "DELETE", f"/api/v1/chart-data/{known[1]}", b""),
+            ]
+            for label, method, path, body in checks:
+                status, headers, _, latency = await send(method, path, body)
+                open_phase.add(label, status, latency, "x-data-stale" in headers)
+                if status != 503 or "retry-after" not in headers:
+                    fail(f"{label} while open answered {status} without 503 and Retry-After")
+        outage.stub_calls = stub.calls - calls_before
+        # Tripping takes at most a full window of calls; later reads are rejected
+        budget = settings.CIRCUIT_BREAKER_WINDOW
+        if outage.stub_calls > budget:
+            fail(f"{outage.stub_calls} requests reached the database during the outage (budget {budget})")
+        if open_phase.latencies and max(open_phase.latencies) > settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS:
+            fail("requests rejected by the open circuit were not fast")
+
+        # Recovery
+        stub.error_rate = 0.0
+        stub.latency_ms = 0.0
+        recovery = Phase("recovery")
+        calls_before = stub.calls
+        started = time.perf_counter()
+        deadline = started + settings.CIRCUIT_BREAKER_OPEN_SECONDS * 4 + 1
+        while time.perf_counter() < deadline:
+            status, headers, body, latency = await send("GET", f"/api/v1/chart-data/{known[0]}")
+            recovery.add("get", status, latency, "x-data-stale" in headers)
+            if database.breaker.state == CLOSED and "x-data-stale" not in headers:
+                break
+            await asyncio.sleep(0.05)
+        recovery.stub_calls = stub.calls - calls_before
+        recovered_after = time.perf_counter() - started
+        if database.breaker.state != CLOSED:
+            fail(f"breaker is still {database.breaker.state} after the database recovered")
+        status, _, body, _ = await send("GET", f"/api/v1/chart-data/{known[0]}")
+        if status != 200 or (body or {}).get("data") != KNOWN_DATA:
+            fail("the user's data changed during the outage")
+
+        print(f"\nmode={mode}  breaker: {database.breaker.stats()}  recovered after {recovered_after:.2f}s")
+        print(f"{'phase':<10} {'reqs':>6} {'stale':>6} {'p50 ms':>8} {'max ms':>8} {'db':>6}  statuses")
+        for phase in (healthy, outage, open_phase, recovery):
+            print(phase.line())
+    finally:
+        app.dependency_overrides.pop(get_db_client, None)
+        await database.close()
+    return failures
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run every outage mode; return the exit status."""
+    print(
+        f"breaker: window {settings.CIRCUIT_BREAKER_WINDOW}, min calls {settings.CIRCUIT_BREAKER_MIN_CALLS}, "
+        f"failure rate {settings.CIRCUIT_BREAKER_FAILURE_RATE}, slow call "
+        f"{settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS}s, open {settings.CIRCUIT_BREAKER_OPEN_SECONDS}s, "
+        f"{settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES} probes"
+    )
+    failures: List[str] = []
+    for mode in ("errors", "slow"):
+        failures += await drill(mode, args.users, args.requests, args.slow_ms)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("\nAll checks passed")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the drill and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20, help="Users read before the outage")
+    parser.add_argument("--requests", type=int, default=100, help="Reads sent during the outage")
+    parser.add_argument("--slow-ms", type=float, default=250.0, help="Stand-in latency in the slow mode")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
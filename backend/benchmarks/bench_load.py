@@ -0,0 +1,384 @@
+"""
+Load test of the chart data endpoints against a PostgREST stand-in.
+
+Runs the full application (middleware, routing, DatabaseClient and its
+PostgREST queries) with the database replaced by the in-process
+PostgrestStub, which delays every response by --latency-ms plus up to
+--jitter-ms. Each scenario is driven at every --concurrency level:
+
+- get: GET /chart-data/{email} for stored users
+- post: POST /chart-data saving a document
+- delete: DELETE /chart-data/{email} for stored users
+- list: GET /chart-data, one page of users
+- isolation: get, while --slow-queries reads of other users are held
+  --slow-query-ms in the database by the stub
+
+For each it records throughput, p50/p95/p99 latency and the error rate
+(responses with a status of 500 or above). Results are compared with a
+stored baseline (benchmarks/baseline.json, written with
+--update-baseline).
+
+Exits with status 1 if any scenario's p99 exceeds the
+WEBHOOK_TIMEOUT_SECONDS response requirement, if its error rate exceeds
+--max-error-rate, or, with --max-regression, if its p99 or throughput is
+that many percent worse than the baseline. The isolation scenario also
+fails if its p95 exceeds --isolation-p95-ms: requests for other users
+must not wait behind a slow query.
+
+The chart data cache is disabled unless CHART_CACHE_ENABLED is set, so
+reads reach the database client. Rate limiting is disabled unless
+RATE_LIMIT_ENABLED is set, as every request comes from one client.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_load [--requests N] [--concurrency 1,10,50]
+        [--latency-ms MS] [--jitter-ms MS] [--max-regression PCT]
+        [--slow-query-ms MS] [--isolation-p95-ms MS] [--update-baseline]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("CHART_CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import itertools  # noqa: E402
+import json  # noqa: E402
+import math  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa: E402
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from benchmarks.postgrest_stub import PostgrestStub  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import DatabaseClient, get_db_client  # noqa: E402
+from core.defaults import DEFAULT_CHART_DATA  # noqa: E402
+from main import app  # noqa: E402
+
+settings = get_settings()
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+SCENARIOS = ("get", "post", "delete", "list", "isolation")
+
+# A request: method, path and body
+Request = Tuple[str, str, bytes]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        sorted_values: Values in ascending order
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The smallest value that at least ``pct`` percent of values do not exceed
+    """
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def make_requests(stub: PostgrestStub, scenario: str, count: int, run_id: str) -> Callable[[], Request]:
+    """
+    Build the request generator of a scenario, seeding the rows it needs.
+
+    Args:
+        stub: PostgREST stand-in to seed
+        scenario: One of SCENARIOS
+        count: Number of requests the generator must supply
+        run_id: Distinguishes the users of separate runs
+
+    Returns:
+        Function returning the next request on each call
+    """
+    document = orjson.dumps(DEFAULT_CHART_DATA)
+
+    if scenario in ("get", "isolation"):
+        emails = [f"get-{i}@bench.example" for i in range(100)]
+        stub.seed_rows(DEFAULT_CHART_DATA, emails)
+        paths = itertools.cycle(f"/api/v1/chart-data/{email}" for email in emails)
+        return lambda: ("GET", next(paths), b"")
+
+    if scenario == "post":
+        bodies = itertools.cycle(
+            b'{"email":"post-%d@bench.example","chart_data":%s}' % (i, document) for i in range(100)
+        )
+        return lambda: ("POST", "/api/v1/chart-data", next(bodies))
+
+    if scenario == "delete":
+        # Every delete removes a row that exists
+        emails = [f"delete-{run_id}-{i}@bench.example" for i in range(count)]
+        stub.seed_rows(DEFAULT_CHART_DATA, emails)
+        paths = iter(f"/api/v1/chart-data/{email}" for email in emails)
+        return lambda: ("DELETE", next(paths), b"")
+
+    if scenario == "list":
+        stub.seed_rows(DEFAULT_CHART_DATA, [f"list-{i}@bench.example" for i in range(200)])
+        return lambda: ("GET", "/api/v1/chart-data?limit=50", b"")
+
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_scenario(next_request: Callable[[], Request], requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Send requests with a fixed number in flight and collect the results.
+
+    Args:
+        next_request: Request generator from make_requests
+        requests: Number of requests
+        concurrency: Requests in flight at once
+
+    Returns:
+        Dict with throughput, latency percentiles in milliseconds, error
+        rate and status counts
+    """
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            method, path, body = next_request()
+            start = time.perf_counter()
+            try:
+                status = await call_asgi(app, method, path, body)
+            except Exception:
+                # Raised after the error middleware has sent its 500
+                status = 500
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 500)
+    return {
+        "req_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "error_rate": round(errors / requests, 4),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def run_beside_slow_queries(
+    stub: PostgrestStub,
+    next_request: Callable[[], Request],
+    requests: int,
+    concurrency: int,
+    slow_queries: int,
+    slow_query_ms: float
+) -> Dict[str, Any]:
+    """
+    Run a scenario while other users' reads are held in slow database queries.
+
+    Each of ``slow_queries`` clients keeps re-reading its own user, whose
+    table queries the stub delays by ``slow_query_ms``, until the scenario
+    is over.
+
+    Args:
+        stub: PostgREST stand-in to seed and slow down
+        next_request: Request generator from make_requests
+        requests: Number of requests
+        concurrency: Requests in flight at once
+        slow_queries: Slow reads in flight at once
+        slow_query_ms: Extra delay of the slow reads
+
+    Returns:
+        The run_scenario result, with the slow reads' latencies in
+        milliseconds under ``slow_ms``
+    """
+    emails = [f"slow-{i}@bench.example" for i in range(slow_queries)]
+    stub.seed_rows(DEFAULT_CHART_DATA, emails)
+    stub.slow_emails.update(dict.fromkeys(emails, slow_query_ms))
+    done = asyncio.Event()
+    slow_ms: List[float] = []
+
+    async def read_slowly(email: str) -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            await call_asgi(app, "GET", f"/api/v1/chart-data/{email}")
+            slow_ms.append(round((time.perf_counter() - start) * 1000, 2))
+
+    readers = [asyncio.create_task(read_slowly(email)) for email in emails]
+    try:
+        # Let the slow reads reach the database first
+        await asyncio.sleep(0.05)
+        result = await run_scenario(next_request, requests, concurrency)
+        done.set()
+        await asyncio.gather(*readers)
+    finally:
+        done.set()
+        for reader in readers:
+            reader.cancel()
+        for email in emails:
+            stub.slow_emails.pop(email, None)
+    return {**result, "slow_ms": slow_ms}
+
+
+def _change(current: float, baseline: Optional[float]) -> str:
+    """Format the relative change from the baseline value."""
+    if not baseline:
+        return "-"
+    return f"{(current - baseline) / baseline * 100:+.0f}%"
+
+
+def check(
+    key: str,
+    result: Dict[str, Any],
+    baseline: Optional[Dict[str, Any]],
+    max_error_rate: float,
+    max_regression: Optional[float]
+) -> List[str]:
+    """
+    Check one result against the SLO, the error budget and the baseline.
+
+    Args:
+        key: Scenario and concurrency label
+        result: Result from run_scenario
+        baseline: Stored result for the same key, if any
+        max_error_rate: Highest acceptable error rate
+        max_regression: Highest acceptable slowdown in percent, or None
+
+    Returns:
+        Descriptions of the failed checks
+    """
+    failures = []
+    slo_ms = settings.WEBHOOK_TIMEOUT_SECONDS * 1000
+    if result["p99_ms"] > slo_ms:
+        failures.append(f"{key}: p99 {result['p99_ms']:.1f} ms exceeds the {slo_ms:.0f} ms SLO")
+    if result["error_rate"] > max_error_rate:
+        failures.append(f"{key}: error rate {result['error_rate']:.2%} exceeds {max_error_rate:.2%}")
+    if max_regression is not None and baseline:
+        limit = 1 + max_regression / 100
+        if result["p99_ms"] > baseline["p99_ms"] * limit:
+            failures.append(f"{key}: p99 {result['p99_ms']:.1f} ms vs baseline {baseline['p99_ms']:.1f} ms")
+        if result["req_per_s"] * limit < baseline["req_per_s"]:
+            failures.append(
+                f"{key}: {result['req_per_s']:.0f} req/s vs baseline {baseline['req_per_s']:.0f} req/s"
+            )
+    return failures
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run every scenario at every concurrency level; return the exit status."""
+    stub = PostgrestStub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+    database = DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+    app.dependency_overrides[get_db_client] = lambda: database
+    await database.start()
+
+    baseline: Dict[str, Any] = {}
+    if BASELINE_PATH.exists() and not args.update_baseline:
+        baseline = json.loads(BASELINE_PATH.read_text()).get("results", {})
+
+    print(
+        f"{args.requests} requests per run, stub latency {args.latency_ms} ms "
+        f"+ up to {args.jitter_ms} ms, SLO p99 <= {settings.WEBHOOK_TIMEOUT_SECONDS * 1000:.0f} ms"
+    )
+    print(
+        f"{'scenario':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'errors':>7} {'Δ req/s':>8} {'Δ p99':>7}  statuses"
+    )
+
+    results: Dict[str, Any] = {}
+    failures: List[str] = []
+    try:
+        for run_number, (scenario, concurrency) in enumerate(
+            (scenario, concurrency) for scenario in args.scenarios for concurrency in args.concurrency
+        ):
+            key = f"{scenario}@{concurrency}"
+            warm_up = make_requests(stub, scenario, args.warm_up, f"w{run_number}")
+            await run_scenario(warm_up, args.warm_up, min(concurrency, args.warm_up))
+            next_request = make_requests(stub, scenario, args.requests, str(run_number))
+            if scenario == "isolation":
+                result = await run_beside_slow_queries(
+                    stub, next_request, args.requests, concurrency, args.slow_queries, args.slow_query_ms
+                )
+                slow_ms = result.pop("slow_ms")
+            else:
+                result = await run_scenario(next_request, args.requests, concurrency)
+            results[key] = result
+            reference = baseline.get(key)
+            print(
+                f"{key:<14} {result['req_per_s']:>8.0f} {result['p50_ms']:>8.2f} "
+                f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['error_rate']:>7.2%} "
+                f"{_change(result['req_per_s'], reference and reference['req_per_s']):>8} "
+                f"{_change(result['p99_ms'], reference and reference['p99_ms']):>7}  {result['statuses']}"
+            )
+            failures += check(key, result, reference, args.max_error_rate, args.max_regression)
+            if scenario == "isolation":
+                print(f"{'':<14} beside {len(slow_ms)} slow reads of {min(slow_ms):.0f}-{max(slow_ms):.0f} ms")
+                if result["p95_ms"] > args.isolation_p95_ms:
+                    failures.append(
+                        f"{key}: p95 {result['p95_ms']:.1f} ms beside slow queries exceeds "
+                        f"{args.isolation_p95_ms:.0f} ms"
+                    )
+    finally:
+        await database.close()
+        app.dependency_overrides.pop(get_db_client, None)
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps({
+            "settings": {
+                "requests": args.requests,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+            },
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the load test and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario and level")
+    parser.add_argument("--warm-up", type=int, default=20, help="Unmeasured requests before each run")
+    parser.add_argument(
+        "--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+        default=[1, 10, 50], help="Comma-separated concurrency levels"
+    )
+    parser.add_argument(
+        "--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+        help=f"Comma-separated subset of {','.join(SCENARIOS)}"
+    )
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Stub response delay")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Maximum extra random stub delay")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the stub's jitter")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="Highest acceptable error rate")
+    parser.add_argument(
+        "--max-regression", type=float, default=None,
+        help="Fail if p99 or throughput is this many percent worse than the baseline"
+    )
+    parser.add_argument("--slow-queries", type=int, default=1, help="Slow reads in flight during isolation")
+    parser.add_argument("--slow-query-ms", type=float, default=1000.0, help="Extra stub delay of the slow reads")
+    parser.add_argument(
+        "--isolation-p95-ms", type=float, default=250.0,
+        help="Highest acceptable p95 of other users' reads beside the slow queries"
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the baseline")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
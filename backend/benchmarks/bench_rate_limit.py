@@ -0,0 +1,247 @@
+"""
+Rate limiter overhead and abuse drill.
+
+Measures what the limiter costs per request, then runs the full
+application against the PostgREST stand-in with the RATE_LIMIT_RULES in
+effect:
+
+- overhead: microseconds per check for a request no rule matches, for
+  one that matches, and for one that creates a new bucket, and memory per
+  bucket (tracemalloc over --buckets buckets)
+- sweep: a drained bucket of the slowest rule is left least recently
+  used, ahead of --buckets buckets of the fastest rule. Once those have
+  refilled, successive sweep calls (each a bounded batch) must drop them
+  all
+- flood: one client sends POST /chart-data as fast as --concurrency
+  requests in flight allow for --seconds. It may only get the rule's
+  burst plus its rate over the run; the rest must be answered 429 with
+  Retry-After. The report counts the requests that reached the database
+- neighbour: while the flood runs, another user reads their chart data
+  at --reads-per-second and must not be limited
+
+Exits with status 1 if the sweep kept refilled buckets, if the flooding
+client got more requests through than its budget, if a 429 lacked
+Retry-After, or if the other user was limited.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_rate_limit [--seconds S] [--concurrency N]
+        [--reads-per-second N] [--buckets N]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("CHART_CACHE_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+os.environ["RATE_LIMIT_ENABLED"] = "true"
+os.environ["RATE_LIMIT_BACKEND"] = "memory"
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import gc  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+from collections import Counter  # noqa: E402
+from typing import Dict, List  # noqa: E402
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from benchmarks.postgrest_stub import PostgrestStub  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import DatabaseClient, get_db_client  # noqa: E402
+from core.defaults import DEFAULT_CHART_DATA  # noqa: E402
+from core.rate_limit import MemoryRateLimitBackend, RateLimiter, RateLimitRule, get_rate_limiter  # noqa: E402
+from main import app  # noqa: E402
+
+settings = get_settings()
+
+FLOOD_PATH = "/api/v1/chart-data"
+NEIGHBOUR_PATH = "/api/v1/chart-data/neighbour@bench.example"
+
+
+def find_rule(method: str, path: str) -> RateLimitRule:
+    """The configured rule applying to a request."""
+    matched = get_rate_limiter().match({"method": method, "path": path, "client": ("127.0.0.1", 1234)})
+    if matched is None:
+        raise SystemExit(f"No RATE_LIMIT_RULES entry matches {method} {path}")
+    return matched[0]
+
+
+async def measure_overhead(buckets: int) -> Dict[str, float]:
+    """Time limiter checks and measure memory per bucket, on a fresh limiter."""
+    limiter = RateLimiter(
+        [RateLimitRule(**rule) for rule in settings.RATE_LIMIT_RULES],
+        MemoryRateLimitBackend(max_buckets=buckets, sweep_seconds=settings.RATE_LIMIT_SWEEP_SECONDS)
+    )
+    client = ("127.0.0.1", 1234)
+    unmatched = {"method": "GET", "path": "/health", "client": client}
+    matched = {"method": "GET", "path": NEIGHBOUR_PATH, "client": client}
+
+    result = {}
+    for label, scope in (("unmatched_us", unmatched), ("matched_us", matched)):
+        count = 50000
+        start = time.perf_counter()
+        for _ in range(count):
+            await limiter.check(scope)
+        result[label] = (time.perf_counter() - start) / count * 1e6
+
+    scopes = [{"method": "GET", "path": f"/api/v1/chart-data/u{i}@bench.example", "client": client} for i in range(buckets)]
+    gc.collect()
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for scope in scopes:
+        await limiter.check(scope)
+    result["new_bucket_us"] = (time.perf_counter() - start) / buckets * 1e6
+    gc.collect()
+    result["bytes_per_bucket"] = (tracemalloc.get_traced_memory()[0] - memory_before) / buckets
+    tracemalloc.stop()
+    return result
+
+
+def check_sweep(buckets: int) -> int:
+    """
+    Sweep fast-refilling buckets queued behind a slow one.
+
+    Returns:
+        int: Buckets left besides the slow one (0 when the sweep works)
+    """
+    rules = [RateLimitRule(**rule) for rule in settings.RATE_LIMIT_RULES]
+    slow = min(rules, key=lambda rule: rule.rate)
+    fast = max(rules, key=lambda rule: rule.rate)
+    backend = MemoryRateLimitBackend(max_buckets=buckets + 1, sweep_seconds=settings.RATE_LIMIT_SWEEP_SECONDS)
+    now = 0.0
+    for _ in range(slow.burst):
+        backend.take("slow", slow.rate, slow.burst, now)
+    for i in range(buckets):
+        backend.take(f"fast{i}", fast.rate, fast.burst, now)
+    # The fast buckets are full again; the slow one is still refilling
+    now = min(fast.burst / fast.rate, slow.burst / slow.rate / 2)
+    backend.take("slow", slow.rate, slow.burst, now)
+    calls, longest = 0, 0.0
+    done = False
+    while not done and calls <= buckets:
+        start = time.perf_counter()
+        done = backend.sweep(now)
+        longest = max(longest, time.perf_counter() - start)
+        calls += 1
+    left = backend.stats()["buckets"] - 1
+    print(
+        f"sweep: {buckets} refilled {fast.rate:g}/s buckets behind a refilling {slow.rate:g}/s one, "
+        f"{left} left after {calls} sweep calls of at most {longest * 1000:.2f} ms"
+    )
+    return left
+
+
+async def flood(seconds: float, concurrency: int, statuses: Counter, retry_after: Counter) -> None:
+    """Send POST /chart-data from one client as fast as possible for ``seconds``."""
+    body = orjson.dumps({"email": "flood@bench.example", "chart_data": DEFAULT_CHART_DATA})
+    deadline = time.perf_counter() + seconds
+
+    async def sender() -> None:
+        while time.perf_counter() < deadline:
+            headers: Dict[str, str] = {}
+            status = await call_asgi(app, "POST", FLOOD_PATH, body, response_headers=headers)
+            statuses[status] += 1
+            if status == 429:
+                retry_after["present" if "retry-after" in headers else "missing"] += 1
+
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+
+
+async def read_steadily(seconds: float, per_second: float, statuses: Counter, latencies: List[float]) -> None:
+    """Read one user's chart data at a fixed rate for ``seconds``."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        statuses[await call_asgi(app, "GET", NEIGHBOUR_PATH)] += 1
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(max(0.0, 1 / per_second - (time.perf_counter() - start)))
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run the measurements and the drill; return the exit status."""
+    overhead = await measure_overhead(args.buckets)
+    print(f"{'check':<26} {'µs':>6}")
+    print(f"{'no matching rule':<26} {overhead['unmatched_us']:>6.2f}")
+    print(f"{'existing bucket':<26} {overhead['matched_us']:>6.2f}")
+    print(f"{'new bucket':<26} {overhead['new_bucket_us']:>6.2f}")
+    print(f"memory per bucket: {overhead['bytes_per_bucket']:.0f} bytes over {args.buckets} buckets")
+
+    swept_left = check_sweep(args.buckets)
+
+    flood_rule = find_rule("POST", FLOOD_PATH)
+    read_rule = find_rule("GET", NEIGHBOUR_PATH)
+    stub = PostgrestStub(latency_ms=args.latency_ms)
+    stub.seed_rows(DEFAULT_CHART_DATA, ["neighbour@bench.example"])
+    database = DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+    app.dependency_overrides[get_db_client] = lambda: database
+    await database.start()
+
+    flood_statuses: Counter = Counter()
+    retry_after: Counter = Counter()
+    read_statuses: Counter = Counter()
+    latencies: List[float] = []
+    calls_before = stub.calls
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(
+            flood(args.seconds, args.concurrency, flood_statuses, retry_after),
+            read_steadily(args.seconds, args.reads_per_second, read_statuses, latencies),
+        )
+    finally:
+        await database.close()
+        app.dependency_overrides.pop(get_db_client, None)
+    elapsed = time.perf_counter() - started
+
+    budget = flood_rule.burst + flood_rule.rate * elapsed
+    database_calls = stub.calls - calls_before
+    latencies.sort()
+    print(
+        f"\nflood: {sum(flood_statuses.values())} requests in {elapsed:.1f} s, "
+        f"{flood_statuses[200]} saved (budget {budget:.0f}: burst {flood_rule.burst} "
+        f"+ {flood_rule.rate:g}/s), {flood_statuses[429]} limited, statuses {dict(flood_statuses)}"
+    )
+    print(
+        f"neighbour: {sum(read_statuses.values())} reads (limit {read_rule.rate:g}/s, "
+        f"burst {read_rule.burst}), statuses {dict(read_statuses)}, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms"
+    )
+    print(f"database requests: {database_calls}")
+
+    failures = []
+    if swept_left:
+        failures.append(f"sweep kept {swept_left} refilled buckets")
+    if flood_statuses[200] > budget + 1:
+        failures.append(f"flooding client saved {flood_statuses[200]} times, budget {budget:.0f}")
+    if not flood_statuses[429]:
+        failures.append("flooding client was never limited")
+    if retry_after["missing"]:
+        failures.append(f"{retry_after['missing']} responses with 429 lacked Retry-After")
+    if read_statuses[429]:
+        failures.append(f"other user was limited {read_statuses[429]} times")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("All checks passed")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the drill and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=3.0, help="Length of the flood")
+    parser.add_argument("--concurrency", type=int, default=20, help="Flood requests in flight")
+    parser.add_argument("--reads-per-second", type=float, default=5.0, help="Other user's read rate")
+    parser.add_argument("--buckets", type=int, default=100000, help="Buckets created for the memory measurement")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Stub response delay")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
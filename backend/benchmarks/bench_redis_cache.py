@@ -0,0 +1,210 @@
+"""
+Cross-worker invalidation and outage drill for the Redis chart data cache.
+
+Runs two DatabaseClients, standing in for two workers, against the
+PostgREST stand-in. Each has its own RedisCacheBackend and both share one
+fakeredis server:
+
+- propagation: both workers read --users users, so each holds them in its
+  local tier. Then worker A saves new data for every user. Worker B must
+  drop its local copies without waiting for CHART_CACHE_LOCAL_TTL_SECONDS,
+  and its next reads must return the new data
+- outage: Redis stops accepting connections. Saves through A must still
+  succeed. Once B notices that its subscription is down, its reads must
+  come from the database with the new data
+- recovery: Redis comes back. Both subscriptions must be restored, and the
+  invalidations A could not send must be retried, so that B does not read
+  the entries Redis still holds from before the outage
+
+Prints how long invalidations took to reach the other worker and what
+each phase cost in database requests. Exits with status 1 if any check
+fails.
+
+Needs fakeredis, from requirements-dev.txt.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_redis_cache [--users N] [--local-ttl-seconds S]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("CHART_CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Callable, Dict, List  # noqa: E402
+
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+
+from benchmarks.postgrest_stub import PostgrestStub  # noqa: E402
+from core.cache import ReadThroughCache, RedisCacheBackend, TTLCache  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import DatabaseClient  # noqa: E402
+
+settings = get_settings()
+
+POLL_SECONDS = 0.001
+
+
+async def start_worker(stub: PostgrestStub, server: fakeredis.FakeServer, local_ttl: float) -> DatabaseClient:
+    """Build and start one worker's database client with a Redis cache."""
+    database = DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+    database.cache = ReadThroughCache(RedisCacheBackend(
+        fakeredis.FakeAsyncRedis(server=server),
+        local=TTLCache(
+            max_entries=settings.CHART_CACHE_MAX_ENTRIES,
+            max_bytes=settings.CHART_CACHE_MAX_BYTES,
+            ttl_seconds=local_ttl,
+            negative_ttl_seconds=local_ttl
+        ),
+        ttl_seconds=settings.CHART_CACHE_TTL_SECONDS,
+        negative_ttl_seconds=settings.CHART_CACHE_NEGATIVE_TTL_SECONDS,
+        prefix=settings.CHART_CACHE_REDIS_PREFIX,
+        reconnect_min_seconds=0.05,
+        reconnect_max_seconds=0.5
+    ), name="chart_data")
+    await database.start()
+    return database
+
+
+def backend(database: DatabaseClient) -> RedisCacheBackend:
+    """The worker's Redis cache backend."""
+    return database.cache.backend
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float) -> float:
+    """
+    Poll until a condition holds.
+
+    Returns:
+        float: Seconds waited, or -1 if the condition did not hold in time
+    """
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return -1.0
+        await asyncio.sleep(POLL_SECONDS)
+    return time.perf_counter() - start
+
+
+async def read_all(database: DatabaseClient, emails: List[str]) -> List[Any]:
+    """Read every user's chart data through a worker."""
+    rows = await asyncio.gather(*(database.get_user_chart_data(email) for email in emails))
+    return [row["chart_data"] if row is not None else None for row in rows]
+
+
+def version(n: int) -> Dict[str, Any]:
+    """A recognisable chart data document."""
+    return {"daily_call_volume": [n, n, n], "call_sentiment": {"positive": n}}
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run the drill and return the exit status."""
+    stub = PostgrestStub(latency_ms=1.0)
+    emails = [f"user{i}@bench.example" for i in range(args.users)]
+    stub.seed_rows(version(1), emails)
+    server = fakeredis.FakeServer()
+    worker_a = await start_worker(stub, server, args.local_ttl_seconds)
+    worker_b = await start_worker(stub, server, args.local_ttl_seconds)
+    failures: List[str] = []
+
+    try:
+        if await wait_for(lambda: backend(worker_a).subscribed and backend(worker_b).subscribed, 5.0) < 0:
+            raise SystemExit("Workers never subscribed to invalidations")
+
+        # Propagation
+        await read_all(worker_a, emails)
+        await read_all(worker_b, emails)
+        local_b = backend(worker_b).local
+        if local_b.stats()["entries"] != args.users:
+            failures.append(f"worker B holds {local_b.stats()['entries']} of {args.users} users locally")
+
+        delays = []
+        for email in emails:
+            if await worker_a.save_chart_data(email, version(2)) is None:
+                failures.append(f"save of {email} failed")
+            delay = await wait_for(lambda: local_b._entries.get(email) is None, 2.0)
+            if delay < 0:
+                failures.append(f"worker B kept its local copy of {email}")
+            else:
+                delays.append(delay)
+        calls_before = stub.calls
+        stale_reads = sum(data != version(2) for data in await read_all(worker_b, emails))
+        print(
+            f"propagation: {len(delays)}/{args.users} invalidations reached worker B, "
+            f"median {statistics.median(delays) * 1000:.2f} ms, max {max(delays) * 1000:.2f} ms; "
+            f"B re-read with {stub.calls - calls_before} database requests, {stale_reads} stale"
+        ) if delays else print("propagation: no invalidation reached worker B")
+        if stale_reads:
+            failures.append(f"worker B read {stale_reads} stale documents after the saves")
+
+        # Outage
+        server.connected = False
+        saves = [await worker_a.save_chart_data(email, version(3)) for email in emails]
+        failed_saves = saves.count(None)
+        detected = await wait_for(lambda: not backend(worker_b).subscribed, 5.0)
+        calls_before = stub.calls
+        stale_reads = sum(data != version(3) for data in await read_all(worker_b, emails))
+        print(
+            f"outage: {args.users - failed_saves}/{args.users} saves succeeded, worker B bypassed its "
+            f"local tier after {detected * 1000:.0f} ms, B read with {stub.calls - calls_before} database "
+            f"requests, {stale_reads} stale; A has {backend(worker_a).stats()['pending_invalidations']} "
+            f"invalidations to retry"
+        )
+        if failed_saves:
+            failures.append(f"{failed_saves} saves failed while Redis was down")
+        if detected < 0:
+            failures.append("worker B never noticed that its subscription was down")
+        if stale_reads:
+            failures.append(f"worker B read {stale_reads} stale documents while Redis was down")
+
+        # Recovery
+        server.connected = True
+        restored = await wait_for(
+            lambda: all(backend(worker).subscribed and not backend(worker).stats()["pending_invalidations"]
+                        for worker in (worker_a, worker_b)),
+            5.0
+        )
+        stale_reads = sum(data != version(3) for data in await read_all(worker_b, emails))
+        print(
+            f"recovery: subscriptions restored and invalidations retried after {restored * 1000:.0f} ms, "
+            f"B read {stale_reads} stale; reconnects A {backend(worker_a).reconnects}, "
+            f"B {backend(worker_b).reconnects}"
+        )
+        if restored < 0:
+            failures.append("subscriptions or pending invalidations were not restored after the outage")
+        if stale_reads:
+            failures.append(f"worker B read {stale_reads} stale documents after Redis recovered")
+    finally:
+        await worker_a.close()
+        await worker_b.close()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("All checks passed")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the drill and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=50, help="Users read and saved in each phase")
+    parser.add_argument(
+        "--local-ttl-seconds", type=float, default=60.0,
+        help="Local tier lifetime; long, so only invalidations can explain fresh reads"
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
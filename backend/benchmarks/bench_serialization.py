@@ -0,0 +1,155 @@
+"""
+Micro-benchmark for JSON encoding and decoding of chart data.
+
+Compares the previous request/response path (stdlib ``json`` request
+parsing, ``response_model`` validation and ``JSONResponse``) with the
+orjson path (``ORJSONRoute`` request parsing and pre-encoded responses)
+for chart data payloads of roughly 1 KB, 100 KB and 1 MB.
+
+Requests are driven straight through the ASGI interface so the numbers
+reflect server-side work only.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_serialization [--requests N]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Dict, List, Tuple  # noqa: E402
+
+import orjson  # noqa: E402
+from fastapi import APIRouter, FastAPI, Response  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from core.serialization import ORJSONRoute  # noqa: E402
+
+
+class ChartDataRequest(BaseModel):
+    """Request body used by both variants."""
+    email: str
+    chart_data: Dict[str, Any]
+
+
+class UserChartDataResponse(BaseModel):
+    """Response model used by the stdlib variant."""
+    data: Dict[str, Any]
+    is_existing: bool
+
+
+def make_chart_data(target_bytes: int) -> Dict[str, Any]:
+    """
+    Build chart data whose JSON encoding is roughly ``target_bytes`` long.
+
+    Args:
+        target_bytes: Desired encoded size
+
+    Returns:
+        Dict shaped like a user's chart data
+    """
+    days = max(7, target_bytes // 40)
+    agents = max(4, target_bytes // 200)
+    return {
+        "daily_call_volume": [40 + i % 50 for i in range(days)],
+        "average_call_duration": [120.5 + i % 30 for i in range(days)],
+        "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
+        "agent_performance": [
+            {"name": f"Agent {i}", "calls": 100 + i, "rating": 4.5}
+            for i in range(agents)
+        ],
+        "conversion_rate": [70 + i % 10 for i in range(days)]
+    }
+
+
+def build_stdlib_app(chart_data: Dict[str, Any]) -> FastAPI:
+    """Build an app using the stdlib JSON path."""
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.get("/chart-data/{email}", response_model=UserChartDataResponse)
+    async def get_chart_data(email: str):
+        return UserChartDataResponse(data=chart_data, is_existing=True)
+
+    @app.post("/chart-data")
+    async def save_chart_data(request: ChartDataRequest):
+        return {"success": True, "email": request.email}
+
+    return app
+
+
+def build_orjson_app(chart_data: Dict[str, Any]) -> FastAPI:
+    """Build an app using the orjson path."""
+    app = FastAPI(default_response_class=ORJSONResponse)
+    router = APIRouter(route_class=ORJSONRoute)
+
+    @router.get("/chart-data/{email}", response_model=UserChartDataResponse)
+    async def get_chart_data(email: str):
+        return Response(
+            content=orjson.dumps({"data": chart_data, "is_existing": True}),
+            media_type="application/json"
+        )
+
+    @router.post("/chart-data")
+    async def save_chart_data(request: ChartDataRequest):
+        return {"success": True, "email": request.email}
+
+    app.include_router(router)
+    return app
+
+
+async def measure(app: FastAPI, method: str, path: str, body: bytes, requests: int) -> Tuple[float, float]:
+    """
+    Time a sequence of identical requests.
+
+    Returns:
+        Tuple of requests per second and CPU milliseconds per request
+    """
+    await call_asgi(app, method, path, body)  # warm up
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(requests):
+        status = await call_asgi(app, method, path, body)
+        assert status == 200, status
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    return requests / wall, cpu * 1000 / requests
+
+
+async def run(requests: int) -> List[Dict[str, Any]]:
+    """Run every size/variant combination and return the result rows."""
+    rows = []
+    for label, size in (("1KB", 1_000), ("100KB", 100_000), ("1MB", 1_000_000)):
+        chart_data = make_chart_data(size)
+        body = orjson.dumps({"email": "bench@example.com", "chart_data": chart_data})
+        count = max(50, requests * 1_000 // size) if size > 1_000 else requests
+        for variant, app in (("stdlib", build_stdlib_app(chart_data)), ("orjson", build_orjson_app(chart_data))):
+            get_rps, get_cpu = await measure(app, "GET", "/chart-data/bench@example.com", b"", count)
+            post_rps, post_cpu = await measure(app, "POST", "/chart-data", body, count)
+            rows.append({
+                "size": label, "bytes": len(body), "variant": variant,
+                "get_rps": get_rps, "get_cpu_ms": get_cpu,
+                "post_rps": post_rps, "post_cpu_ms": post_cpu
+            })
+    return rows
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per 1 KB case")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args.requests))
+    print(f"{'size':>6} {'variant':>7} {'GET req/s':>10} {'GET cpu ms':>11} {'POST req/s':>11} {'POST cpu ms':>12}")
+    for row in rows:
+        print(
+            f"{row['size']:>6} {row['variant']:>7} {row['get_rps']:>10.0f} {row['get_cpu_ms']:>11.3f} "
+            f"{row['post_rps']:>11.0f} {row['post_cpu_ms']:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark for server-side series aggregation against raw arrays.
+
+Serves one user whose three chart series hold POINTS daily values
+(ten years by default) and measures throughput, median latency and
+response size for:
+
+- the full chart data document (every series as a raw array)
+- one raw series from the series endpoint
+- bucket statistics, a rolling mean and LTTB downsampling of that series
+
+Aggregated views are measured twice: "warm" repeats the same request and
+is answered from the memo, "cold" changes the row version before every
+request so each one recomputes.
+
+Finally, a raw series request is sent back to back while cold LTTB
+requests run, to show how much aggregation delays other requests on the
+same worker. Compare with CHART_SERIES_THREAD_MIN_POINTS set above
+--points, which keeps aggregation on the event loop.
+
+The database is replaced by an in-process stand-in, so the numbers
+isolate serialization and aggregation.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_series [--points N] [--requests N]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import random  # noqa: E402
+import statistics  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Dict, List, Optional  # noqa: E402
+
+from fastapi import FastAPI  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from api.v1.chart_data import router as chart_data_router  # noqa: E402
+from api.v1.chart_series import router as chart_series_router  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import get_db_client  # noqa: E402
+
+EMAIL = "bench@example.com"
+SERIES = "daily_call_volume"
+
+settings = get_settings()
+
+
+class StaticDatabase:
+    """Stands in for DatabaseClient and serves one user's row."""
+
+    def __init__(self, points: int):
+        rng = random.Random(42)
+        self.row = {
+            "email": EMAIL,
+            "updated_at": "0",
+            "chart_data": {
+                "daily_call_volume": [max(0, int(50 + 10 * rng.gauss(0, 1))) for _ in range(points)],
+                "average_call_duration": [rng.randint(90, 180) for _ in range(points)],
+                "conversion_rate": [rng.randint(60, 85) for _ in range(points)],
+                "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
+            },
+        }
+        self.bump_version = False
+        self.version = 0
+
+    async def get_user_chart_data(self, email: str) -> Optional[Dict[str, Any]]:
+        if self.bump_version:
+            self.version += 1
+            self.row = {**self.row, "updated_at": str(self.version)}
+        return self.row
+
+
+async def run_case(app: FastAPI, path: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Send the same GET repeatedly and collect the results.
+
+    Args:
+        app: Application under test
+        path: Request path with query string
+        requests: Number of requests
+        concurrency: Requests in flight at once
+
+    Returns:
+        Dict with throughput, median latency, response size and statuses
+    """
+    body = bytearray()
+    await call_asgi(app, "GET", path, response_body=body)
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            status = await call_asgi(app, "GET", path)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "req_per_s": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "bytes": len(body),
+        "statuses": statuses,
+    }
+
+
+async def probe_during(app: FastAPI, path: str, probe_path: str, requests: int, concurrency: int) -> List[float]:
+    """
+    Send one request at a time to ``probe_path`` while a run_case on ``path`` is in progress.
+
+    Returns:
+        The probe requests' latencies in seconds
+    """
+    flood = asyncio.ensure_future(run_case(app, path, requests, concurrency))
+    latencies: List[float] = []
+    while not flood.done():
+        start = time.perf_counter()
+        await call_asgi(app, "GET", probe_path)
+        latencies.append(time.perf_counter() - start)
+    await flood
+    return latencies
+
+
+async def run(points: int, requests: int, concurrency: int) -> None:
+    """Run every case and print one line per case."""
+    database = StaticDatabase(points)
+    app = FastAPI()
+    app.include_router(chart_data_router, prefix="/api/v1")
+    app.include_router(chart_series_router, prefix="/api/v1")
+    app.dependency_overrides[get_db_client] = lambda: database
+
+    base = f"/api/v1/chart-data/{EMAIL}/series/{SERIES}"
+    cases = [
+        ("document (3 raw series)", f"/api/v1/chart-data/{EMAIL}", False),
+        ("raw series", base, False),
+        ("buckets=365 mean,p95", f"{base}/buckets?buckets=365&stats=mean,p95", True),
+        ("rolling window=7", f"{base}/rolling?window=7", True),
+        ("lttb points=500", f"{base}/lttb?points=500", True),
+    ]
+
+    print(f"{points} points per series, {requests} requests, concurrency {concurrency}")
+    print(f"{'case':<26} {'memo':>5} {'req/s':>8} {'p50 ms':>8} {'bytes':>9}  statuses")
+    for label, path, aggregated in cases:
+        for cold in ((False, True) if aggregated else (False,)):
+            database.bump_version = cold
+            result = await run_case(app, path, requests, concurrency)
+            memo = ("cold" if cold else "warm") if aggregated else "-"
+            print(
+                f"{label:<26} {memo:>5} {result['req_per_s']:>8.0f} "
+                f"{result['p50_ms']:>8.2f} {result['bytes']:>9}  {result['statuses']}"
+            )
+
+    database.bump_version = True
+    latencies = sorted(await probe_during(app, f"{base}/lttb?points=500", base, requests, concurrency))
+    print(
+        f"\nraw series during cold lttb: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms "
+        f"(aggregation on a thread from {settings.CHART_SERIES_THREAD_MIN_POINTS} points)"
+    )
+
+
+def main() -> None:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--points", type=int, default=3650)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.points, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
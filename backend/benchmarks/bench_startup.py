@@ -0,0 +1,208 @@
+"""
+Cold start report and import time budget check.
+
+Starts fresh interpreters that import the application and answer their
+first request, as a scale-to-zero instance does after idling, with the
+database replaced by the in-process PostgrestStub:
+
+- import: ``import main``
+- startup: the lifespan startup (database client, event hub, workers)
+- first response: GET /api/v1/chart-data/{email} on the new worker,
+  then the same request again once it is warm
+- process start to first response: the worker's own
+  ``app_startup_seconds{stage="first_response"}`` metric, which also
+  counts interpreter startup
+
+Each figure is the median of --runs processes. One more process runs
+with ``python -X importtime``; from it the report lists the packages that
+take longest to import (their modules' own time) and the service's
+modules by cumulative time. It also checks that modules deferred to first
+use (DEFERRED_MODULES) are not imported by ``import main``.
+
+Exits with status 1 if the median import exceeds --import-budget-ms or a
+deferred module was imported. Import times are machine-specific; set the
+budget for the machine that runs the check.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup [--runs N] [--import-budget-ms MS] [--top N]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# Only the standard library here: worker processes run this module too,
+# and anything imported before main would be left out of its import time
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import statistics  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Any, Dict, List, Tuple  # noqa: E402
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Heavy modules only some requests (or only ``python main.py``) need
+DEFERRED_MODULES = ("numpy", "uvicorn", "redis", "supabase", "gotrue", "storage3", "realtime")
+APP_PACKAGES = ("main", "core", "api", "helper")
+
+STAGES = ("import_ms", "startup_ms", "first_response_ms", "warm_response_ms", "process_to_first_response_ms")
+STAGE_LABELS = {
+    "import_ms": "import main",
+    "startup_ms": "lifespan startup",
+    "first_response_ms": "first response",
+    "warm_response_ms": "warm response",
+    "process_to_first_response_ms": "process start to first response",
+}
+
+# One ``-X importtime`` line: module name, own and cumulative microseconds
+ImportTime = Tuple[str, int, int]
+
+
+async def serve_first_requests(app: Any) -> Dict[str, float]:
+    """Start the app against the stub and time its first two requests."""
+    import httpx
+
+    import core.db
+    from benchmarks.asgi import call_asgi
+    from benchmarks.postgrest_stub import PostgrestStub
+    from core.defaults import DEFAULT_CHART_DATA
+
+    stub = PostgrestStub()
+    stub.seed_rows(DEFAULT_CHART_DATA, ["coldstart@bench.example"])
+    core.db.db_client = core.db.DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        timings["startup_ms"] = (time.perf_counter() - start) * 1000
+        for stage in ("first_response_ms", "warm_response_ms"):
+            start = time.perf_counter()
+            status = await call_asgi(app, "GET", "/api/v1/chart-data/coldstart@bench.example")
+            timings[stage] = (time.perf_counter() - start) * 1000
+            if status != 200:
+                raise RuntimeError(f"GET /chart-data answered {status}")
+    return timings
+
+
+def worker() -> None:
+    """Import and start the app in this fresh process; print its timings as JSON."""
+    start = time.perf_counter()
+    import main
+
+    timings = {"import_ms": (time.perf_counter() - start) * 1000}
+    deferred = sorted(name for name in DEFERRED_MODULES if name in sys.modules)
+    timings.update(asyncio.run(serve_first_requests(main.app)))
+
+    from prometheus_client import REGISTRY
+
+    first_response = REGISTRY.get_sample_value("app_startup_seconds", {"stage": "first_response"})
+    timings["process_to_first_response_ms"] = first_response * 1000
+    print(json.dumps({"timings": timings, "deferred_imported": deferred}))
+
+
+def run_worker(interpreter_options: List[str]) -> Tuple[Dict[str, Any], str]:
+    """Run one worker process; return its result and its stderr."""
+    process = subprocess.run(
+        [sys.executable, *interpreter_options, "-m", "benchmarks.bench_startup", "--worker"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Worker failed:\n{process.stderr[-2000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+
+def main_imports(importtime_output: str) -> List[ImportTime]:
+    """
+    Pick the modules ``import main`` loaded from ``-X importtime`` output.
+
+    Lines come in completion order, so the modules imported for ``main``
+    are the ones listed after the previous top-level import, up to and
+    including ``main`` itself.
+    """
+    modules: List[ImportTime] = []
+    for line in importtime_output.splitlines():
+        fields = line.split("|")
+        if not line.startswith("import time:") or len(fields) != 3:
+            continue
+        try:
+            own, cumulative = int(fields[0].split(":")[1]), int(fields[1])
+        except ValueError:
+            continue  # Header line
+        name = fields[2].strip()
+        top_level = fields[2].startswith(" ") and not fields[2].startswith("  ")
+        if top_level and name == "main":
+            modules.append((name, own, cumulative))
+            return modules
+        if top_level:
+            modules = []
+        else:
+            modules.append((name, own, cumulative))
+    raise RuntimeError("main not found in the -X importtime output")
+
+
+def print_import_report(modules: List[ImportTime], top: int) -> None:
+    """Print the slowest packages and the service's own modules."""
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, own, _ in modules:
+        by_package[name.split(".")[0]] += own
+    total = modules[-1][2]
+    print(f"\n-X importtime: import main took {total / 1000:.0f} ms (with importtime overhead)")
+    print(f"{'package':<28} {'own ms':>8} {'share':>6}")
+    for package, own in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<28} {own / 1000:>8.1f} {own / total:>6.1%}")
+
+    print(f"\n{'service module':<28} {'cumulative ms':>13} {'own ms':>8}")
+    app_modules = [module for module in modules if module[0].split(".")[0] in APP_PACKAGES]
+    for name, own, cumulative in sorted(app_modules, key=lambda module: -module[2])[:top]:
+        print(f"{name:<28} {cumulative / 1000:>13.1f} {own / 1000:>8.1f}")
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run the workers, print the report and return the exit status."""
+    results = [run_worker([])[0] for _ in range(args.runs)]
+    print(f"{args.runs} worker processes")
+    print(f"{'stage':<34} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    medians: Dict[str, float] = {}
+    for stage in STAGES:
+        values = [result["timings"][stage] for result in results]
+        medians[stage] = statistics.median(values)
+        print(f"{STAGE_LABELS[stage]:<34} {medians[stage]:>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+    _, importtime_output = run_worker(["-X", "importtime"])
+    print_import_report(main_imports(importtime_output), args.top)
+
+    failures = []
+    if medians["import_ms"] > args.import_budget_ms:
+        failures.append(f"import main took {medians['import_ms']:.0f} ms, budget {args.import_budget_ms:.0f} ms")
+    deferred = sorted({name for result in results for name in result["deferred_imported"]})
+    if deferred:
+        failures.append(f"import main imported modules deferred to first use: {', '.join(deferred)}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the check and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Worker processes to take the median of")
+    parser.add_argument(
+        "--import-budget-ms", type=float, default=1500.0, help="Fail if the median import main takes longer"
+    )
+    parser.add_argument("--top", type=int, default=15, help="Rows in each import time table")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker()
+        return
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Benchmark of the chart data stream (GET /chart-data/{email}/stream).
+
+Runs the full application against the PostgREST stand-in and:
+
+1. opens --connections streams spread over --users users, counting the
+   database requests the connections cost and the memory they hold
+2. leaves them idle for --idle seconds, which must cost no database
+   requests while heartbeats keep arriving
+3. saves every user's data once and measures how long each stream takes
+   to receive the change, and how large the deltas are compared to the
+   snapshots
+4. opens a stream that stops reading, saves its user's data until the
+   stream is evicted, and checks the user's other streams are unaffected
+
+Exits with status 1 if any check fails.
+
+Heartbeats are sent every 2 s unless CHART_STREAM_HEARTBEAT_SECONDS is
+set in the environment. Memory per stream is measured with tracemalloc
+over the first --memory-sample streams opened, and includes the
+benchmark's own per-stream client state.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_stream [--connections N] [--users N] [--idle S]
+        [--memory-sample N]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("CHART_CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+os.environ.setdefault("CHART_STREAM_HEARTBEAT_SECONDS", "2")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import gc  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa: E402
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from benchmarks.postgrest_stub import PostgrestStub  # noqa: E402
+from core.chart_events import get_chart_event_hub  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.db import DatabaseClient, get_db_client  # noqa: E402
+from core.defaults import DEFAULT_CHART_DATA  # noqa: E402
+from main import app  # noqa: E402
+
+settings = get_settings()
+
+
+def make_document(revision: int) -> Dict[str, Any]:
+    """Build a dashboard document; revisions differ in one call type count."""
+    return {
+        **DEFAULT_CHART_DATA,
+        "daily_call_volume": list(range(90)),
+        "call_types": {"inbound": 120 + revision, "outbound": 80, "missed": 7},
+        "peak_hours": [{"hour": hour, "calls": hour * 3} for hour in range(24)],
+    }
+
+
+class StreamClient:
+    """
+    One open stream, driven through the ASGI interface.
+
+    Frames are parsed as they arrive. A ``slow`` client accepts the first
+    body chunk and then never finishes sending another, like a client
+    whose connection stopped draining.
+    """
+
+    def __init__(self, path: str, slow: bool = False):
+        self.path = path
+        self.slow = slow
+        self.status = 0
+        self.events: List[Tuple[float, str, bytes]] = []
+        self.heartbeats = 0
+        self.received_bytes = 0
+        self._buffer = b""
+        self._closed = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def open(self) -> None:
+        """Start the request."""
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Disconnect and wait for the application to finish the request."""
+        self._closed.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, 5)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+
+    @property
+    def done(self) -> bool:
+        """Whether the application ended the response."""
+        return self._task is not None and self._task.done()
+
+    def names(self) -> List[str]:
+        """Names of the events received so far."""
+        return [name for _, name, _ in self.events]
+
+    async def wait_until(self, predicate: Callable[["StreamClient"], bool], timeout: float) -> bool:
+        """Wait until ``predicate`` holds for this client; False on timeout."""
+        deadline = time.perf_counter() + timeout
+        while not predicate(self):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self.done:
+                return predicate(self)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    async def _run(self) -> None:
+        path, _, query = self.path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "scheme": "http",
+            "server": ("bench", 80),
+            "client": ("127.0.0.1", 1234),
+            "headers": [(b"accept", b"text/event-stream")],
+        }
+        requested = False
+        chunks = 0
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await self._closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal chunks
+            if message["type"] == "http.response.start":
+                self.status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks += 1
+                if self.slow and chunks > 1:
+                    await self._closed.wait()
+                self._feed(message.get("body", b""))
+
+        await app(scope, receive, send)
+        self._changed.set()
+
+    def _feed(self, data: bytes) -> None:
+        self.received_bytes += len(data)
+        self._buffer += data
+        now = time.perf_counter()
+        while b"\n\n" in self._buffer:
+            block, self._buffer = self._buffer.split(b"\n\n", 1)
+            if block.startswith(b":"):
+                self.heartbeats += 1
+                continue
+            name, payload = None, b""
+            for line in block.split(b"\n"):
+                if line.startswith(b"event: "):
+                    name = line[7:].decode()
+                elif line.startswith(b"data: "):
+                    payload = line[6:]
+            if name is not None:
+                self.events.append((now, name, payload))
+        self._changed.set()
+
+
+async def save(email: str, document: Dict[str, Any]) -> int:
+    """Save a user's document through the API; return the status code."""
+    body = orjson.dumps({"email": email, "chart_data": document})
+    return await call_asgi(app, "POST", "/api/v1/chart-data", body)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run every phase; return the exit status."""
+    stub = PostgrestStub()
+    emails = [f"stream-{i}@bench.example" for i in range(args.users)]
+    stub.seed_rows(make_document(0), emails)
+    database = DatabaseClient(transport=httpx.ASGITransport(app=stub.app))
+    app.dependency_overrides[get_db_client] = lambda: database
+    hub = get_chart_event_hub()
+    failures: List[str] = []
+    clients: List[StreamClient] = []
+
+    try:
+        async def connect(count: int) -> None:
+            batch = []
+            for i in range(len(clients), len(clients) + count):
+                client = StreamClient(f"/api/v1/chart-data/{emails[i % args.users]}/stream")
+                client.open()
+                batch.append(client)
+            clients.extend(batch)
+            for client in batch:
+                if not await client.wait_until(lambda c: "snapshot" in c.names(), 30):
+                    failures.append(f"stream {client.path} got no snapshot (status {client.status})")
+
+        # 1. Connect; memory is traced over a sample, as tracing slows everything down
+        calls_before = stub.calls
+        started = time.perf_counter()
+        gc.collect()
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        await connect(args.memory_sample)
+        gc.collect()
+        memory_per_stream = (tracemalloc.get_traced_memory()[0] - memory_before) / args.memory_sample
+        tracemalloc.stop()
+        await connect(args.connections - args.memory_sample)
+        connect_seconds = time.perf_counter() - started
+        connect_calls = stub.calls - calls_before
+
+        print(f"streams: {args.connections} over {args.users} users, queue size {settings.CHART_STREAM_QUEUE_SIZE}")
+        print(
+            f"connect: {connect_seconds:.2f}s, {connect_calls} database requests "
+            f"({connect_calls / args.connections:.3f} per stream), {memory_per_stream / 1024:.1f} KiB per stream"
+        )
+        if hub.connections != args.connections:
+            failures.append(f"hub holds {hub.connections} streams, expected {args.connections}")
+        if connect_calls > args.users:
+            failures.append(f"{connect_calls} database requests to open streams for {args.users} users")
+
+        # 2. Idle
+        calls_before = stub.calls
+        heartbeats_before = sum(client.heartbeats for client in clients)
+        await asyncio.sleep(args.idle)
+        idle_calls = stub.calls - calls_before
+        heartbeats = sum(client.heartbeats for client in clients) - heartbeats_before
+        print(f"idle {args.idle:.1f}s: {idle_calls} database requests, {heartbeats} heartbeats")
+        if idle_calls:
+            failures.append(f"{idle_calls} database requests while the streams were idle")
+        if args.idle >= settings.CHART_STREAM_HEARTBEAT_SECONDS * 2 and heartbeats < args.connections:
+            failures.append(f"only {heartbeats} heartbeats for {args.connections} idle streams")
+
+        # 3. Fan-out: one save per user, each waited for by all its streams
+        by_email: Dict[str, List[StreamClient]] = {}
+        for client in clients:
+            by_email.setdefault(client.path.split("/")[-2], []).append(client)
+        latencies: List[float] = []
+        patch_bytes: List[int] = []
+        calls_before = stub.calls
+        for email, streams in by_email.items():
+            saved_at = time.perf_counter()
+            status = await save(email, make_document(1))
+            if status != 200:
+                failures.append(f"save for {email} answered {status}")
+            for client in streams:
+                if not await client.wait_until(lambda c: len(c.events) >= 2, 5):
+                    failures.append(f"stream {client.path} did not receive the save")
+                    continue
+                received_at, name, payload = client.events[1]
+                if name != "patch":
+                    failures.append(f"stream {client.path} received {name} instead of a patch")
+                latencies.append(received_at - saved_at)
+                patch_bytes.append(len(payload))
+        save_calls = stub.calls - calls_before
+        snapshot_bytes = len(clients[0].events[0][2])
+        if latencies:
+            print(
+                f"fan-out: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 "
+                f"{percentile(latencies, 0.99) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms "
+                f"from save to stream ({save_calls} database requests for {args.users} saves)"
+            )
+            print(f"payload: {max(patch_bytes)} byte patches instead of {snapshot_bytes} byte snapshots")
+        if save_calls > args.users:
+            failures.append(f"{save_calls} database requests for {args.users} saves; streams must not read")
+
+        # 4. Slow consumer
+        email = emails[0]
+        slow = StreamClient(f"/api/v1/chart-data/{email}/stream", slow=True)
+        slow.open()
+        await slow.wait_until(lambda c: "snapshot" in c.names(), 5)
+        evictions_before = hub.evictions
+        # Frames in flight between the stream and the client are not queued
+        saves = settings.CHART_STREAM_QUEUE_SIZE * 2
+        for revision in range(2, 2 + saves):
+            await save(email, make_document(revision))
+        evicted = hub.evictions - evictions_before
+        healthy = by_email[email]
+        for client in healthy:
+            await client.wait_until(lambda c: len(c.events) >= 2 + saves, 5)
+        behind = [client for client in healthy if len(client.events) < 2 + saves]
+        print(f"slow consumer: {evicted} evicted after {saves} saves; the user's other streams received every save")
+        if evicted != 1:
+            failures.append(f"{evicted} evictions for one slow stream")
+        if behind:
+            failures.append(f"{len(behind)} healthy streams missed events while a slow one was evicted")
+        await slow.close()
+        if not slow.done:
+            failures.append("the evicted stream's response did not end")
+
+        # Disconnect
+        await asyncio.gather(*(client.close() for client in clients))
+        await asyncio.sleep(0)
+        if hub.connections:
+            failures.append(f"{hub.connections} streams still subscribed after every client disconnected")
+        print(f"hub after disconnect: {hub.stats()}")
+    finally:
+        for client in clients:
+            await client.close()
+        app.dependency_overrides.pop(get_db_client, None)
+        await database.close()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("\nAll checks passed")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and exit with its status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--connections", type=int, default=5000, help="Streams to open")
+    parser.add_argument("--users", type=int, default=500, help="Users the streams are spread over")
+    parser.add_argument("--idle", type=float, default=5.0, help="Seconds the streams stay idle")
+    parser.add_argument("--memory-sample", type=int, default=200, help="Streams opened with memory tracing")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Micro-benchmark of chart data request validation.
+
+Compares three ways of turning a POST /chart-data body into a validated
+document, for a default-sized document, a year of daily points and the
+largest document the schema accepts:
+
+- untyped: ``orjson.loads`` then the previous ``Dict[str, Any]`` request
+  model (what FastAPI did before ChartData)
+- typed: ``orjson.loads`` then the strict ChartData request model
+  (``json_body``, used by the endpoints)
+- typed-json: the strict model validating the raw bytes with pydantic's
+  own JSON parser
+
+It also times the rejection of invalid bodies: a wrong type at the end of
+the largest document, JSON nested 5000 levels deep (refused by the
+JSON_MAX_DEPTH check before it is parsed), and a body over
+CHART_DATA_MAX_BODY_BYTES (refused before it is read in full).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_validation [--seconds S]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Callable, Dict, List, Tuple  # noqa: E402
+
+import orjson  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from fastapi.exceptions import RequestValidationError  # noqa: E402
+from pydantic import BaseModel, TypeAdapter  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from api.v1.chart_data import ChartDataRequest  # noqa: E402
+from core.config import get_settings  # noqa: E402
+from core.defaults import DEFAULT_CHART_DATA  # noqa: E402
+from core.serialization import json_body  # noqa: E402
+
+settings = get_settings()
+
+
+class UntypedChartDataRequest(BaseModel):
+    """The request model before ChartData."""
+    email: str
+    chart_data: Dict[str, Any]
+
+
+def make_document(points: int, agents: int) -> Dict[str, Any]:
+    """Build a valid document with ``points`` per series and ``agents`` agents."""
+    return {
+        "daily_call_volume": [40 + i % 50 for i in range(points)],
+        "average_call_duration": [120.5 + i % 30 for i in range(points)],
+        "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
+        "agent_performance": [
+            {"name": f"Agent {i}", "calls": 100 + i, "rating": 4.5} for i in range(agents)
+        ],
+        "conversion_rate": [70 + i % 10 for i in range(points)],
+        "call_types": {"inbound": 120, "outbound": 80, "missed": 7},
+        "peak_hours": [{"hour": hour, "calls": hour * 3} for hour in range(24)],
+    }
+
+
+def request_for(body: bytes) -> Request:
+    """Build a request that delivers ``body``."""
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    headers = [(b"content-length", str(len(body)).encode())]
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def rate(call: Callable[[], Any], seconds: float) -> float:
+    """Calls per second of ``call``, run repeatedly for about ``seconds``."""
+    call()  # warm up
+    count, start = 0, time.perf_counter()
+    while True:
+        call()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def rejected(parse: Callable[[Request], Any], body: bytes) -> Callable[[], int]:
+    """Wrap a body dependency as a call returning the status it answers with."""
+    def call() -> int:
+        try:
+            asyncio.run(parse(request_for(body)))
+        except HTTPException as e:
+            return e.status_code
+        except RequestValidationError:
+            return 422
+        return 200
+    return call
+
+
+def run(seconds: float) -> Tuple[List[Tuple[str, int, Dict[str, float]]], List[Tuple[str, int, int, float]]]:
+    """Time every variant; return the valid-body and invalid-body rows."""
+    untyped = TypeAdapter(UntypedChartDataRequest)
+    typed = TypeAdapter(ChartDataRequest)
+    cases = [
+        ("default", DEFAULT_CHART_DATA),
+        ("year", make_document(365, 20)),
+        ("max", make_document(settings.CHART_DATA_MAX_SERIES_LENGTH, settings.CHART_DATA_MAX_AGENTS)),
+    ]
+    valid = []
+    for label, document in cases:
+        body = orjson.dumps({"email": "bench@example.com", "chart_data": document})
+        variants = {
+            "untyped": lambda: untyped.validate_python(orjson.loads(body)),
+            "typed": lambda: typed.validate_python(orjson.loads(body)),
+            "typed-json": lambda: typed.validate_json(body),
+        }
+        valid.append((label, len(body), {name: rate(call, seconds) for name, call in variants.items()}))
+
+    parse = json_body(ChartDataRequest, settings.CHART_DATA_MAX_BODY_BYTES)
+    largest = make_document(settings.CHART_DATA_MAX_SERIES_LENGTH, settings.CHART_DATA_MAX_AGENTS)
+    largest["conversion_rate"][-1] = "70"
+    nested = b'{"email":"bench@example.com","chart_data":{"daily_call_volume":' + b"[" * 5000 + b"]" * 5000 + b"}}"
+    oversized = b" " * (settings.CHART_DATA_MAX_BODY_BYTES + 1)
+    invalid = []
+    for label, body in (
+        ("wrong type", orjson.dumps({"email": "bench@example.com", "chart_data": largest})),
+        ("nested", nested),
+        ("oversized", oversized),
+    ):
+        call = rejected(parse, body)
+        invalid.append((label, len(body), call(), rate(call, seconds)))
+    return valid, invalid
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the tables."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time spent on each measurement")
+    args = parser.parse_args()
+
+    valid, invalid = run(args.seconds)
+    print(f"{'document':>9} {'bytes':>8} {'variant':>10} {'docs/s':>9} {'MB/s':>7}")
+    for label, size, rates in valid:
+        for variant, per_second in rates.items():
+            print(f"{label:>9} {size:>8} {variant:>10} {per_second:>9.0f} {per_second * size / 1e6:>7.1f}")
+    print(f"\n{'invalid':>10} {'bytes':>8} {'status':>6} {'rejects/s':>10}")
+    for label, size, status, per_second in invalid:
+        print(f"{label:>10} {size:>8} {status:>6} {per_second:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark for webhook deduplication under a retry storm.
+
+Replays every transaction DUPLICATES times (10 by default), shuffled and
+sent concurrently, against the webhook router, once with the idempotency
+index and once with it disabled. Reports request latency for first and
+repeated deliveries, how many deliveries were queued, and how many
+database writes the workers issued.
+
+The database is replaced by an in-process counter and the processing
+delay is zero, so the numbers isolate the ingestion path.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_webhook_dedup [--transactions N] [--duplicates D]
+"""
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import random  # noqa: E402
+import statistics  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Dict, List  # noqa: E402
+
+import orjson  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from benchmarks.asgi import call_asgi  # noqa: E402
+from api.v1.webhook import router as webhook_router  # noqa: E402
+from core.cache import TTLCache  # noqa: E402
+from helper.transaction_processor import TransactionProcessor, get_transaction_processor  # noqa: E402
+
+
+class CountingDatabase:
+    """Stands in for DatabaseClient and counts transaction writes."""
+
+    def __init__(self):
+        self.writes = 0
+
+    async def save_transaction(self, transaction: Dict[str, Any]) -> None:
+        self.writes += 1
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_storm(transactions: int, duplicates: int, dedup: bool, concurrency: int) -> Dict[str, Any]:
+    """
+    Replay a duplicate storm and collect the results.
+
+    Args:
+        transactions: Number of distinct transactions
+        duplicates: Deliveries per transaction
+        dedup: Whether the idempotency index is enabled
+        concurrency: Requests in flight at once
+
+    Returns:
+        Dict of counters and latency percentiles
+    """
+    database = CountingDatabase()
+    processor = TransactionProcessor(
+        database,
+        workers=8,
+        queue_size=transactions * duplicates,
+        delay_seconds=0,
+        max_retries=0,
+        retry_base_delay=0,
+        retry_max_delay=0,
+        idempotency_index=TTLCache(
+            max_entries=transactions * 2 if dedup else 0,
+            max_bytes=64 * 1024 * 1024,
+            ttl_seconds=3600,
+            negative_ttl_seconds=0
+        )
+    )
+    app = FastAPI()
+    app.include_router(webhook_router, prefix="/v1")
+    app.dependency_overrides[get_transaction_processor] = lambda: processor
+
+    bodies = [
+        orjson.dumps({
+            "transaction_id": f"txn_{i}",
+            "source_account": "acc_user_789",
+            "destination_account": "acc_merchant_456",
+            "amount": 1500,
+            "currency": "INR"
+        })
+        for i in range(transactions)
+    ]
+    deliveries = [(i, body) for i, body in enumerate(bodies) for _ in range(duplicates)]
+    random.Random(42).shuffle(deliveries)
+
+    seen = set()
+    first: List[float] = []
+    repeat: List[float] = []
+    statuses: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def deliver(index: int, body: bytes) -> None:
+        async with semaphore:
+            is_first = index not in seen
+            seen.add(index)
+            start = time.perf_counter()
+            status = await call_asgi(app, "POST", "/v1/webhook/transaction", body)
+            (first if is_first else repeat).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    processor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(deliver(index, body) for index, body in deliveries))
+    elapsed = time.perf_counter() - start
+    await processor.stop(timeout=30)
+
+    return {
+        "dedup": dedup,
+        "requests": len(deliveries),
+        "statuses": statuses,
+        "req_per_s": len(deliveries) / elapsed,
+        "first_p50_ms": statistics.median(first) * 1000,
+        "first_p99_ms": percentile(first, 0.99) * 1000,
+        "repeat_p50_ms": statistics.median(repeat) * 1000 if repeat else 0.0,
+        "repeat_p99_ms": percentile(repeat, 0.99) * 1000 if repeat else 0.0,
+        "db_writes": database.writes,
+    }
+
+
+def main() -> None:
+    """Parse arguments, run both variants and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--duplicates", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.transactions} transactions x {args.duplicates} deliveries, concurrency {args.concurrency}")
+    print(f"{'index':>6} {'req/s':>8} {'first p50/p99 ms':>17} {'repeat p50/p99 ms':>18} {'db writes':>10}  statuses")
+    for dedup in (False, True):
+        result = asyncio.run(run_storm(args.transactions, args.duplicates, dedup, args.concurrency))
+        print(
+            f"{'on' if dedup else 'off':>6} {result['req_per_s']:>8.0f} "
+            f"{result['first_p50_ms']:>8.2f}/{result['first_p99_ms']:<8.2f} "
+            f"{result['repeat_p50_ms']:>9.2f}/{result['repeat_p99_ms']:<8.2f} "
+            f"{result['db_writes']:>10}  {result['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
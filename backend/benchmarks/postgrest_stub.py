@@ -0,0 +1,234 @@
+"""
+In-process stand-in for the Supabase PostgREST API.
+
+Implements the subset of PostgREST that DatabaseClient uses on the chart
+data table and the merge patch function, holding rows in memory and
+delaying every response by a configurable latency. Plug it in with
+``DatabaseClient(transport=httpx.ASGITransport(app=stub.app))`` so
+benchmarks exercise the real client, query building and serialization
+without a network or a database.
+
+Faults are injected by changing the public attributes while it runs:
+``error_rate`` answers that share of requests with ``error_status`` and
+the error PostgREST returns when it cannot reach Postgres, raising
+``latency_ms`` above DB_TIMEOUT_SECONDS makes requests time out, and
+``slow_emails`` holds the table queries of chosen users for longer.
+"""
+import asyncio
+import datetime
+import random
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+
+import orjson
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from core.config import get_settings
+
+settings = get_settings()
+
+# Query parameters that are not column filters
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns", "or"}
+
+# The keyset condition list_users_page sends for its cursor
+_KEYSET = re.compile(r'^\(updated_at\.gt\."([^"]+)",and\(updated_at\.eq\."([^"]+)",id\.gt\.([^)]+)\)\)$')
+
+
+def _now() -> str:
+    """Current time in the format PostgREST returns timestamps in."""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _merge_patch(target: Any, patch: Any) -> Any:
+    """Apply an RFC 7386 merge patch, as the jsonb_merge_patch SQL function does."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge_patch(result.get(key), value)
+    return result
+
+
+class PostgrestStub:
+    """
+    Chart data table and merge patch RPC served from memory.
+
+    Attributes:
+        rows: Stored rows keyed by email
+        app: ASGI application answering PostgREST requests
+        calls: Number of requests received
+        latency_ms: Delay added to every response
+        jitter_ms: Maximum random delay added on top of ``latency_ms``
+        error_rate: Share of requests answered with an error (0 to 1)
+        error_status: HTTP status of injected errors
+        slow_emails: Extra delay in milliseconds for table requests
+            filtered on one of these emails
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        seed: Optional[int] = None,
+        error_rate: float = 0.0,
+        error_status: int = 503
+    ):
+        """
+        Initialize the stub.
+
+        Args:
+            latency_ms: Delay added to every response
+            jitter_ms: Maximum random delay added on top of ``latency_ms``
+            seed: Seed for the jitter and injected errors, for reproducible runs
+            error_rate: Share of requests answered with an error
+            error_status: HTTP status of injected errors
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_emails: Dict[str, float] = {}
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.app = Starlette(routes=[
+            Route(f"/rest/v1/{settings.CHART_DATA_TABLE}", self._table,
+                  methods=["GET", "POST", "PATCH", "DELETE"]),
+            Route(f"/rest/v1/rpc/{settings.CHART_DATA_MERGE_PATCH_RPC}", self._merge_patch_rpc,
+                  methods=["POST"]),
+        ])
+
+    def seed_rows(self, chart_data: Dict[str, Any], emails: List[str]) -> None:
+        """
+        Store the same chart data for each email.
+
+        Args:
+            chart_data: Document to store
+            emails: Users to create rows for
+        """
+        for email in emails:
+            self.rows[email] = self._new_row({"email": email, "chart_data": chart_data})
+
+    async def delay(self) -> Optional[Response]:
+        """
+        Wait for the configured latency plus jitter, then decide whether to fail.
+
+        Returns:
+            An injected error response, or None to answer normally
+        """
+        self.calls += 1
+        delay_ms = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self._json({
+                "code": "PGRST001",
+                "message": "Database client error. Retrying the connection.",
+                "details": "injected fault",
+                "hint": None,
+            }, self.error_status)
+        return None
+
+    @staticmethod
+    def _new_row(values: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now()
+        return {"id": str(uuid.uuid4()), "series": {}, "created_at": now, "updated_at": now, **values}
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], filters: Dict[str, str]) -> bool:
+        """Evaluate ``eq`` and ``in`` filters against a row."""
+        for column, condition in filters.items():
+            operator, _, operand = condition.partition(".")
+            value = row.get(column)
+            if operator == "eq" and str(value) != operand:
+                return False
+            if operator == "in" and value not in [item.strip('"') for item in operand.strip("()").split(",")]:
+                return False
+        return True
+
+    @staticmethod
+    def _project(row: Dict[str, Any], select: Optional[str]) -> Dict[str, Any]:
+        if not select or select == "*":
+            return dict(row)
+        return {column.strip(): row.get(column.strip()) for column in select.split(",")}
+
+    @staticmethod
+    def _json(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+        return Response(orjson.dumps(content), status_code=status_code, headers=headers,
+                        media_type="application/json")
+
+    async def _table(self, request: Request) -> Response:
+        params = request.query_params
+        slow_ms = self.slow_emails.get(params.get("email", "").partition(".")[2])
+        if slow_ms:
+            await asyncio.sleep(slow_ms / 1000)
+        fault = await self.delay()
+        if fault is not None:
+            return fault
+        select = params.get("select")
+        filters = {key: value for key, value in params.items() if key not in _RESERVED_PARAMS}
+        matched = [row for row in self.rows.values() if self._matches(row, filters)]
+
+        if request.method == "GET":
+            if "order" in params:
+                matched.sort(key=lambda row: (row["updated_at"], row["id"]))
+            if "or" in params:
+                keyset = _KEYSET.match(params["or"])
+                if keyset is None:
+                    return self._json({"message": "unsupported or filter"}, 400)
+                updated_at, _, row_id = keyset.groups()
+                matched = [row for row in matched if (row["updated_at"], row["id"]) > (updated_at, row_id)]
+            total = len(matched)
+            if "limit" in params:
+                matched = matched[:int(params["limit"])]
+            headers = {}
+            if "count=" in request.headers.get("prefer", ""):
+                headers["content-range"] = f"0-{max(0, len(matched) - 1)}/{total}"
+            return self._json([self._project(row, select) for row in matched], headers=headers)
+
+        if request.method == "DELETE":
+            for row in matched:
+                self.rows.pop(row["email"], None)
+            return self._json([self._project(row, select) for row in matched])
+
+        body = orjson.loads(await request.body() or b"null")
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(body, updated_at=_now())
+            return self._json([self._project(row, select) for row in matched])
+
+        # POST: insert, or upsert on email with Prefer: resolution=merge-duplicates
+        merge = "merge-duplicates" in request.headers.get("prefer", "")
+        written = []
+        for item in body if isinstance(body, list) else [body]:
+            existing = self.rows.get(item["email"])
+            if existing is not None and not merge:
+                return self._json({"code": "23505", "message": "duplicate key value"}, 409)
+            if existing is not None:
+                existing.update(item, updated_at=_now())
+            else:
+                self.rows[item["email"]] = self._new_row(item)
+            written.append(self._project(self.rows[item["email"]], select))
+        return self._json(written, 201)
+
+    async def _merge_patch_rpc(self, request: Request) -> Response:
+        fault = await self.delay()
+        if fault is not None:
+            return fault
+        args = orjson.loads(await request.body())
+        row = self.rows.get(args["p_email"])
+        expected = args.get("p_expected_updated_at")
+        if row is None or (expected and row["updated_at"] != expected):
+            return self._json([])
+        row["chart_data"] = _merge_patch(row["chart_data"], args["p_patch"])
+        if args.get("p_series") is not None:
+            row["series"] = _merge_patch(row.get("series") or {}, args["p_series"])
+        row["updated_at"] = _now()
+        return self._json([{"updated_at": row["updated_at"]}])
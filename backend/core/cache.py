@@ -0,0 +1,684 @@
+"""
+Caching for chart data reads.
+
+This module provides a read-through cache that sits in front of the chart
+data queries. Concurrent misses for the same key share a single load, and
+missing users are cached negatively so new users falling back to the
+default dataset do not hit the database on every dashboard refresh.
+
+Storage is pluggable: the in-memory backend keeps a bounded LRU/TTL cache
+per process, while the Redis backend shares entries between workers and
+broadcasts invalidations so every worker drops its local copy on writes.
+Redis failures never fail a request: reads fall through to the database
+and writes carry on without the cache.
+"""
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import orjson
+
+from core.logger import get_logger
+from core.metrics import CACHE_BACKEND_ERRORS, CACHE_LOOKUPS
+
+logger = get_logger(__name__)
+
+
+class _Missing:
+    """Sentinel type marking a negatively cached key."""
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    Encode a cached value as compact JSON.
+
+    Args:
+        value: Value about to be cached
+
+    Returns:
+        bytes: The value's JSON encoding
+    """
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry expiry.
+
+    Entries are evicted least-recently-used first once either the entry
+    count or the approximate byte ceiling is exceeded. Expired entries are
+    dropped lazily when they are looked up.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of keys held at once
+            max_bytes: Approximate memory ceiling for cached values
+            ttl_seconds: Lifetime of a cached value
+            negative_ttl_seconds: Lifetime of a cached "not found" marker
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _sizeof(value: Any) -> int:
+        """
+        Estimate the memory footprint of a value by its compact JSON size
+        (or its length, for already encoded bytes).
+
+        Args:
+            value: Value about to be cached
+
+        Returns:
+            int: Approximate size in bytes
+        """
+        if value is MISSING:
+            return 0
+        if isinstance(value, bytes):
+            return len(value)
+        return len(encode_value(value))
+
+    def get(self, key: str) -> Any:
+        """
+        Look up a key without loading it.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, MISSING for a negative entry, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, size: Optional[int] = None) -> None:
+        """
+        Store a value, or MISSING to cache a "not found" result.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            size: The value's size when the caller already encoded it
+        """
+        ttl = self.negative_ttl_seconds if value is MISSING else self.ttl_seconds
+        if ttl <= 0:
+            self._remove(key)
+            return
+
+        if size is None:
+            size = self._sizeof(value)
+        if size > self.max_bytes:
+            self._remove(key)
+            return
+
+        self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drop a key.
+
+        Args:
+            key: Cache key
+        """
+        self._remove(key)
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        """Remove a key and release its accounted size."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters and occupancy.
+
+        Returns:
+            Dict with hit/miss/eviction counters, hit ratio and current size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes
+        }
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface used by the read-through chart data cache.
+
+    ``get`` returns None on a miss and MISSING for a negatively cached key.
+    ``invalidate`` must evict the key for every worker sharing the cache.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        """Look up a key."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value, or MISSING for a "not found" result."""
+
+    @abstractmethod
+    async def invalidate(self, key: str) -> None:
+        """Evict a key everywhere."""
+
+    async def start(self, on_invalidate: Callable[[str], None]) -> None:
+        """
+        Start background work such as invalidation subscriptions.
+
+        Args:
+            on_invalidate: Called with the key when another worker invalidates it
+        """
+
+    async def close(self) -> None:
+        """Release connections and stop background work."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Get backend counters."""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process backend storing entries in a TTLCache."""
+
+    def __init__(self, store: TTLCache):
+        """
+        Initialize the backend.
+
+        Args:
+            store: The local LRU/TTL store
+        """
+        self.store = store
+
+    async def get(self, key: str) -> Any:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        self.store.set(key, value)
+
+    async def invalidate(self, key: str) -> None:
+        self.store.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self.store.stats()}
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared backend storing entries in Redis with a short-lived local tier.
+
+    Every worker keeps a small TTLCache in front of Redis to avoid a network
+    hop on hot keys. Invalidations delete the Redis key and are published on
+    a channel; each worker's subscriber evicts its local copy, so a save
+    handled by one worker is visible to all of them.
+
+    The local tier is only used while the subscription is up. When it
+    drops, the tier is cleared and bypassed, and the subscriber reconnects
+    with exponential backoff. A failed Redis read counts as a miss and a
+    failed write is skipped. Keys whose invalidation failed are not read
+    from Redis until a retry after reconnecting succeeds.
+    """
+
+    _MISSING_PAYLOAD = b'{"missing":true}'
+    _VALUE_PREFIX = b'{"value":'
+
+    def __init__(
+        self,
+        redis_client: Any,
+        local: TTLCache,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        prefix: str = "chart_data:",
+        reconnect_min_seconds: float = 0.5,
+        reconnect_max_seconds: float = 30.0
+    ):
+        """
+        Initialize the backend.
+
+        Args:
+            redis_client: A ``redis.asyncio.Redis`` compatible client
+            local: Per-worker TTLCache used as the first tier
+            ttl_seconds: Lifetime of a value stored in Redis
+            negative_ttl_seconds: Lifetime of a "not found" marker in Redis
+            prefix: Namespace for keys and the invalidation channel
+            reconnect_min_seconds: First delay before resubscribing after a failure
+            reconnect_max_seconds: Longest delay between resubscribe attempts
+        """
+        self.redis = redis_client
+        self.local = local
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+        self.instance_id = uuid.uuid4().hex
+        self.reconnect_min_seconds = reconnect_min_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self._listener: Optional[asyncio.Task] = None
+        # Whether the invalidation subscription is up, so the local tier is safe
+        self.subscribed = False
+        self._pending_invalidations: Set[str] = set()
+        self._failing = False
+
+        self.remote_hits = 0
+        self.remote_misses = 0
+        self.invalidations_received = 0
+        self.errors = 0
+        self.reconnects = 0
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        """Count a failed Redis call, warning when failures start."""
+        self.errors += 1
+        CACHE_BACKEND_ERRORS.labels(operation).inc()
+        if not self._failing:
+            self._failing = True
+            logger.warning("Redis cache call failed, using the database", extra={
+                "operation": operation, "error": str(error)
+            })
+
+    def _succeeded(self) -> None:
+        """Note a working Redis call after failures."""
+        if self._failing:
+            self._failing = False
+            logger.info("Redis cache recovered")
+
+    async def get(self, key: str) -> Any:
+        if self.subscribed:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        if key in self._pending_invalidations:
+            return None
+
+        try:
+            raw = await self.redis.get(self.prefix + key)
+        except Exception as e:
+            self._failed("get", e)
+            return None
+        self._succeeded()
+        if raw is None:
+            self.remote_misses += 1
+            return None
+
+        self.remote_hits += 1
+        if raw == self._MISSING_PAYLOAD:
+            value, size = MISSING, None
+        else:
+            value = orjson.loads(raw)["value"]
+            size = len(raw) - len(self._VALUE_PREFIX) - 1
+        if self.subscribed:
+            self.local.set(key, value, size=size)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        if value is MISSING:
+            encoded, payload, ttl = None, self._MISSING_PAYLOAD, self.negative_ttl_seconds
+        else:
+            # One encoding sizes the local entry and is the Redis payload
+            encoded = encode_value(value)
+            payload, ttl = self._VALUE_PREFIX + encoded + b"}", self.ttl_seconds
+        if self.subscribed:
+            self.local.set(key, value, size=None if encoded is None else len(encoded))
+        if ttl <= 0 or key in self._pending_invalidations:
+            return
+        try:
+            await self.redis.set(self.prefix + key, payload, px=int(ttl * 1000))
+        except Exception as e:
+            self._failed("set", e)
+            return
+        self._succeeded()
+
+    async def invalidate(self, key: str) -> None:
+        self.local.invalidate(key)
+        if not await self._send_invalidation(key):
+            self._pending_invalidations.add(key)
+
+    async def _send_invalidation(self, key: str) -> bool:
+        """
+        Delete a key from Redis and tell the other workers, in one round trip.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            bool: Whether Redis accepted both commands
+        """
+        try:
+            await (
+                self.redis.pipeline(transaction=False)
+                .delete(self.prefix + key)
+                .publish(self.channel, f"{self.instance_id}:{key}")
+                .execute()
+            )
+        except Exception as e:
+            self._failed("invalidate", e)
+            return False
+        self._succeeded()
+        return True
+
+    async def start(self, on_invalidate: Callable[[str], None]) -> None:
+        self._listener = asyncio.create_task(self._listen(on_invalidate))
+
+    async def _listen(self, on_invalidate: Callable[[str], None]) -> None:
+        """
+        Evict keys invalidated by other workers until cancelled.
+
+        Resubscribes with exponential backoff whenever the connection fails.
+
+        Args:
+            on_invalidate: Callback for each remotely invalidated key
+        """
+        delay = self.reconnect_min_seconds
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self.subscribed = True
+                delay = self.reconnect_min_seconds
+                if self.reconnects:
+                    logger.info("Cache invalidation subscription restored")
+                while True:
+                    # Retried here, once Redis is reachable again
+                    for key in list(self._pending_invalidations):
+                        if await self._send_invalidation(key):
+                            self._pending_invalidations.discard(key)
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    origin, _, key = data.partition(":")
+                    if origin == self.instance_id:
+                        continue
+                    self.invalidations_received += 1
+                    self.local.invalidate(key)
+                    on_invalidate(key)
+            except Exception as e:
+                CACHE_BACKEND_ERRORS.labels("subscribe").inc()
+                if self.subscribed or not self.reconnects:
+                    logger.warning("Cache invalidation subscription down, bypassing the local tier", extra={
+                        "error": str(e), "retry_seconds": delay
+                    })
+            finally:
+                # Invalidations sent while unsubscribed are missed
+                self.subscribed = False
+                self.local.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_seconds)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "subscribed": self.subscribed,
+            "remote_hits": self.remote_hits,
+            "remote_misses": self.remote_misses,
+            "invalidations_received": self.invalidations_received,
+            "pending_invalidations": len(self._pending_invalidations),
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            **self.local.stats()
+        }
+
+
+class ReadThroughCache:
+    """
+    Read-through cache with single-flight loading over a CacheBackend.
+
+    Concurrent misses for the same key share one load. A write that
+    invalidates a key while a load is in flight detaches that load, so
+    its possibly stale result is returned to its waiters but never stored.
+    """
+
+    def __init__(self, backend: CacheBackend, name: str = "default"):
+        """
+        Initialize the cache.
+
+        Args:
+            backend: Storage backend for cached values
+            name: Cache name used as the metrics label
+        """
+        self.backend = backend
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def start(self) -> None:
+        """Start the backend's background work."""
+        await self.backend.start(self._detach)
+
+    async def close(self) -> None:
+        """Close the backend."""
+        await self.backend.close()
+
+    def _detach(self, key: str) -> None:
+        """Forget an in-flight load so its result is not stored."""
+        self._inflight.pop(key, None)
+
+    async def peek(self, key: str) -> Any:
+        """
+        Look up a key without loading it on a miss.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, MISSING for a negative entry, or None on a miss
+        """
+        value = await self.backend.get(key)
+        self._record(value)
+        return value
+
+    def _record(self, value: Any) -> None:
+        """Count a lookup result in the cache metrics."""
+        if value is None:
+            result = "miss"
+        elif value is MISSING:
+            result = "negative_hit"
+        else:
+            result = "hit"
+        CACHE_LOOKUPS.labels(self.name, result).inc()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return a cached value, loading it at most once for concurrent callers.
+
+        The loader should return None when the key does not exist; that
+        result is cached negatively. Loader exceptions propagate to every
+        waiting caller and are never cached.
+
+        Args:
+            key: Cache key
+            loader: Coroutine factory that fetches the value on a miss
+
+        Returns:
+            The cached or freshly loaded value, or None if it does not exist
+        """
+        value = await self.backend.get(key)
+        if value is not None:
+            self._record(value)
+            return None if value is MISSING else value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            CACHE_LOOKUPS.labels(self.name, "coalesced").inc()
+        else:
+            CACHE_LOOKUPS.labels(self.name, "miss").inc()
+            # Run the load as its own task so a cancelled caller does not
+            # cancel the query other callers are waiting on
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a loader and store its result unless the key was invalidated.
+
+        Args:
+            key: Cache key being loaded
+            loader: Coroutine factory that fetches the value
+
+        Returns:
+            The loaded value
+        """
+        this_task = asyncio.current_task()
+        try:
+            value = await loader()
+        except BaseException:
+            if self._inflight.get(key) is this_task:
+                del self._inflight[key]
+            raise
+
+        if self._inflight.get(key) is this_task:
+            del self._inflight[key]
+            try:
+                await self.backend.set(key, MISSING if value is None else value)
+            except Exception as e:
+                logger.warning("Cache store failed", extra={"key": key, "error": str(e)})
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Store a value directly, e.g. MISSING after a delete.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        self._detach(key)
+        await self.backend.set(key, value)
+
+    async def invalidate(self, key: str) -> None:
+        """
+        Evict a key for every worker and detach any in-flight load.
+
+        Args:
+            key: Cache key
+        """
+        self._detach(key)
+        await self.backend.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters from the backend.
+
+        Returns:
+            Dict with hit/miss/eviction counters and occupancy
+        """
+        return {"inflight": len(self._inflight), **self.backend.stats()}
+
+
+def create_chart_data_cache(settings: Any) -> Optional[ReadThroughCache]:
+    """
+    Build the chart data cache selected by the application settings.
+
+    Args:
+        settings: Application settings instance
+
+    Returns:
+        ReadThroughCache or None when caching is disabled
+
+    Raises:
+        ValueError: If CHART_CACHE_BACKEND names an unknown backend
+    """
+    if not settings.CHART_CACHE_ENABLED:
+        return None
+
+    if settings.CHART_CACHE_BACKEND == "memory":
+        return ReadThroughCache(MemoryCacheBackend(TTLCache(
+            max_entries=settings.CHART_CACHE_MAX_ENTRIES,
+            max_bytes=settings.CHART_CACHE_MAX_BYTES,
+            ttl_seconds=settings.CHART_CACHE_TTL_SECONDS,
+            negative_ttl_seconds=settings.CHART_CACHE_NEGATIVE_TTL_SECONDS
+        )), name="chart_data")
+
+    if settings.CHART_CACHE_BACKEND == "redis":
+        import redis.asyncio as redis_asyncio
+
+        local_ttl = min(settings.CHART_CACHE_LOCAL_TTL_SECONDS, settings.CHART_CACHE_TTL_SECONDS)
+        return ReadThroughCache(RedisCacheBackend(
+            redis_asyncio.from_url(settings.REDIS_URL),
+            local=TTLCache(
+                max_entries=settings.CHART_CACHE_MAX_ENTRIES,
+                max_bytes=settings.CHART_CACHE_MAX_BYTES,
+                ttl_seconds=local_ttl,
+                negative_ttl_seconds=min(local_ttl, settings.CHART_CACHE_NEGATIVE_TTL_SECONDS)
+            ),
+            ttl_seconds=settings.CHART_CACHE_TTL_SECONDS,
+            negative_ttl_seconds=settings.CHART_CACHE_NEGATIVE_TTL_SECONDS,
+            prefix=settings.CHART_CACHE_REDIS_PREFIX
+        ), name="chart_data")
+
+    raise ValueError(f"Unknown CHART_CACHE_BACKEND: {settings.CHART_CACHE_BACKEND}")
@@ -0,0 +1,442 @@
+"""
+Chart data change events for streaming clients.
+
+DatabaseClient publishes an event to the hub whenever it changes a user's
+chart data (a save, a patch or a delete). The hub fans each event out to
+the connections subscribed to that user as an encoded Server-Sent Events
+frame. The frame is built once and shared by every connection.
+
+Events carry deltas rather than documents. For every user with
+subscribers, the hub keeps the document its subscribers last received.
+A save is turned into the RFC 7396 merge patch from that document. A
+patch is forwarded as it is. A client without a document yet, or one
+whose document a patch cannot express, gets a full snapshot.
+
+Every connection has a bounded queue. A connection that falls
+CHART_STREAM_QUEUE_SIZE events behind is evicted rather than buffered
+without limit. Its client reconnects and starts over from a snapshot.
+
+With CHART_STREAM_BACKEND=redis, events are also published on a Redis
+channel, so subscribers connected to other workers receive saves handled
+by this one. If the subscription to that channel drops, it is retried
+with backoff, and subscribers are told to reload once it is back.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set, Tuple
+
+import orjson
+
+from core.config import get_settings
+from core.logger import get_logger
+from core.metrics import CHART_STREAM_CONNECTIONS, CHART_STREAM_EVENTS, CHART_STREAM_EVICTIONS
+from helper.merge_patch import apply_merge_patch, diff_merge_patch
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Queue item: the event's row version and its encoded frame; None evicts
+QueueItem = Optional[Tuple[Optional[str], bytes]]
+
+
+def encode_event(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> bytes:
+    """
+    Encode one Server-Sent Events frame.
+
+    Args:
+        event: Event type
+        data: JSON payload
+        event_id: Value clients send back as Last-Event-ID when reconnecting
+
+    Returns:
+        The frame, terminated by a blank line
+    """
+    frame = b"event: " + event.encode() + b"\n"
+    if event_id is not None:
+        frame += b"id: " + event_id.encode() + b"\n"
+    return frame + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscription:
+    """One streaming connection's place in the hub."""
+
+    __slots__ = ("email", "queue", "evicted")
+
+    def __init__(self, email: str, queue_size: int):
+        self.email = email
+        self.queue: "asyncio.Queue[QueueItem]" = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+
+class _Topic:
+    """Subscribers of one user and the document they were last sent."""
+
+    __slots__ = ("subscribers", "document", "version")
+
+    def __init__(self):
+        self.subscribers: Set[Subscription] = set()
+        self.document: Optional[Dict[str, Any]] = None
+        self.version: Optional[str] = None
+
+
+class RedisEventBridge:
+    """
+    Relays events between the hubs of several workers over Redis pub/sub.
+
+    The subscription is re-established with exponential backoff whenever
+    it fails. Events published by other workers in the meantime are lost,
+    so once it is back the hub tells its subscribers to reload.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        channel: str,
+        reconnect_min_seconds: float = 0.5,
+        reconnect_max_seconds: float = 30.0
+    ):
+        """
+        Initialize the bridge.
+
+        Args:
+            redis_client: A ``redis.asyncio.Redis`` compatible client
+            channel: Pub/sub channel shared by all workers
+            reconnect_min_seconds: First delay before resubscribing after a failure
+            reconnect_max_seconds: Longest delay between resubscribe attempts
+        """
+        self.redis = redis_client
+        self.channel = channel
+        self.instance_id = uuid.uuid4().hex
+        self.reconnect_min_seconds = reconnect_min_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self._listener: Optional[asyncio.Task] = None
+        self.subscribed = False
+        self.received = 0
+        self.reconnects = 0
+        self.errors = 0
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        """Send an event to the other workers."""
+        await self.redis.publish(self.channel, orjson.dumps({"origin": self.instance_id, **message}))
+
+    async def start(self, hub: "ChartEventHub") -> None:
+        """Deliver events published by other workers to the hub until closed."""
+        self._listener = asyncio.create_task(self._listen(hub))
+
+    async def _listen(self, hub: "ChartEventHub") -> None:
+        delay = self.reconnect_min_seconds
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self.subscribed = True
+                delay = self.reconnect_min_seconds
+                if self.reconnects:
+                    logger.info("Chart event subscription restored")
+                    hub.resync()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    event = orjson.loads(message["data"])
+                    if event.pop("origin", None) == self.instance_id:
+                        continue
+                    self.received += 1
+                    hub.dispatch(event)
+            except Exception as e:
+                self.errors += 1
+                if self.subscribed or not self.reconnects:
+                    logger.warning("Chart event subscription down, other workers' saves are not streamed", extra={
+                        "error": str(e), "retry_seconds": delay
+                    })
+            finally:
+                self.subscribed = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_seconds)
+
+    async def close(self) -> None:
+        """Stop listening and close the Redis connection."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the subscription's health.
+
+        Returns:
+            Dict with whether the subscription is up, events received,
+            reconnects and failures
+        """
+        return {
+            "backend": "redis",
+            "subscribed": self.subscribed,
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "errors": self.errors,
+        }
+
+
+class ChartEventHub:
+    """
+    In-process pub/sub of chart data changes, keyed by email.
+    """
+
+    def __init__(self, queue_size: int, bridge: Optional[RedisEventBridge] = None):
+        """
+        Initialize the hub.
+
+        Args:
+            queue_size: Events buffered per connection before it is evicted
+            bridge: Relay to the hubs of other workers, if any
+        """
+        self.queue_size = queue_size
+        self.bridge = bridge
+        self._topics: Dict[str, _Topic] = {}
+        self.connections = 0
+        self.evictions = 0
+
+    async def start(self) -> None:
+        """Start receiving events from other workers."""
+        if self.bridge is not None:
+            await self.bridge.start(self)
+
+    async def close(self) -> None:
+        """Stop receiving events from other workers."""
+        if self.bridge is not None:
+            await self.bridge.close()
+
+    def subscribe(self, email: str) -> Subscription:
+        """
+        Register a connection for a user's events.
+
+        Args:
+            email: User's email address
+
+        Returns:
+            The subscription; pass it to ``unsubscribe`` when the connection ends
+        """
+        subscription = Subscription(email, self.queue_size)
+        self._topics.setdefault(email, _Topic()).subscribers.add(subscription)
+        self.connections += 1
+        CHART_STREAM_CONNECTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a connection; the user's topic is dropped with its last subscriber.
+
+        Args:
+            subscription: Subscription returned by ``subscribe``
+        """
+        topic = self._topics.get(subscription.email)
+        if topic is None or subscription not in topic.subscribers:
+            return
+        topic.subscribers.discard(subscription)
+        self.connections -= 1
+        CHART_STREAM_CONNECTIONS.dec()
+        if not topic.subscribers:
+            del self._topics[subscription.email]
+
+    def current(self, email: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        """
+        Get the document a user's subscribers were last sent, if the hub has one.
+
+        Args:
+            email: User's email address
+
+        Returns:
+            Tuple of the document and its version, or None
+        """
+        topic = self._topics.get(email)
+        if topic is None or topic.document is None:
+            return None
+        return topic.document, topic.version
+
+    def seed(self, email: str, document: Dict[str, Any], version: str) -> None:
+        """
+        Record a document read from the database as the base for later deltas.
+
+        Ignored if the hub already holds the same or a newer version.
+
+        Args:
+            email: User's email address
+            document: Chart data document
+            version: The row's ``updated_at``
+        """
+        topic = self._topics.get(email)
+        if topic is None or (topic.version is not None and topic.version >= version):
+            return
+        topic.document, topic.version = document, version
+
+    async def publish_document(self, email: str, document: Dict[str, Any], updated_at: str) -> None:
+        """Publish a save that replaced a user's whole document."""
+        await self._publish({"email": email, "kind": "document", "payload": document, "updated_at": updated_at})
+
+    async def publish_patch(self, email: str, patch: Dict[str, Any], updated_at: str) -> None:
+        """Publish a merge patch applied to a user's document."""
+        await self._publish({"email": email, "kind": "patch", "payload": patch, "updated_at": updated_at})
+
+    async def publish_deleted(self, email: str) -> None:
+        """Publish the deletion of a user's data."""
+        await self._publish({"email": email, "kind": "deleted", "payload": None, "updated_at": None})
+
+    async def _publish(self, message: Dict[str, Any]) -> None:
+        """
+        Deliver an event locally and to other workers.
+
+        A failure to reach other workers is logged, never raised, so it
+        cannot fail the write that produced the event.
+        """
+        self.dispatch(message)
+        if self.bridge is None:
+            return
+        try:
+            await self.bridge.publish(message)
+        except Exception as e:
+            logger.error("Failed to relay chart data event", extra={"email": message["email"], "error": str(e)})
+
+    def dispatch(self, message: Dict[str, Any]) -> None:
+        """
+        Turn an event into a frame and queue it for the user's local subscribers.
+
+        Args:
+            message: Event with email, kind, payload and updated_at
+        """
+        topic = self._topics.get(message["email"])
+        if topic is None:
+            return
+
+        kind, payload, version = message["kind"], message["payload"], message["updated_at"]
+        if kind == "deleted":
+            topic.document, topic.version = None, None
+            event_id = datetime.now(timezone.utc).isoformat()
+            frame = encode_event("deleted", {"updated_at": None}, event_id)
+        else:
+            if topic.version is not None and version <= topic.version:
+                return
+            if kind == "document":
+                document = payload
+                delta = diff_merge_patch(topic.document, document) if topic.document is not None else None
+            else:
+                document = apply_merge_patch(topic.document, payload) if topic.document is not None else None
+                delta = payload if document is not None else None
+            topic.document, topic.version = document, version
+            if delta is not None:
+                kind = "patch"
+                frame = encode_event("patch", {"patch": delta, "updated_at": version}, version)
+            elif document is not None:
+                kind = "snapshot"
+                frame = encode_event(
+                    "snapshot", {"data": document, "is_existing": True, "updated_at": version}, version
+                )
+            else:
+                # A patch to a document this hub never saw; clients re-read it
+                kind = "reload"
+                frame = encode_event("reload", {"updated_at": version}, version)
+
+        CHART_STREAM_EVENTS.labels(kind).inc()
+        item = (version, frame)
+        for subscription in list(topic.subscribers):
+            try:
+                subscription.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._evict(topic, subscription)
+
+    def resync(self) -> None:
+        """
+        Tell every subscriber to reload after events may have been missed.
+
+        The documents held as the base for deltas may be outdated, so they
+        are dropped and the next save reaches subscribers as a snapshot.
+        """
+        frame = encode_event("reload", {"updated_at": None})
+        for topic in list(self._topics.values()):
+            topic.document, topic.version = None, None
+            CHART_STREAM_EVENTS.labels("reload").inc()
+            for subscription in list(topic.subscribers):
+                try:
+                    subscription.queue.put_nowait((None, frame))
+                except asyncio.QueueFull:
+                    self._evict(topic, subscription)
+
+    def _evict(self, topic: _Topic, subscription: Subscription) -> None:
+        """Drop a connection that stopped keeping up, telling it to close."""
+        topic.subscribers.discard(subscription)
+        self.connections -= 1
+        CHART_STREAM_CONNECTIONS.dec()
+        if not topic.subscribers:
+            del self._topics[subscription.email]
+        self.evictions += 1
+        CHART_STREAM_EVICTIONS.inc()
+        subscription.evicted = True
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        logger.warning("Evicted slow chart data stream", extra={"email": subscription.email})
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get connection and eviction counts.
+
+        Returns:
+            Dict with open connections, users with subscribers, evictions and
+            the bridge's health
+        """
+        return {
+            "connections": self.connections,
+            "users": len(self._topics),
+            "evictions": self.evictions,
+            "bridge": self.bridge.stats() if self.bridge is not None else None,
+        }
+
+
+def create_chart_event_hub(settings: Any) -> ChartEventHub:
+    """
+    Build the chart event hub selected by the application settings.
+
+    Args:
+        settings: Application settings instance
+
+    Returns:
+        ChartEventHub, bridged over Redis when CHART_STREAM_BACKEND is "redis"
+
+    Raises:
+        ValueError: If CHART_STREAM_BACKEND names an unknown backend
+    """
+    if settings.CHART_STREAM_BACKEND == "memory":
+        return ChartEventHub(settings.CHART_STREAM_QUEUE_SIZE)
+
+    if settings.CHART_STREAM_BACKEND == "redis":
+        import redis.asyncio as redis_asyncio
+
+        return ChartEventHub(
+            settings.CHART_STREAM_QUEUE_SIZE,
+            bridge=RedisEventBridge(redis_asyncio.from_url(settings.REDIS_URL), settings.CHART_STREAM_REDIS_CHANNEL)
+        )
+
+    raise ValueError(f"Unknown CHART_STREAM_BACKEND: {settings.CHART_STREAM_BACKEND}")
+
+
+chart_event_hub = create_chart_event_hub(settings)
+
+
+def get_chart_event_hub() -> ChartEventHub:
+    """
+    Dependency function to get the chart event hub instance.
+
+    Returns:
+        ChartEventHub: The chart event hub instance
+    """
+    return chart_event_hub
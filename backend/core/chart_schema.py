@@ -0,0 +1,155 @@
+"""
+Typed schema of chart data documents.
+
+Saved documents are validated once, when they are written, against
+ChartData in strict mode:
+
+- JSON types must match exactly, so ``"5"`` or ``true`` is not a number
+- unknown keys are rejected at every level
+- series, agent lists and call types are capped in length
+  (CHART_DATA_MAX_* settings)
+
+No field nests deeper than three levels, so arbitrarily deep JSON cannot
+be stored either. Stored documents are trusted on read and served as they
+are.
+
+The schema is written as TypedDicts, so validation returns plain dicts.
+Integers stay integers, which keeps stored documents, their series
+packing and their ETags unchanged. Each validator is compiled once, on
+first use, as pydantic does not share TypedDict schemas and every build
+adds to the service's import time. Numbers are checked as int, then float (a left-to-right union)
+with bounds on each member: the default smart union with bounds around
+it is several times slower on long series (benchmarks/bench_validation.py).
+"""
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import ConfigDict, Field, StrictFloat, StrictInt, StrictStr, TypeAdapter
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+from core.config import get_settings
+
+settings = get_settings()
+
+STRICT = ConfigDict(strict=True, extra="forbid", allow_inf_nan=False)
+
+
+def _number(**bounds: float) -> Any:
+    """Strict int or float within ``bounds`` (``ge``/``le``)."""
+    return Annotated[
+        Union[Annotated[StrictInt, Field(**bounds)], Annotated[StrictFloat, Field(**bounds)]],
+        Field(union_mode="left_to_right")
+    ]
+
+
+Count = Annotated[StrictInt, Field(ge=0)]
+Percentage = _number(ge=0, le=100)
+
+Series = Annotated[List[_number(ge=0)], Field(max_length=settings.CHART_DATA_MAX_SERIES_LENGTH)]
+PercentageSeries = Annotated[List[Percentage], Field(max_length=settings.CHART_DATA_MAX_SERIES_LENGTH)]
+
+
+class CallSentiment(TypedDict):
+    """Share of calls per sentiment, in percent."""
+    positive: Percentage
+    neutral: Percentage
+    negative: Percentage
+
+
+class AgentPerformance(TypedDict):
+    """One agent's call count and rating out of 5."""
+    name: Annotated[StrictStr, Field(min_length=1, max_length=100)]
+    calls: Count
+    rating: _number(ge=0, le=5)
+
+
+class PeakHour(TypedDict):
+    """Calls in one hour of the day."""
+    hour: Annotated[StrictInt, Field(ge=0, le=23)]
+    calls: Count
+
+
+AgentList = Annotated[List[AgentPerformance], Field(max_length=settings.CHART_DATA_MAX_AGENTS)]
+CallTypeName = Annotated[StrictStr, Field(min_length=1, max_length=64)]
+CallTypes = Annotated[Dict[CallTypeName, Count], Field(max_length=settings.CHART_DATA_MAX_CALL_TYPES)]
+PeakHours = Annotated[List[PeakHour], Field(max_length=24)]
+
+
+class ChartData(TypedDict):
+    """A user's dashboard data."""
+    __pydantic_config__ = STRICT
+
+    daily_call_volume: Series
+    average_call_duration: Series
+    call_sentiment: CallSentiment
+    agent_performance: AgentList
+    conversion_rate: PercentageSeries
+    call_types: NotRequired[CallTypes]  # Calls per call type, e.g. "inbound"
+    peak_hours: NotRequired[PeakHours]
+
+
+class CallSentimentPatch(TypedDict, total=False):
+    """Merge patch of CallSentiment."""
+    positive: Percentage
+    neutral: Percentage
+    negative: Percentage
+
+
+class ChartDataPatch(TypedDict, total=False):
+    """
+    RFC 7396 merge patch of ChartData.
+
+    ``null`` may only remove the optional fields (or single call types).
+    Arrays are replaced as a whole, so they must be valid on their own.
+    """
+    __pydantic_config__ = STRICT
+
+    daily_call_volume: Series
+    average_call_duration: Series
+    call_sentiment: CallSentimentPatch
+    agent_performance: AgentList
+    conversion_rate: PercentageSeries
+    call_types: Optional[Dict[CallTypeName, Optional[Count]]]
+    peak_hours: Optional[PeakHours]
+
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def _adapter(schema: Any) -> TypeAdapter:
+    """TypeAdapter of ``schema``, built on first use."""
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter
+
+
+def validate_chart_data(chart_data: Any) -> Dict[str, Any]:
+    """
+    Validate a decoded chart data document.
+
+    Args:
+        chart_data: Document to check, e.g. the result of a JSON Patch
+
+    Returns:
+        The validated document
+
+    Raises:
+        pydantic.ValidationError: If the document does not match ChartData
+    """
+    return _adapter(ChartData).validate_python(chart_data)
+
+
+def validate_chart_data_patch(patch: Any) -> Dict[str, Any]:
+    """
+    Validate a decoded merge patch of a chart data document.
+
+    Args:
+        patch: RFC 7396 merge patch to check
+
+    Returns:
+        The validated patch
+
+    Raises:
+        pydantic.ValidationError: If the patch does not match ChartDataPatch
+    """
+    return _adapter(ChartDataPatch).validate_python(patch)
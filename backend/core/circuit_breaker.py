@@ -0,0 +1,244 @@
+"""
+Circuit breaker for calls to a failing dependency.
+
+The breaker watches the outcome of the most recent calls. Once enough of
+them have failed or been slow, it opens and rejects calls immediately
+with CircuitOpenError, so requests fail in microseconds instead of each
+waiting out the dependency's timeout. After a cool-down it turns
+half-open and lets a few probe calls through: if they all succeed the
+circuit closes again, and any failure opens it for another cool-down.
+
+State lives in the process, so each worker trips and recovers on its own.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from core.logger import get_logger
+from core.metrics import CIRCUIT_BREAKER_REJECTIONS, CIRCUIT_BREAKER_STATE
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        """
+        Initialize the error.
+
+        Args:
+            name: Name of the breaker that rejected the call
+            retry_after: Seconds until the breaker lets probe calls through
+        """
+        self.retry_after = retry_after
+        super().__init__(f"Circuit {name!r} is open, retry in {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    Count-based circuit breaker with half-open probing.
+
+    Callers ask ``admit()`` before a call and report its outcome with
+    ``record()``, or ``release()`` if the call was abandoned (e.g.
+    cancelled) before it produced one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int,
+        minimum_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+        half_open_probes: int
+    ):
+        """
+        Initialize the breaker in the closed state.
+
+        Args:
+            name: Label for logs and metrics
+            window: Number of most recent calls the failure rate is computed over
+            minimum_calls: Calls needed in the window before the breaker can open
+            failure_rate: Share of failed or slow calls that opens the breaker
+            slow_call_seconds: Calls taking at least this long count as failed
+            open_seconds: How long the breaker stays open before probing
+            half_open_probes: Successful probes needed to close the breaker
+        """
+        self.name = name
+        self.minimum_calls = minimum_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+
+        # True for each failed or slow call
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self._failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        self.trips = 0
+        self.rejections = 0
+        CIRCUIT_BREAKER_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        """Current state: "closed", "open" or "half_open"."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        """
+        Seconds until an open breaker lets probe calls through.
+
+        Returns:
+            float: Remaining cool-down, 0 unless the breaker is open
+        """
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def raise_if_open(self) -> None:
+        """
+        Reject work that depends on the protected dependency while the circuit is open.
+
+        Unlike ``admit()``, this does not take a probe slot when half-open.
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        if self.state == OPEN:
+            self._reject()
+
+    def admit(self) -> bool:
+        """
+        Decide whether a call may proceed.
+
+        Returns:
+            bool: True if the call is a half-open probe, False for a regular call
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with every
+                probe slot taken
+        """
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and self._probes_in_flight + self._probe_successes < self.half_open_probes:
+            self._probes_in_flight += 1
+            return True
+        self._reject()
+
+    def record(self, probe: bool, failed: bool) -> None:
+        """
+        Report the outcome of an admitted call.
+
+        Args:
+            probe: The value ``admit()`` returned for the call
+            failed: Whether the call failed or was slow
+        """
+        if probe:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if self._state != HALF_OPEN:
+                return
+            if failed:
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+            return
+
+        # Regular calls that finish after the breaker opened say nothing new
+        if self._state != CLOSED:
+            return
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._failures -= self._outcomes[0]
+        self._outcomes.append(failed)
+        self._failures += failed
+        if (
+            len(self._outcomes) >= self.minimum_calls
+            and self._failures >= self.failure_rate * len(self._outcomes)
+        ):
+            self._open()
+
+    def release(self, probe: bool) -> None:
+        """
+        Give back the slot of an admitted call that ended without an outcome.
+
+        Args:
+            probe: The value ``admit()`` returned for the call
+        """
+        if probe:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the breaker's state and counters.
+
+        Returns:
+            Dict with state, recent failure count, trips and rejections
+        """
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": self._failures,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "trips": self.trips,
+            "rejections": self.rejections,
+        }
+
+    def _reject(self) -> None:
+        self.rejections += 1
+        CIRCUIT_BREAKER_REJECTIONS.labels(self.name).inc()
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def _open(self) -> None:
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        """Enter a state, starting it with a clean slate."""
+        previous, self._state = self._state, state
+        self._outcomes.clear()
+        self._failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        CIRCUIT_BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit breaker state changed", extra={"breaker": self.name, "from": previous, "to": state})
+
+
+def create_database_breaker(settings: Any) -> Optional[CircuitBreaker]:
+    """
+    Build the database circuit breaker from the application settings.
+
+    Args:
+        settings: Application settings instance
+
+    Returns:
+        CircuitBreaker or None when the breaker is disabled
+    """
+    if not settings.CIRCUIT_BREAKER_ENABLED:
+        return None
+    return CircuitBreaker(
+        "database",
+        window=settings.CIRCUIT_BREAKER_WINDOW,
+        minimum_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+        failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+        slow_call_seconds=settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+        open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+        half_open_probes=settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+    )
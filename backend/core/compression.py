@@ -0,0 +1,303 @@
+"""
+Response compression negotiated per request.
+
+CompressionMiddleware picks the best encoding the client accepts
+(Brotli, then Zstandard, then gzip) and compresses JSON and text
+responses of at least COMPRESSION_MIN_SIZE bytes. Bodies of at least
+COMPRESSION_THREADPOOL_MIN_SIZE bytes are compressed on a small thread pool
+(all three codecs release the GIL), so a large payload does not stall the
+event loop. Streaming responses are compressed chunk by chunk and flushed
+after every chunk so NDJSON rows still arrive as they are produced.
+
+Brotli and Zstandard need the optional ``brotli`` and ``zstandard``
+packages; without them only gzip is offered.
+
+Responses that already carry a Content-Encoding are passed through, which
+lets endpoints serve bodies compressed ahead of time (see ``precompress``).
+A strong ETag on a compressed response gets the encoding appended
+(``encoding_etag``), since strong validators must differ between
+representations. Precondition checks strip the suffix again, so any
+encoding's ETag names the same resource version.
+"""
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.utils import encoding_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+EVENT_STREAM_TYPE = "text/event-stream"
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/problem+json",
+    "application/javascript",
+    "text/",
+)
+
+# Highest level per encoding, for bodies compressed once ahead of time
+MAX_LEVELS = {"br": 11, "zstd": 19, "gzip": 9}
+
+
+class StreamCompressor:
+    """Incremental compressor with a uniform interface over the codecs."""
+
+    def __init__(self, encoding: str, level: int):
+        """
+        Initialize the compressor.
+
+        Args:
+            encoding: "br", "zstd" or "gzip"
+            level: Codec-specific compression level (Brotli quality)
+        """
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            # wbits=31 selects the gzip container
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a chunk and flush it so the client can decode it right away.
+
+        Args:
+            data: Uncompressed chunk
+
+        Returns:
+            bytes: Compressed output for the chunk
+        """
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """
+        Compress a final chunk and end the stream.
+
+        Args:
+            data: Last uncompressed chunk
+
+        Returns:
+            bytes: Remaining compressed output including the trailer
+        """
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def available_encodings() -> List[str]:
+    """
+    List supported encodings in server preference order.
+
+    Returns:
+        List of encoding tokens, always ending with "gzip"
+    """
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: Optional[str], offered: Iterable[str]) -> Optional[str]:
+    """
+    Choose a content coding from an Accept-Encoding header.
+
+    The client's q-values decide first; ties go to the earliest entry in
+    ``offered``. ``*`` matches any offered coding the header does not name.
+
+    Args:
+        accept_encoding: Accept-Encoding header value
+        offered: Codings the server can produce, most preferred first
+
+    Returns:
+        The chosen coding, or None to send the body unencoded
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in offered:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def precompress(body: bytes, levels: Optional[Dict[str, int]] = None) -> Dict[str, bytes]:
+    """
+    Compress a constant body once per available encoding.
+
+    Args:
+        body: Uncompressed response body
+        levels: Compression level per encoding (defaults to MAX_LEVELS)
+
+    Returns:
+        Dict of encoding to compressed body, only where it is smaller
+    """
+    levels = levels or MAX_LEVELS
+    variants = {}
+    for encoding in available_encodings():
+        compressed = StreamCompressor(encoding, levels[encoding]).finish(body)
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the negotiated encoding."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        thread_minimum_size: int,
+        levels: Dict[str, int],
+        threads: int
+    ):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The wrapped ASGI application
+            minimum_size: Smallest body worth compressing, in bytes
+            thread_minimum_size: Bodies at least this large compress on the thread pool
+            levels: Compression level per encoding ("br", "zstd", "gzip")
+            threads: Size of the compression thread pool
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_minimum_size = thread_minimum_size
+        self.levels = levels
+        self.encodings = available_encodings()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="compression")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self, encoding, send).run(scope, receive)
+
+    async def run_compression(self, size: int, func: Callable[..., bytes], *args: Any) -> bytes:
+        """
+        Run a compression call inline or on the thread pool depending on size.
+
+        Args:
+            size: Uncompressed size of the data being compressed
+            func: Compression function
+            *args: Arguments for the function
+
+        Returns:
+            bytes: The compressed output
+        """
+        if size >= self.thread_minimum_size:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        return func(*args)
+
+
+class _CompressionResponder:
+    """Per-request state for CompressionMiddleware."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows the size
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._should_compress(headers, body, more_body):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = StreamCompressor(self.encoding, self.middleware.levels[self.encoding])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = encoding_etag(headers["etag"], self.encoding)
+            if not more_body:
+                body = await self.middleware.run_compression(len(body), self.compressor.finish, body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        compress = self.compressor.compress if more_body else self.compressor.finish
+        body = await self.middleware.run_compression(len(body), compress, body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        """Decide from the first body chunk whether to compress the response."""
+        if self.start_message["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        # Event streams are long-lived and mostly idle; a compressor per
+        # connection would hold hundreds of KB of state for little gain
+        if content_type.startswith(EVENT_STREAM_TYPE):
+            return False
+        # A streamed response's total size is unknown, so always compress it
+        return more_body or len(body) >= self.middleware.minimum_size
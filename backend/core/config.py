@@ -21,10 +21,14 @@ class Settings(BaseSettings):
     APP_NAME: str = "Transaction Webhook Service"
     VERSION: str = "1.0.0"
     DEBUG: bool = False
+    # Modules deferred to first use, imported in the background once the
+    # service is ready (e.g. ["numpy"] for the series aggregation endpoints)
+    STARTUP_PRELOAD_MODULES: list = []
     
     # API Settings
     API_V1_PREFIX: str = "/api/v1"
     API_V2_PREFIX: str = "/api/v2"
+    JSON_MAX_DEPTH: int = 32  # Request bodies nested deeper are rejected before parsing
     
     # CORS Settings
     CORS_ORIGINS: list = ["*"]  # In production, specify allowed origins
@@ -36,16 +40,140 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     SUPABASE_SERVICE_ROLE_KEY: Optional[str] = None
+
+    # Database Client Settings
+    DB_MAX_CONCURRENCY: int = 20  # Max in-flight PostgREST requests per worker
+    DB_TIMEOUT_SECONDS: float = 5.0
+    DB_HTTP2: bool = True  # Used when the h2 package is installed
+    DB_POOL_MAX_CONNECTIONS: int = 100
+    DB_POOL_MAX_KEEPALIVE: int = 20
+    DB_POOL_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    DB_POOL_WARM_CONNECTIONS: int = 4  # Connections opened during startup
+
+    # Chart Data Write Settings
+    CHART_WRITE_MODE: str = "sync"  # "sync" (commit before acknowledging) or "write_behind"
+    CHART_WRITE_BEHIND_FLUSH_MS: int = 50  # Flush interval for buffered saves
+    CHART_WRITE_BEHIND_MAX_ROWS: int = 500  # Flush early at this many rows; also the upsert size
+    CHART_WRITE_BEHIND_MAX_PENDING: int = 10000  # Beyond this, saves are written synchronously
     
+    # Chart Data Validation Settings
+    # Limits of the ChartData schema saved documents are validated against
+    CHART_DATA_MAX_BODY_BYTES: int = 1024 * 1024  # POST and PATCH bodies, checked before parsing
+    CHART_DATA_MAX_SERIES_LENGTH: int = 10000  # Points per series
+    CHART_DATA_MAX_AGENTS: int = 1000  # Entries in agent_performance
+    CHART_DATA_MAX_CALL_TYPES: int = 64  # Entries in call_types
+
+    # Chart Data Series Settings
+    # Numeric arrays stored packed in the series column (see core/series.py)
+    CHART_SERIES_FIELDS: list = ["daily_call_volume", "average_call_duration", "conversion_rate"]
+    CHART_SERIES_MAX_POINTS: int = 5000  # Upper bound for buckets, LTTB points and rolling windows
+    CHART_SERIES_MEMO_MAX_ENTRIES: int = 10000  # Memoized aggregates per worker
+    CHART_SERIES_MEMO_MAX_BYTES: int = 32 * 1024 * 1024
+    CHART_SERIES_MEMO_TTL_SECONDS: float = 300.0
+    CHART_SERIES_THREAD_MIN_POINTS: int = 1000  # Longer ranges are aggregated off the event loop
+    CHART_SERIES_THREADS: int = 1  # Aggregation threads; each competes with the event loop for the GIL
+
+    # Chart Data Cache Settings
+    CHART_CACHE_ENABLED: bool = True
+    CHART_CACHE_BACKEND: str = "memory"  # "memory" or "redis"
+    CHART_CACHE_TTL_SECONDS: float = 60.0
+    CHART_CACHE_NEGATIVE_TTL_SECONDS: float = 10.0  # For users without saved data
+    CHART_CACHE_MAX_ENTRIES: int = 10000
+    CHART_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHART_CACHE_LOCAL_TTL_SECONDS: float = 5.0  # Per-worker tier in front of Redis
+    CHART_CACHE_REDIS_PREFIX: str = "chart_data:"
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Database Circuit Breaker Settings
+    # Opens when at least MIN_CALLS of the last WINDOW calls were made and
+    # FAILURE_RATE of them failed or took longer than SLOW_CALL_SECONDS
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_WINDOW: int = 20
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS: float = 1.0
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 10.0  # Fail fast for this long before probing
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 3  # Successful probes needed to close again
+
+    # Stale Chart Data Settings
+    # Last known copy of each row, served when the database cannot be read
+    CHART_STALE_ENABLED: bool = True
+    CHART_STALE_MAX_ENTRIES: int = 10000
+    CHART_STALE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHART_STALE_TTL_SECONDS: float = 24 * 60 * 60
+
+    # Chart Data Stream Settings
+    CHART_STREAM_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (across workers)
+    CHART_STREAM_REDIS_CHANNEL: str = "chart_data:events"
+    CHART_STREAM_HEARTBEAT_SECONDS: float = 15.0  # Comment line sent on idle streams
+    CHART_STREAM_RETRY_MS: int = 3000  # Reconnect delay suggested to clients
+    CHART_STREAM_QUEUE_SIZE: int = 32  # Events buffered per stream before it is evicted
+    CHART_STREAM_MAX_CONNECTIONS: int = 10000  # Per worker; beyond this, streams get 503
+
+    # Rate Limiting Settings
+    # Each rule gives every key its own token bucket of "burst" requests,
+    # refilled at "rate" requests per second. "key" is a path parameter of
+    # the route (e.g. "email") or "ip"; the first matching rule applies
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared by all workers)
+    RATE_LIMIT_REDIS_PREFIX: str = "rate_limit:"
+    RATE_LIMIT_MAX_BUCKETS: int = 100000  # Per worker; least recently used buckets are dropped beyond this
+    RATE_LIMIT_SWEEP_SECONDS: float = 60.0  # How often refilled buckets are dropped
+    RATE_LIMIT_RULES: list = [
+        {"method": "GET", "route": "/api/v1/chart-data", "key": "ip", "rate": 1, "burst": 10},
+        {"method": "POST", "route": "/api/v1/chart-data", "key": "ip", "rate": 10, "burst": 30},
+        {"method": "POST", "route": "/api/v1/chart-data/batch-get", "key": "ip", "rate": 1, "burst": 5},
+        {"method": "POST", "route": "/api/v1/chart-data/batch-upsert", "key": "ip", "rate": 1, "burst": 5},
+        {"method": "GET", "route": "/api/v1/chart-data/{email}", "key": "email", "rate": 10, "burst": 30},
+        {"method": "PATCH", "route": "/api/v1/chart-data/{email}", "key": "email", "rate": 5, "burst": 20},
+        {"method": "DELETE", "route": "/api/v1/chart-data/{email}", "key": "email", "rate": 1, "burst": 5},
+    ]
+
     # Database Table Names
     TRANSACTIONS_TABLE: str = "transactions"
     USERS_TABLE: str = "users"
     CHART_DATA_TABLE: str = "chart_data"
+    CHART_DATA_MERGE_PATCH_RPC: str = "merge_patch_chart_data"
+    
+    # Batch Endpoint Settings
+    CHART_BATCH_MAX_ITEMS: int = 500
+    CHART_BATCH_MAX_BODY_BYTES: int = 16 * 1024 * 1024  # batch-upsert bodies, checked before parsing
+    CHART_BATCH_READ_CHUNK_SIZE: int = 100  # Emails per in_() query
+    
+    # Admin Listing Settings
+    ADMIN_LIST_DEFAULT_LIMIT: int = 100
+    ADMIN_LIST_MAX_LIMIT: int = 1000
     
     # Background Processing Settings
     PROCESSING_DELAY_SECONDS: int = 30
     MAX_RETRY_ATTEMPTS: int = 3
     WEBHOOK_TIMEOUT_SECONDS: float = 0.5  # 500ms response requirement
+    WEBHOOK_WORKERS: int = 8  # Concurrent transaction workers per process
+    WEBHOOK_QUEUE_MAX_SIZE: int = 10000  # Beyond this, webhooks get 429
+    WEBHOOK_RETRY_BASE_DELAY_SECONDS: float = 0.5  # Doubled on every retry
+    WEBHOOK_RETRY_MAX_DELAY_SECONDS: float = 30.0
+    WEBHOOK_DRAIN_TIMEOUT_SECONDS: float = 20.0  # Shutdown wait for queued transactions
+    WEBHOOK_IDEMPOTENCY_MAX_KEYS: int = 100000  # Deliveries remembered per process
+    WEBHOOK_IDEMPOTENCY_MAX_BYTES: int = 32 * 1024 * 1024
+    WEBHOOK_IDEMPOTENCY_TTL_SECONDS: float = 24 * 60 * 60
+    
+    # Observability Settings
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    METRICS_ENABLED: bool = True
+    PROMETHEUS_MULTIPROC_DIR: Optional[str] = None  # Set when running several workers
+    TRACING_ENABLED: bool = True
+    TRACING_SAMPLE_RATE: float = 0.01  # Fraction of requests traced
+    TRACING_EXPORTER: str = "console"  # "console" or "memory"
+    
+    # Response Compression Settings
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Smaller bodies are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_THREADPOOL_MIN_SIZE: int = 256 * 1024  # Larger bodies compress off the event loop
+    COMPRESSION_THREADS: int = 4
     
     # Security Settings
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -4,128 +4,989 @@ Database connection and client management for Supabase.
 This module provides a centralized way to manage database connections,
 initialize Supabase clients, and handle database operations with proper
 error handling and connection pooling.
+
+All queries go through the asynchronous PostgREST client that backs
+Supabase, so a slow round trip only suspends the awaiting request instead
+of blocking the event loop for every other in-flight request.
+
+With CHART_WRITE_MODE=write_behind, chart data saves are acknowledged
+once they are in an in-memory buffer that keeps the last save per email,
+and a background flusher writes the buffer with multi-row upserts. Reads
+from the same process see buffered saves. Saves still buffered when the
+process dies are lost, so deployments that need every acknowledged save
+committed keep the default "sync" mode.
+
+The numeric series of a chart data document are stored packed in the
+``series`` column (see core/series.py). Rows are packed on every write
+and unpacked on every read here, so callers only see plain documents.
+
+Every change to a user's chart data is published to the chart event hub
+(see core/chart_events.py), which pushes it to the user's open streams.
+
+Every query passes through a circuit breaker (see core/circuit_breaker.py)
+that fails fast with CircuitOpenError while the database keeps failing or
+timing out. Reads of a user's chart data then fall back to the last copy
+this process read or saved, marked with ``stale: True``, rather than
+pretending the user has no data.
 """
 import asyncio
+import importlib.util
+import time
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
-from supabase import create_client, Client
+from typing import Optional, Dict, Any, List, Tuple, Union
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.types import CountMethod, ReturnMethod
 from core.config import get_settings
+from postgrest.exceptions import APIError
+from core.cache import ReadThroughCache, MISSING, TTLCache, create_chart_data_cache
+from core.chart_events import ChartEventHub, get_chart_event_hub
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError, create_database_breaker
+from core.logger import get_logger
+from core.metrics import DB_CALL_DURATION, DB_CALL_ERRORS, STALE_RESPONSES
+from core.series import pack_chart_data, pack_merge_patch, unpack_chart_row
+from core.tracing import stage_span
 
 settings = get_settings()
+logger = get_logger(__name__)
+
+
+def _http2_enabled() -> bool:
+    """
+    Check whether PostgREST connections should negotiate HTTP/2.
+
+    Returns:
+        bool: True if enabled in settings and the ``h2`` package is installed
+    """
+    return settings.DB_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+# Postgres error classes and PostgREST codes that mean the database itself
+# is unreachable or overloaded, as opposed to a problem with the request:
+# connection exceptions, insufficient resources, operator intervention
+# (including statement timeouts), internal errors and PostgREST's own
+# connection and pool errors
+_OUTAGE_CODE_PREFIXES = ("08", "53", "57", "XX", "PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+def _is_outage(error: Exception) -> bool:
+    """
+    Check whether a failed query counts against the circuit breaker.
+
+    Args:
+        error: Exception raised by a PostgREST query
+
+    Returns:
+        bool: True for transport errors, timeouts, non-JSON (gateway)
+            errors and database availability errors
+    """
+    if isinstance(error, httpx.HTTPError):
+        return True
+    if isinstance(error, APIError):
+        # postgrest-py reports the HTTP status as an int when the body is not JSON
+        return not isinstance(error.code, str) or error.code.startswith(_OUTAGE_CODE_PREFIXES)
+    return False
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient whose HTTP session uses the configured connection pool."""
+
+    def __init__(self, *args: Any, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs: Any):
+        # Read by create_session, which the base constructor calls
+        self._transport = transport
+        super().__init__(*args, **kwargs)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            http2=_http2_enabled(),
+            limits=httpx.Limits(
+                max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DB_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.DB_POOL_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            transport=self._transport
+        )
 
 
 class DatabaseClient:
     """
     Supabase database client wrapper with async support.
-    
+
     Provides a centralized interface for all database operations
     with proper error handling and connection management.
     """
-    
-    def __init__(self):
-        """Initialize the database client."""
-        self._client: Optional[Client] = None
-        self._service_client: Optional[Client] = None
-    
-    def get_client(self) -> Client:
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Initialize the database client.
+
+        Args:
+            transport: HTTP transport for PostgREST requests in place of
+                network connections, e.g. an in-process stand-in for benchmarks
+        """
+        self._transport = transport
+        self._client: Optional[AsyncPostgrestClient] = None
+        self._service_client: Optional[AsyncPostgrestClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.cache: Optional[ReadThroughCache] = create_chart_data_cache(settings)
+        self.breaker: Optional[CircuitBreaker] = create_database_breaker(settings)
+        self.events: ChartEventHub = get_chart_event_hub()
+        # Last known copy of each user's row, served when reads fail
+        self.stale: Optional[TTLCache] = TTLCache(
+            max_entries=settings.CHART_STALE_MAX_ENTRIES,
+            max_bytes=settings.CHART_STALE_MAX_BYTES,
+            ttl_seconds=settings.CHART_STALE_TTL_SECONDS,
+            negative_ttl_seconds=0
+        ) if settings.CHART_STALE_ENABLED else None
+
+        if settings.CHART_WRITE_MODE not in ("sync", "write_behind"):
+            raise ValueError(f"Unknown CHART_WRITE_MODE: {settings.CHART_WRITE_MODE}")
+        # Write-behind buffer: email -> row, flushed by _flush_loop
+        self._write_buffer: Dict[str, Dict[str, Any]] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _create_client(self, key: str) -> PooledPostgrestClient:
+        """
+        Create an async PostgREST client for the Supabase REST endpoint.
+
+        Args:
+            key: Supabase API key used for both the apikey and bearer headers
+
+        Returns:
+            PooledPostgrestClient: Configured client instance
+        """
+        return PooledPostgrestClient(
+            f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=settings.DB_TIMEOUT_SECONDS,
+            transport=self._transport,
+        )
+
+    def get_client(self) -> AsyncPostgrestClient:
         """
         Get the regular Supabase client for standard operations.
-        
+
         Returns:
-            Client: Supabase client instance
+            AsyncPostgrestClient: Async PostgREST client instance
         """
         if not self._client:
-            self._client = create_client(
-                settings.SUPABASE_URL,
-                settings.SUPABASE_KEY
-            )
+            self._client = self._create_client(settings.SUPABASE_KEY)
         return self._client
-    
-    def get_service_client(self) -> Client:
+
+    def get_service_client(self) -> AsyncPostgrestClient:
         """
         Get the service role client for admin operations.
-        
+
         Returns:
-            Client: Supabase service role client instance
+            AsyncPostgrestClient: Service role client instance
         """
         if not self._service_client and settings.SUPABASE_SERVICE_ROLE_KEY:
-            self._service_client = create_client(
-                settings.SUPABASE_URL,
-                settings.SUPABASE_SERVICE_ROLE_KEY
-            )
+            self._service_client = self._create_client(settings.SUPABASE_SERVICE_ROLE_KEY)
         return self._service_client or self.get_client()
 
-    async def get_user_chart_data(self, email: str) -> Optional[Dict[str, Any]]:
+    async def _execute(self, query, operation: str) -> Any:
+        """
+        Execute a query while holding a slot of the concurrency limit.
+
+        The semaphore is created lazily so it binds to the running loop
+        rather than whichever loop existed at import time. The round trip
+        is recorded in the DB latency histogram and failures in the error
+        counter, both labelled with the calling method, and traced as a
+        ``db.<operation>`` span when the request is sampled.
+
+        The circuit breaker is consulted before queueing for the semaphore,
+        so an open circuit rejects the query at once. Outage errors and
+        round trips slower than CIRCUIT_BREAKER_SLOW_CALL_SECONDS count as
+        failures; errors caused by the request itself do not.
+
+        Args:
+            query: PostgREST request builder ready to execute
+            operation: Name of the DatabaseClient method issuing the query
+
+        Returns:
+            APIResponse: The PostgREST response
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.DB_MAX_CONCURRENCY)
+        breaker = self.breaker
+        probe = breaker.admit() if breaker is not None else False
+        failed: Optional[bool] = None
+        try:
+            async with self._semaphore:
+                start_time = time.perf_counter()
+                try:
+                    with stage_span(f"db.{operation}", "db", **{"db.system": "postgresql", "db.operation": operation}):
+                        response = await query.execute()
+                except Exception as e:
+                    DB_CALL_ERRORS.labels(operation).inc()
+                    failed = _is_outage(e)
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - start_time
+                    DB_CALL_DURATION.labels(operation).observe(elapsed)
+                failed = breaker is not None and elapsed >= breaker.slow_call_seconds
+                return response
+        finally:
+            if breaker is not None:
+                if failed is None:
+                    breaker.release(probe)
+                else:
+                    breaker.record(probe, failed)
+
+    async def start(self) -> None:
+        """
+        Build the clients, warm the connection pool and start the cache.
+
+        A failing warm-up is logged rather than raised so the service can
+        still start and report itself as not ready.
+        """
+        if self.cache is not None:
+            await self.cache.start()
+        if settings.CHART_WRITE_MODE == "write_behind":
+            self._flush_lock = asyncio.Lock()
+            self._flush_requested = asyncio.Event()
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+
+        self.get_client()
+        self.get_service_client()
+        try:
+            await self.warm_up()
+        except Exception as e:
+            logger.warning("Database warm-up failed", extra={"error": str(e)})
+
+    async def warm_up(self) -> None:
+        """
+        Pre-open pooled connections with concurrent readiness probes.
+
+        Runs DB_POOL_WARM_CONNECTIONS probes at once so that many
+        keep-alive connections are established (a single one with HTTP/2,
+        which multiplexes requests).
+        """
+        await asyncio.gather(*(
+            self.ping() for _ in range(max(1, settings.DB_POOL_WARM_CONNECTIONS))
+        ))
+
+    async def ping(self) -> float:
+        """
+        Run a cheap readiness query against the chart data table.
+
+        Returns:
+            float: Round-trip time in seconds
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        client = self.get_client()
+        start_time = time.perf_counter()
+        await self._execute(
+            client.table(settings.CHART_DATA_TABLE)
+                  .select("id")
+                  .limit(1),
+            "ping"
+        )
+        return time.perf_counter() - start_time
+
+    def pool_state(self) -> Dict[str, Any]:
+        """
+        Describe the HTTP connection pool of the regular client.
+
+        Returns:
+            Dict with configured limits and current connection counts
+        """
+        state: Dict[str, Any] = {
+            "initialized": self._client is not None,
+            "http2_enabled": _http2_enabled(),
+            "max_connections": settings.DB_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.DB_POOL_MAX_KEEPALIVE,
+            "connections": 0,
+            "idle": 0,
+            "http2_connections": 0
+        }
+        if self._client is None:
+            return state
+
+        # httpx does not expose its pool publicly, so tolerate layout changes
+        pool = getattr(getattr(self._client.session, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        state["connections"] = len(connections)
+        state["idle"] = sum(1 for connection in connections if connection.is_idle())
+        state["http2_connections"] = sum(
+            1 for connection in connections if "HTTP/2" in connection.info()
+        )
+        return state
+
+    async def close(self) -> None:
+        """
+        Flush buffered saves, then close the HTTP connection pools and the cache backend.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(
+                    "Final write-behind flush failed, dropping buffered saves",
+                    extra={"emails": list(self._write_buffer), "error": str(e)}
+                )
+        if self.cache is not None:
+            await self.cache.close()
+        for client in (self._client, self._service_client):
+            if client is not None:
+                await client.aclose()
+        self._client = None
+        self._service_client = None
+
+    async def _upsert_chart_rows(self, rows: List[Dict[str, Any]], operation: str) -> Dict[str, str]:
+        """
+        Write chart data rows with one multi-row upsert keyed on ``email``.
+
+        Args:
+            rows: Rows with email, chart_data and updated_at (one per email)
+            operation: Name of the calling method for metrics and tracing
+
+        Returns:
+            Dict mapping each written email to its new ``updated_at``
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        payload = []
+        for row in rows:
+            document, series = pack_chart_data(row["chart_data"])
+            payload.append({**row, "chart_data": document, "series": series})
+
+        client = self.get_client()
+        query = client.table(settings.CHART_DATA_TABLE).upsert(payload, on_conflict="email")
+        query.params = query.params.set("select", "email,updated_at")
+        try:
+            response = await self._execute(query, operation)
+        finally:
+            # The write may have landed even if the response was lost
+            if self.cache is not None:
+                for row in rows:
+                    await self.cache.invalidate(row["email"])
+
+        written = {row["email"]: row["updated_at"] for row in response.data or []}
+        for row in rows:
+            if row["email"] in written:
+                self._remember({**row, "updated_at": written[row["email"]]})
+        return written
+
+    def _buffer_chart_data(self, email: str, chart_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Queue a save in the write-behind buffer, replacing any pending save for the email.
+
+        Args:
+            email: User's email address
+            chart_data: Chart configuration and data
+
+        Returns:
+            The provisional ``updated_at`` (the database assigns the final
+            one when the row is flushed), or None if the buffer is full
+        """
+        if email not in self._write_buffer and len(self._write_buffer) >= settings.CHART_WRITE_BEHIND_MAX_PENDING:
+            return None
+
+        updated_at = datetime.now(timezone.utc).isoformat()
+        self._write_buffer[email] = {"email": email, "chart_data": chart_data, "updated_at": updated_at}
+        if len(self._write_buffer) >= settings.CHART_WRITE_BEHIND_MAX_ROWS:
+            self._flush_requested.set()
+        return updated_at
+
+    async def _flush_loop(self) -> None:
+        """Flush the write-behind buffer every CHART_WRITE_BEHIND_FLUSH_MS or when it fills up."""
+        interval = settings.CHART_WRITE_BEHIND_FLUSH_MS / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except CircuitOpenError:
+                # Rows stay buffered until the breaker lets writes through
+                pass
+            except Exception as e:
+                # Unflushed rows stay buffered and are retried on the next tick
+                logger.error(
+                    "Write-behind flush failed",
+                    extra={"pending": len(self._write_buffer), "error": str(e)}
+                )
+
+    async def flush(self) -> None:
+        """
+        Write every buffered save, CHART_WRITE_BEHIND_MAX_ROWS rows per upsert.
+
+        Rows stay in the buffer, and therefore visible to reads, until
+        their upsert has completed; a row replaced by a newer save while
+        its upsert was in flight stays buffered for the next flush.
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            # Only flush what is buffered now so steady saves cannot keep
+            # the lock held indefinitely
+            pending = list(self._write_buffer.values())
+            for i in range(0, len(pending), settings.CHART_WRITE_BEHIND_MAX_ROWS):
+                batch = pending[i:i + settings.CHART_WRITE_BEHIND_MAX_ROWS]
+                await self._upsert_chart_rows(batch, "flush_chart_data")
+                for row in batch:
+                    if self._write_buffer.get(row["email"]) is row:
+                        del self._write_buffer[row["email"]]
+
+    async def _settle_pending(self, email: str) -> Optional[Tuple[str, str]]:
+        """
+        Write a user's buffered save now, ahead of a write that builds on it.
+
+        Holding the flush lock also waits out any flush already carrying
+        the user's row, so no buffered save can land after the caller's
+        own write.
+
+        Args:
+            email: User's email address
+
+        Returns:
+            Tuple of the provisional and the committed ``updated_at`` if a
+            buffered save was written, None otherwise
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        if self._flush_lock is None:
+            return None
+        async with self._flush_lock:
+            row = self._write_buffer.get(email)
+            if row is None:
+                return None
+            written = await self._upsert_chart_rows([row], "flush_chart_data")
+            if self._write_buffer.get(email) is row:
+                del self._write_buffer[email]
+            return row["updated_at"], written.get(email, row["updated_at"])
+
+    async def _settle_expected_version(self, email: str, expected_updated_at: Optional[str]) -> Optional[str]:
+        """
+        Settle a buffered save before a conditional write and map its version.
+
+        A precondition taken from a buffered save carries the provisional
+        ``updated_at``; once the save is written it refers to the
+        committed one.
+
+        Args:
+            email: User's email address
+            expected_updated_at: Version the caller's write is conditional on
+
+        Returns:
+            The version to check against the database
+        """
+        settled = await self._settle_pending(email)
+        if settled is not None and expected_updated_at == settled[0]:
+            return settled[1]
+        return expected_updated_at
+
+    async def _discard_pending(self, emails: List[str]) -> None:
+        """
+        Drop buffered saves that the caller's write is about to supersede.
+
+        Args:
+            emails: Users' email addresses
+        """
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            for email in emails:
+                self._write_buffer.pop(email, None)
+
+    async def _fetch_user_chart_data(self, email: str) -> Optional[Dict[str, Any]]:
+        """
+        Query a user's chart data row, bypassing the cache.
+
+        Args:
+            email: User's email address
+
+        Returns:
+            Dict containing the row or None if not found
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        client = self.get_client()
+        response = await self._execute(
+            client.table(settings.CHART_DATA_TABLE)
+                  .select("*")
+                  .eq("email", email),
+            "get_user_chart_data"
+        )
+        if not response.data:
+            if self.stale is not None:
+                self.stale.invalidate(email)
+            return None
+        row = unpack_chart_row(response.data[0])
+        self._remember(row)
+        return row
+
+    def _remember(self, row: Dict[str, Any]) -> None:
+        """
+        Keep a row as the user's last known copy for reads during outages.
+
+        Args:
+            row: Row with at least email, chart_data and updated_at
+        """
+        if self.stale is not None:
+            self.stale.set(row["email"], row)
+
+    async def get_user_chart_data(self, email: str, allow_stale: bool = True) -> Optional[Dict[str, Any]]:
         """
         Retrieve user's chart data by email.
-        
+
+        Reads go through the chart data cache when it is enabled; users
+        without a row are cached negatively and failed queries are never
+        cached. A save still in the write-behind buffer is returned as is.
+
+        If the read fails (including while the circuit breaker is open),
+        the last copy this process read or saved is returned with
+        ``stale: True`` added, when there is one.
+
         Args:
             email: User's email address
-            
+            allow_stale: Fall back to the last known copy on failure;
+                callers about to write based on the row pass False
+
         Returns:
             Dict containing chart data or None if not found
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open and no copy is known
+            Exception: Propagates PostgREST/transport errors when no copy is known
         """
+        pending = self._write_buffer.get(email)
+        if pending is not None:
+            return pending
+
         try:
-            client = self.get_client()
-            response = client.table(settings.CHART_DATA_TABLE)\
-                           .select("*")\
-                           .eq("email", email)\
-                           .execute()
-            
-            return response.data[0] if response.data else None
-            
+            if self.cache is None:
+                return await self._fetch_user_chart_data(email)
+            return await self.cache.get_or_load(
+                email, lambda: self._fetch_user_chart_data(email)
+            )
+
         except Exception as e:
-            print(f"Error fetching chart data for {email}: {str(e)}")
-            return None
-    
-    async def save_chart_data(self, email: str, chart_data: Dict[str, Any]) -> bool:
+            stale = self.stale.get(email) if self.stale is not None and allow_stale else None
+            if not isinstance(e, CircuitOpenError):
+                logger.error(
+                    "Error fetching chart data",
+                    extra={"email": email, "error": str(e), "stale_fallback": stale is not None}
+                )
+            if stale is None:
+                raise
+            STALE_RESPONSES.inc()
+            return {**stale, "stale": True}
+
+    async def get_many_chart_data(self, emails: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve chart data rows for many users at once.
+
+        Buffered saves and cached rows are served from memory; the rest are fetched with
+        ``in_("email", ...)`` queries of up to CHART_BATCH_READ_CHUNK_SIZE
+        emails each (to keep URLs short), issued concurrently.
+
+        Args:
+            emails: Users' email addresses
+
+        Returns:
+            Dict mapping each found email to its row; missing users are absent
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        rows: Dict[str, Dict[str, Any]] = {}
+        pending: List[str] = []
+        for email in dict.fromkeys(emails):
+            if email in self._write_buffer:
+                rows[email] = self._write_buffer[email]
+                continue
+            cached = await self.cache.peek(email) if self.cache is not None else None
+            if cached is MISSING:
+                continue
+            if cached is not None:
+                rows[email] = cached
+            else:
+                pending.append(email)
+
+        client = self.get_client()
+        chunk_size = settings.CHART_BATCH_READ_CHUNK_SIZE
+        responses = await asyncio.gather(*(
+            self._execute(
+                client.table(settings.CHART_DATA_TABLE)
+                      .select("*")
+                      .in_("email", pending[i:i + chunk_size]),
+                "get_many_chart_data"
+            )
+            for i in range(0, len(pending), chunk_size)
+        ))
+        for response in responses:
+            for row in response.data or []:
+                rows[row["email"]] = unpack_chart_row(row)
+        return rows
+
+    async def get_user_chart_version(self, email: str) -> Optional[str]:
+        """
+        Get the ``updated_at`` of a user's chart data without its payload.
+
+        Answered from the write-behind buffer or the cache when possible,
+        otherwise with a ``select("updated_at")`` that skips the JSONB body.
+
+        Args:
+            email: User's email address
+
+        Returns:
+            The row's ``updated_at`` timestamp or None if the user has no row
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        pending = self._write_buffer.get(email)
+        if pending is not None:
+            return pending["updated_at"]
+
+        if self.cache is not None:
+            cached = await self.cache.peek(email)
+            if cached is MISSING:
+                return None
+            if cached is not None:
+                return cached["updated_at"]
+
+        client = self.get_client()
+        response = await self._execute(
+            client.table(settings.CHART_DATA_TABLE)
+                  .select("updated_at")
+                  .eq("email", email),
+            "get_user_chart_version"
+        )
+        return response.data[0]["updated_at"] if response.data else None
+
+    async def save_chart_data(self, email: str, chart_data: Dict[str, Any]) -> Optional[str]:
         """
         Save or update user's chart data.
-        
+
+        Issues a single upsert keyed on the unique ``email`` column and asks
+        PostgREST to return only ``updated_at``, so a save is one round trip
+        and concurrent first saves for the same email cannot create
+        duplicate rows.
+
+        In write-behind mode the save is buffered instead and acknowledged
+        with a provisional ``updated_at``; it falls back to a direct write
+        when the buffer holds CHART_WRITE_BEHIND_MAX_PENDING users.
+
         Args:
             email: User's email address
             chart_data: Chart configuration and data
-            
+
         Returns:
-            bool: True if save was successful, False otherwise
+            The row's ``updated_at`` timestamp if the save succeeded, None otherwise
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
         """
+        if self._flush_task is not None:
+            # Buffered saves would only pile up while the database is down
+            if self.breaker is not None:
+                self.breaker.raise_if_open()
+            updated_at = self._buffer_chart_data(email, chart_data)
+            if updated_at is not None:
+                await self.events.publish_document(email, chart_data, updated_at)
+                return updated_at
+
         try:
             client = self.get_client()
             current_time = datetime.now(timezone.utc).isoformat()
-            
-            # Check if user data exists
-            existing = await self.get_user_chart_data(email)
-            
-            if existing:
-                # Update existing record
-                response = client.table(settings.CHART_DATA_TABLE)\
-                               .update({"chart_data": chart_data, "updated_at": current_time})\
-                               .eq("email", email)\
-                               .execute()
-                print(f"📝 Updated chart data for {email}")
-            else:
-                # Create new record
-                response = client.table(settings.CHART_DATA_TABLE)\
-                               .insert({
-                                   "email": email,
-                                   "chart_data": chart_data,
-                                   "created_at": current_time,
-                                   "updated_at": current_time
-                               })\
-                               .execute()
-                print(f"✨ Created new chart data for {email}")
-            
+            document, series = pack_chart_data(chart_data)
+
+            query = client.table(settings.CHART_DATA_TABLE).upsert(
+                {"email": email, "chart_data": document, "series": series, "updated_at": current_time},
+                on_conflict="email"
+            )
+            query.params = query.params.set("select", "updated_at")
+            try:
+                response = await self._execute(query, "save_chart_data")
+            finally:
+                # The write may have landed even if the response was lost
+                if self.cache is not None:
+                    await self.cache.invalidate(email)
+
             if response.data:
-                print(f"✅ Successfully saved chart data for {email}")
-                return True
+                logger.debug("Saved chart data", extra={"email": email})
+                updated_at = response.data[0]["updated_at"]
+                self._remember({"email": email, "chart_data": chart_data, "updated_at": updated_at})
+                await self.events.publish_document(email, chart_data, updated_at)
+                return updated_at
             else:
-                print(f"❌ No data returned when saving for {email}")
-                return False
-            
+                logger.warning("No data returned when saving chart data", extra={"email": email})
+                return None
+
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(f"❌ Error saving chart data for {email}: {str(e)}")
-            return False
+            logger.error("Error saving chart data", extra={"email": email, "error": str(e)})
+            return None
 
+    async def save_many_chart_data(self, items: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Save chart data for many users with one multi-row upsert.
+
+        Buffered saves for the same users are superseded and dropped.
+
+        Args:
+            items: Mapping of email to chart data (one entry per email)
+
+        Returns:
+            Dict mapping each saved email to its new ``updated_at``
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        await self._discard_pending(list(items))
+        current_time = datetime.now(timezone.utc).isoformat()
+        saved = await self._upsert_chart_rows(
+            [
+                {"email": email, "chart_data": chart_data, "updated_at": current_time}
+                for email, chart_data in items.items()
+            ],
+            "save_many_chart_data"
+        )
+        for email, updated_at in saved.items():
+            await self.events.publish_document(email, items[email], updated_at)
+        return saved
+
+    async def merge_patch_chart_data(
+        self,
+        email: str,
+        patch: Dict[str, Any],
+        expected_updated_at: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Apply an RFC 7396 merge patch to a user's chart data inside Postgres.
+
+        The patch is merged by the ``merge_patch_chart_data`` RPC, so the
+        stored document never travels over the wire. Series fields in the
+        patch are packed and merged into the ``series`` column.
+
+        Args:
+            email: User's email address
+            patch: Merge patch document
+            expected_updated_at: Only apply if the row still has this ``updated_at``
+
+        Returns:
+            The new ``updated_at`` timestamp, or None if no row matched
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        expected_updated_at = await self._settle_expected_version(email, expected_updated_at)
+        document_patch, series_patch = pack_merge_patch(patch)
+        client = self.get_client()
+        try:
+            response = await self._execute(
+                client.rpc(settings.CHART_DATA_MERGE_PATCH_RPC, {
+                    "p_email": email,
+                    "p_patch": document_patch,
+                    "p_expected_updated_at": expected_updated_at,
+                    "p_series": series_patch or None
+                }),
+                "merge_patch_chart_data"
+            )
+        finally:
+            if self.cache is not None:
+                await self.cache.invalidate(email)
+
+        if not response.data:
+            return None
+        updated_at = response.data[0]["updated_at"]
+        await self.events.publish_patch(email, patch, updated_at)
+        return updated_at
+
+    async def update_chart_data_if_unmodified(
+        self,
+        email: str,
+        chart_data: Dict[str, Any],
+        expected_updated_at: str
+    ) -> Optional[str]:
+        """
+        Replace a user's chart data only if the row has not changed since it was read.
+
+        Args:
+            email: User's email address
+            chart_data: New chart data document
+            expected_updated_at: The ``updated_at`` the caller based its change on
+
+        Returns:
+            The new ``updated_at`` timestamp, or None if the row was modified or deleted
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        expected_updated_at = await self._settle_expected_version(email, expected_updated_at)
+        document, series = pack_chart_data(chart_data)
+        client = self.get_client()
+        query = client.table(settings.CHART_DATA_TABLE)\
+                      .update({
+                          "chart_data": document,
+                          "series": series,
+                          "updated_at": datetime.now(timezone.utc).isoformat()
+                      })\
+                      .eq("email", email)\
+                      .eq("updated_at", expected_updated_at)
+        query.params = query.params.set("select", "updated_at")
+        try:
+            response = await self._execute(query, "update_chart_data_if_unmodified")
+        finally:
+            if self.cache is not None:
+                await self.cache.invalidate(email)
+
+        if not response.data:
+            return None
+        updated_at = response.data[0]["updated_at"]
+        await self.events.publish_document(email, chart_data, updated_at)
+        return updated_at
+
+    async def delete_user_chart_data(self, email: str) -> None:
+        """
+        Delete user's chart data by email.
+
+        Args:
+            email: User's email address
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        await self._discard_pending([email])
+        client = self.get_client()
+        try:
+            await self._execute(
+                client.table(settings.CHART_DATA_TABLE)
+                      .delete()
+                      .eq("email", email),
+                "delete_user_chart_data"
+            )
+        finally:
+            if self.cache is not None:
+                await self.cache.invalidate(email)
+            if self.stale is not None:
+                self.stale.invalidate(email)
+
+        if self.cache is not None:
+            await self.cache.set(email, MISSING)
+        await self.events.publish_deleted(email)
+
+    async def list_users_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[str, str]] = None,
+        count: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        List users with chart data one keyset page at a time.
+
+        Rows are ordered by ``(updated_at, id)`` and each page starts
+        strictly after the previous page's last row, so every page costs
+        one index range scan regardless of how deep into the table it is.
+
+        Args:
+            limit: Maximum number of rows to return
+            after: ``(updated_at, id)`` of the last row of the previous page
+            count: PostgREST count method ("exact", "planned" or "estimated")
+
+        Returns:
+            Tuple of the rows (id, email, created_at, updated_at) and the
+            total row count if one was requested
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        client = self.get_client()
+        query = client.table(settings.CHART_DATA_TABLE)\
+                      .select("id, email, created_at, updated_at",
+                              count=CountMethod(count) if count else None)\
+                      .order("updated_at")\
+                      .order("id")\
+                      .limit(limit)
+        if after:
+            updated_at, row_id = after
+            query.params = query.params.add(
+                "or",
+                f'(updated_at.gt."{updated_at}",'
+                f'and(updated_at.eq."{updated_at}",id.gt.{row_id}))'
+            )
+        response = await self._execute(query, "list_users_page")
+        return response.data or [], response.count
+
+    async def save_transaction(self, transaction: Dict[str, Any]) -> None:
+        """
+        Insert or update a transaction record keyed on ``transaction_id``.
+
+        Uses the service role client; the transactions table is not
+        exposed to end users.
+
+        Args:
+            transaction: Transaction record including its status
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        client = self.get_service_client()
+        await self._execute(
+            client.table(settings.TRANSACTIONS_TABLE).upsert(
+                transaction,
+                returning=ReturnMethod.minimal,
+                on_conflict="transaction_id"
+            ),
+            "save_transaction"
+        )
+
+    async def get_transaction(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a transaction record.
+
+        Args:
+            transaction_id: The sender's transaction identifier
+
+        Returns:
+            Dict containing the transaction or None if not found
+
+        Raises:
+            Exception: Propagates PostgREST/transport errors to the caller
+        """
+        client = self.get_service_client()
+        response = await self._execute(
+            client.table(settings.TRANSACTIONS_TABLE)
+                  .select("*")
+                  .eq("transaction_id", transaction_id),
+            "get_transaction"
+        )
+        return response.data[0] if response.data else None
 
 # Global database client instance
 db_client = DatabaseClient()
@@ -134,8 +995,8 @@ db_client = DatabaseClient()
 def get_db_client() -> DatabaseClient:
     """
     Dependency function to get database client instance.
-    
+
     Returns:
         DatabaseClient: The database client instance
     """
-    return db_client
\ No newline at end of file
+    return db_client
@@ -0,0 +1,61 @@
+"""
+Canonical default chart data.
+
+This module holds the single default dataset served to users without
+saved chart data. It is serialized once at import so the fallback path
+returns pre-encoded bytes with a precomputed ETag, and the ``chart_data``
+column default in the database is generated from the same source.
+
+Run ``python -m core.defaults`` to print the SQL that sets the column
+default.
+"""
+import json
+from typing import Any, Dict
+
+import orjson
+
+from core.utils import compute_etag
+
+
+DEFAULT_CHART_DATA: Dict[str, Any] = {
+    "daily_call_volume": [45, 52, 48, 61, 55, 67, 59],
+    "average_call_duration": [120, 135, 142, 128, 151, 139, 145],
+    "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
+    "agent_performance": [
+        {"name": "Agent Alpha", "calls": 245, "rating": 4.8},
+        {"name": "Agent Beta", "calls": 189, "rating": 4.6},
+        {"name": "Agent Gamma", "calls": 167, "rating": 4.7},
+        {"name": "Agent Delta", "calls": 203, "rating": 4.5}
+    ],
+    "conversion_rate": [72, 68, 75, 71, 79, 74, 77]
+}
+
+# Body of GET /chart-data/{email} for a user without saved data
+DEFAULT_CHART_RESPONSE_BYTES: bytes = orjson.dumps(
+    {"data": DEFAULT_CHART_DATA, "is_existing": False}
+)
+
+DEFAULT_CHART_ETAG: str = compute_etag("default", DEFAULT_CHART_RESPONSE_BYTES)
+
+
+def default_chart_data_sql() -> str:
+    """
+    Render the default dataset as a Postgres jsonb literal.
+
+    Returns:
+        str: SQL expression usable as the ``chart_data`` column default
+    """
+    # One top-level key per line keeps the schema file readable
+    members = ",\n".join(
+        f"    {json.dumps(key)}: {json.dumps(value)}"
+        for key, value in DEFAULT_CHART_DATA.items()
+    )
+    literal = ("{\n" + members + "\n}").replace("'", "''")
+    return f"'{literal}'::jsonb"
+
+
+if __name__ == "__main__":
+    print(
+        "ALTER TABLE public.chart_data ALTER COLUMN chart_data SET DEFAULT "
+        f"{default_chart_data_sql()};"
+    )
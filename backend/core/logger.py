@@ -0,0 +1,93 @@
+"""
+Logging configuration for the Transaction Webhook Service.
+
+Log records are handed to a queue by the calling coroutine and written to
+stderr by a background listener thread, so logging never blocks the event
+loop on terminal or pipe I/O. Records are rendered as one JSON object per
+line (or plain text for local development) and keep any ``extra`` fields
+passed by the caller.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Any, Dict, Optional
+
+import orjson
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Render log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+def setup_logging(level: str = "INFO", log_format: str = "json") -> None:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Safe to call more than once; only the first call installs handlers.
+
+    Args:
+        level: Root log level name, e.g. "INFO"
+        log_format: "json" for structured output or "text" for plain lines
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level.upper())
+    # httpx logs every PostgREST round trip at INFO
+    logging.getLogger("httpx").setLevel(max(root.level, logging.WARNING))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get a named logger.
+
+    Args:
+        name: Logger name, usually ``__name__``
+
+    Returns:
+        logging.Logger: The logger instance
+    """
+    return logging.getLogger(name)
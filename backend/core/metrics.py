@@ -0,0 +1,217 @@
+"""
+Prometheus metrics for the Transaction Webhook Service.
+
+Defines the request, database and cache metrics exposed on ``/metrics``.
+When PROMETHEUS_MULTIPROC_DIR is set (e.g. running several Uvicorn or
+Gunicorn workers), every worker writes its samples to that directory and
+each scrape aggregates all of them, so any worker can answer ``/metrics``.
+The directory must exist and should be emptied before the server starts.
+"""
+import os
+import time
+from typing import Optional, Set, Tuple
+
+from starlette.requests import Request
+from starlette.routing import Match
+
+from core.config import get_settings
+
+settings = get_settings()
+
+# prometheus_client picks its storage when imported, so export the
+# directory from the settings (.env) before importing it
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+DB_CALL_DURATION = Histogram(
+    "db_call_duration_seconds",
+    "PostgREST round-trip latency by DatabaseClient method",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+DB_CALL_ERRORS = Counter(
+    "db_call_errors_total",
+    "PostgREST calls that raised, by DatabaseClient method",
+    ["operation"],
+)
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    "webhook_queue_depth",
+    "Transactions waiting in the webhook queue",
+    multiprocess_mode="livesum",
+)
+WEBHOOK_TRANSACTIONS = Counter(
+    "webhook_transactions_total",
+    "Webhook transactions by outcome (accepted, duplicate, rejected, processed, retried, failed)",
+    ["result"],
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by result (hit, negative_hit, miss, coalesced)",
+    ["cache", "result"],
+)
+CACHE_BACKEND_ERRORS = Counter(
+    "cache_backend_errors_total",
+    "Shared cache backend calls that failed, by operation (get, set, invalidate, subscribe)",
+    ["operation"],
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["breaker"],
+    multiprocess_mode="max",
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls rejected without being attempted because the circuit was open",
+    ["breaker"],
+)
+CHART_STREAM_CONNECTIONS = Gauge(
+    "chart_stream_connections",
+    "Open chart data event streams",
+    multiprocess_mode="livesum",
+)
+CHART_STREAM_EVENTS = Counter(
+    "chart_stream_events_total",
+    "Chart data events fanned out to streams, by type (patch, snapshot, reload, deleted)",
+    ["type"],
+)
+CHART_STREAM_EVICTIONS = Counter(
+    "chart_stream_evictions_total",
+    "Chart data streams closed for falling too far behind",
+)
+STALE_RESPONSES = Counter(
+    "chart_data_stale_responses_total",
+    "Chart data reads answered with the last known copy because the database failed",
+)
+RATE_LIMIT_REQUESTS = Counter(
+    "rate_limit_requests_total",
+    "Requests checked against a rate limit rule, by rule and result (allowed, limited, error)",
+    ["rule", "result"],
+)
+RATE_LIMIT_BUCKETS = Gauge(
+    "rate_limit_buckets",
+    "Rate limit token buckets held in worker memory",
+    multiprocess_mode="livesum",
+)
+APP_STARTUP_SECONDS = Gauge(
+    "app_startup_seconds",
+    "Seconds from process start until the worker reached a startup stage (imported, ready, first_response)",
+    ["stage"],
+    multiprocess_mode="livemax",
+)
+
+# Fallback start time where the process start time cannot be read
+_IMPORTED_AT = time.monotonic()
+_startup_stages: Set[str] = set()
+
+
+def multiprocess_enabled() -> bool:
+    """
+    Check whether metrics are aggregated across worker processes.
+
+    Returns:
+        bool: True if PROMETHEUS_MULTIPROC_DIR is set
+    """
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def route_template(request: Request) -> str:
+    """
+    Find the path template of the route that will handle a request.
+
+    Using the template (``/api/v1/chart-data/{email}``) rather than the
+    raw path keeps label cardinality bounded.
+
+    Args:
+        request: The incoming request
+
+    Returns:
+        str: The route's path template, or "unmatched"
+    """
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        Tuple of the response body and its content type
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def process_uptime() -> float:
+    """
+    Seconds since this process started.
+
+    Read from /proc on Linux, so interpreter startup and imports are
+    included; elsewhere counted from when this module was imported.
+
+    Returns:
+        float: Process age in seconds
+    """
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            # Field 22, counted after the parenthesised command name
+            start_ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic() - _IMPORTED_AT
+
+
+def record_startup_stage(stage: str) -> Optional[float]:
+    """
+    Record when the worker first reached a startup stage.
+
+    Args:
+        stage: "imported", "ready" or "first_response"
+
+    Returns:
+        The process uptime in seconds the first time ``stage`` is
+        recorded, None after that
+    """
+    if stage in _startup_stages:
+        return None
+    _startup_stages.add(stage)
+    uptime = process_uptime()
+    APP_STARTUP_SECONDS.labels(stage).set(uptime)
+    return uptime
+
+
+def mark_worker_exited() -> None:
+    """Drop this worker's live gauge samples when it shuts down."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
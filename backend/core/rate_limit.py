@@ -0,0 +1,467 @@
+"""
+Token bucket rate limiting per route and user or client.
+
+Each rule in RATE_LIMIT_RULES matches a method and a route template, and
+gives every key its own token bucket. A key is a path parameter of the
+route (e.g. ``email``, so one user's dashboards share a budget) or the
+client IP (``"ip"``, for routes without a user in the path). A bucket
+holds up to ``burst`` tokens and refills at ``rate`` tokens per second;
+each request takes one. When the bucket is empty, RateLimitMiddleware
+answers 429 with a Retry-After header before the request reaches the
+endpoint or the database.
+
+Buckets live in worker memory by default, so each worker enforces the
+limits on its own. With RATE_LIMIT_BACKEND set to "redis" all workers
+share them. The client IP is the connection's address; behind a proxy,
+let Uvicorn take it from X-Forwarded-For (``--forwarded-allow-ips``).
+"""
+import heapq
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import get_settings
+from core.logger import get_logger
+from core.metrics import RATE_LIMIT_BUCKETS, RATE_LIMIT_REQUESTS
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+IP_KEY = "ip"
+
+
+class RateLimitRule:
+    """A token bucket budget for one method and route template."""
+
+    def __init__(
+        self,
+        method: str,
+        route: str,
+        rate: float,
+        burst: int,
+        key: str = IP_KEY,
+        name: Optional[str] = None
+    ):
+        """
+        Initialize the rule.
+
+        Args:
+            method: HTTP method the rule applies to (GET also covers HEAD)
+            route: Route template, e.g. ``/api/v1/chart-data/{email}``
+            rate: Tokens added per second
+            burst: Bucket size, the most requests allowed at once
+            key: Path parameter the buckets are keyed by, or "ip"
+            name: Label for metrics (defaults to "<method> <route>")
+
+        Raises:
+            ValueError: If the rate or burst is not positive, or ``key``
+                is not a parameter of ``route``
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Rate limit for {method} {route} needs a positive rate and burst")
+        self.method = method.upper()
+        self.route = route
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.key = key
+        self.name = name or f"{self.method} {route}"
+        self.path_regex, _, parameters = compile_path(route)
+        if key != IP_KEY and key not in parameters:
+            raise ValueError(f"Rate limit for {self.name} is keyed by {key!r}, which is not in the route")
+
+        self.allowed = RATE_LIMIT_REQUESTS.labels(self.name, "allowed")
+        self.limited = RATE_LIMIT_REQUESTS.labels(self.name, "limited")
+        self.errors = RATE_LIMIT_REQUESTS.labels(self.name, "error")
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets."""
+
+    @abstractmethod
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token from a bucket, creating it full if it is new.
+
+        Args:
+            key: Bucket key
+            rate: Tokens added per second
+            burst: Bucket size
+
+        Returns:
+            float: 0 if a token was taken, else seconds until one is available
+        """
+
+    async def close(self) -> None:
+        """Release connections."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Get backend counters."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process token buckets, kept in least recently used order.
+
+    Taking a token from an existing bucket is O(1). Beyond ``max_buckets``
+    the least recently used bucket is dropped. Every ``sweep_seconds`` the
+    buckets that have refilled, and so behave like new ones, are dropped.
+    The sweep finds them in a heap ordered by the time each bucket is full
+    again. Rules refill at different rates, so the least recently used
+    bucket is not necessarily the first to refill. A sweep handles a
+    bounded batch and leaves the rest to the next requests.
+    """
+
+    # Heap entries looked at per sweep call
+    SWEEP_BATCH = 256
+
+    def __init__(self, max_buckets: int, sweep_seconds: float):
+        """
+        Initialize the backend.
+
+        Args:
+            max_buckets: Most buckets kept at once
+            sweep_seconds: Interval between sweeps of refilled buckets
+        """
+        self.max_buckets = max(1, max_buckets)
+        self.sweep_seconds = sweep_seconds
+        # Key to [tokens, time last updated, time it is full again, its heap entry]
+        self._buckets: "OrderedDict[str, List[Any]]" = OrderedDict()
+        # Heap entries [time due, key]. A bucket only moves its refill time
+        # later, so an entry is never due after its bucket is full; entries
+        # of evicted buckets are recognised by not being their bucket's own
+        self._refills: List[List[Any]] = []
+        self._next_sweep = time.monotonic() + sweep_seconds
+        self.swept = 0
+        self.evicted = 0
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        return self.take(key, rate, burst, time.monotonic())
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> float:
+        """
+        Take a token from a bucket at time ``now``.
+
+        Args:
+            key: Bucket key
+            rate: Tokens added per second
+            burst: Bucket size
+            now: Current ``time.monotonic()``
+
+        Returns:
+            float: 0 if a token was taken, else seconds until one is available
+        """
+        bucket = self._buckets.get(key)
+        entry = None
+        if bucket is None:
+            tokens = float(burst)
+            entry = [now, key]
+            bucket = self._buckets[key] = [tokens, now, now, entry]
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+            RATE_LIMIT_BUCKETS.set(len(self._buckets))
+        else:
+            tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        bucket[0], bucket[1], bucket[2] = tokens, now, now + (burst - tokens) / rate
+        if entry is not None:
+            entry[0] = bucket[2]
+            heapq.heappush(self._refills, entry)
+
+        if now >= self._next_sweep:
+            self.sweep(now)
+        return wait
+
+    def sweep(self, now: float) -> bool:
+        """
+        Drop the buckets that have refilled by ``now``.
+
+        Looks at most SWEEP_BATCH heap entries per call. When more are
+        due, the next ``take`` continues the sweep, so a mass expiry is
+        spread over requests instead of stalling one of them.
+
+        Args:
+            now: Current ``time.monotonic()``
+
+        Returns:
+            bool: True if no refilled bucket is left to drop
+        """
+        self._next_sweep = now + self.sweep_seconds
+        buckets, refills = self._buckets, self._refills
+        for _ in range(self.SWEEP_BATCH):
+            if not refills or refills[0][0] > now:
+                break
+            entry = heapq.heappop(refills)
+            key = entry[1]
+            bucket = buckets.get(key)
+            if bucket is None or bucket[3] is not entry:
+                continue  # Evicted since
+            if bucket[2] <= now:
+                del buckets[key]
+                self.swept += 1
+            else:
+                # Used since the entry was queued; due again when it refills
+                entry[0] = bucket[2]
+                heapq.heappush(refills, entry)
+        RATE_LIMIT_BUCKETS.set(len(buckets))
+        if refills and refills[0][0] <= now:
+            self._next_sweep = now
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "buckets": len(self._buckets),
+            "max_buckets": self.max_buckets,
+            "swept": self.swept,
+            "evicted": self.evicted
+        }
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Token buckets shared by every worker, kept in Redis.
+
+    Each bucket is a hash updated by one Lua script, so taking a token is
+    a single atomic round trip. Refills are computed from the Redis
+    server's clock, which keeps workers with skewed clocks consistent.
+    Buckets expire once they would be full again, so Redis sweeps them.
+    """
+
+    _SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = burst
+if bucket[1] then
+    tokens = math.min(burst, tonumber(bucket[1]) + math.max(0, now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+    def __init__(self, redis_client: Any, prefix: str = "rate_limit:"):
+        """
+        Initialize the backend.
+
+        Args:
+            redis_client: A ``redis.asyncio.Redis`` compatible client
+            prefix: Namespace for bucket keys
+        """
+        self.redis = redis_client
+        self.prefix = prefix
+        self._take = redis_client.register_script(self._SCRIPT)
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[rate, burst]))
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+class RateLimiter:
+    """
+    Matches requests to rules and takes tokens from their buckets.
+
+    The first rule matching a request's method and path applies. If the
+    backend fails, requests are let through: an unavailable Redis should
+    not take the service down with it.
+    """
+
+    def __init__(self, rules: List[RateLimitRule], backend: RateLimitBackend):
+        """
+        Initialize the limiter.
+
+        Args:
+            rules: Rules in order of precedence
+            backend: Bucket storage
+        """
+        self.rules = rules
+        self.backend = backend
+        self._rules_by_method: Dict[str, List[RateLimitRule]] = {}
+        for rule in rules:
+            self._rules_by_method.setdefault(rule.method, []).append(rule)
+        self._failing = False
+
+    def match(self, scope: Scope) -> Optional[Tuple[RateLimitRule, str]]:
+        """
+        Find the rule applying to a request and its bucket key.
+
+        Args:
+            scope: ASGI HTTP scope
+
+        Returns:
+            Tuple of the rule and the key's value, or None if no rule applies
+        """
+        method = scope["method"]
+        for rule in self._rules_by_method.get("GET" if method == "HEAD" else method, ()):
+            match = rule.path_regex.match(scope["path"])
+            if match is None:
+                continue
+            if rule.key == IP_KEY:
+                client = scope.get("client")
+                return rule, client[0] if client else "unknown"
+            return rule, match.group(rule.key)
+        return None
+
+    async def check(self, scope: Scope) -> float:
+        """
+        Take a token for a request.
+
+        Args:
+            scope: ASGI HTTP scope
+
+        Returns:
+            float: 0 if the request may proceed, else seconds until it may
+        """
+        matched = self.match(scope)
+        if matched is None:
+            return 0.0
+        rule, key = matched
+        try:
+            wait = await self.backend.acquire(f"{rule.name}:{key}", rule.rate, rule.burst)
+        except Exception as e:
+            rule.errors.inc()
+            if not self._failing:
+                self._failing = True
+                logger.warning("Rate limit backend failed, letting requests through", extra={"error": str(e)})
+            return 0.0
+        if self._failing:
+            self._failing = False
+            logger.info("Rate limit backend recovered")
+
+        if wait > 0:
+            rule.limited.inc()
+        else:
+            rule.allowed.inc()
+        return wait
+
+    async def close(self) -> None:
+        """Release the backend's connections."""
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the rules and backend.
+
+        Returns:
+            Dict with the rules and the backend's counters
+        """
+        return {
+            "rules": [
+                {"name": rule.name, "rate": rule.rate, "burst": rule.burst, "key": rule.key}
+                for rule in self.rules
+            ],
+            **self.backend.stats()
+        }
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 to requests over their rule's rate."""
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The wrapped ASGI application
+            limiter: Rate limiter checked for every HTTP request
+        """
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        wait = await self.limiter.check(scope)
+        if wait > 0:
+            response = JSONResponse(
+                {"detail": "Too many requests, retry later"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(wait)))}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def create_rate_limiter(settings: Any) -> Optional[RateLimiter]:
+    """
+    Build the rate limiter selected by the application settings.
+
+    Args:
+        settings: Application settings instance
+
+    Returns:
+        RateLimiter or None when rate limiting is disabled
+
+    Raises:
+        ValueError: If RATE_LIMIT_BACKEND names an unknown backend or a
+            RATE_LIMIT_RULES entry is invalid
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+
+    rules = []
+    for rule in settings.RATE_LIMIT_RULES:
+        try:
+            rules.append(RateLimitRule(**rule))
+        except TypeError as e:
+            raise ValueError(f"Invalid RATE_LIMIT_RULES entry {rule!r}: {e}")
+
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return RateLimiter(rules, MemoryRateLimitBackend(
+            max_buckets=settings.RATE_LIMIT_MAX_BUCKETS,
+            sweep_seconds=settings.RATE_LIMIT_SWEEP_SECONDS
+        ))
+
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        import redis.asyncio as redis_asyncio
+
+        return RateLimiter(rules, RedisRateLimitBackend(
+            redis_asyncio.from_url(settings.REDIS_URL),
+            prefix=settings.RATE_LIMIT_REDIS_PREFIX
+        ))
+
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+
+
+rate_limiter = create_rate_limiter(settings)
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Dependency function to get the rate limiter instance.
+
+    Returns:
+        RateLimiter, or None when rate limiting is disabled
+    """
+    return rate_limiter
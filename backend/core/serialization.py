@@ -0,0 +1,206 @@
+"""
+Fast JSON encoding and decoding for the API.
+
+This module routes request body parsing through orjson. Responses use
+FastAPI's ORJSONResponse, configured as the application's default
+response class in main.py.
+
+Bodies are checked against JSON_MAX_DEPTH before they are decoded:
+orjson accepts any nesting depth, and a body of a few hundred thousand
+nested arrays crashes the process.
+
+Endpoints taking large documents use ``json_body`` instead, which caps
+the body size before anything is parsed and validates the decoded body
+with a compiled pydantic TypeAdapter. Decoding with orjson and then
+validating is faster than pydantic's own JSON parsing
+(benchmarks/bench_validation.py).
+"""
+import re
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter, ValidationError
+
+from core.config import get_settings
+
+settings = get_settings()
+
+# The only escapes that can hide a quote from the skeleton below
+_ESCAPE = re.compile(rb'\\[\\"]')
+# Every byte but quotes and brackets is deleted
+_NOT_STRUCTURE = bytes(b for b in range(256) if b not in b'"[]{}')
+# Both kinds of brackets become parentheses
+_BRACKETS = bytes.maketrans(b"[{]}", b"(())")
+
+
+def check_json_depth(body: bytes, max_depth: int) -> None:
+    """
+    Refuse a JSON document nested more than ``max_depth`` levels deep.
+
+    Works on the raw bytes in a few passes that each run in C: escaped
+    quotes and backslashes are dropped, every byte but quotes and
+    brackets is deleted, string literals are cut out of that skeleton,
+    and innermost ``()`` pairs are peeled off one level per pass.
+
+    Args:
+        body: Encoded JSON document
+        max_depth: Deepest accepted nesting of arrays and objects
+
+    Raises:
+        orjson.JSONDecodeError: If the document is nested too deeply
+    """
+    if b"\\\\" in body or b'\\"' in body:
+        body = _ESCAPE.sub(b"", body)
+    skeleton = body.translate(None, _NOT_STRUCTURE)
+    if skeleton.count(b"[") + skeleton.count(b"{") <= max_depth:
+        return
+    # Strings without brackets are left as "" and pair up from the left;
+    # a quote left over opens a string holding brackets
+    brackets = skeleton.replace(b'""', b"")
+    if b'"' in brackets:
+        brackets = b"".join(skeleton.split(b'"')[::2])
+    brackets = brackets.translate(_BRACKETS)
+    # Peeling keeps the nesting of what is left, so a long enough run of
+    # opening brackets proves the document too deep at any pass
+    too_deep = b"(" * (max_depth + 1)
+    for _ in range(max_depth + 1):
+        if not brackets:
+            return
+        if too_deep in brackets:
+            break
+        peeled = brackets.replace(b"()", b"")
+        # Unbalanced brackets are left for the decoder to report
+        if len(peeled) == len(brackets):
+            return
+        brackets = peeled
+    raise orjson.JSONDecodeError(f"JSON is nested more than {max_depth} levels deep", "", 0)
+
+
+def decode_json(body: bytes) -> Any:
+    """
+    Decode a request body with orjson, enforcing JSON_MAX_DEPTH.
+
+    Args:
+        body: Encoded JSON document
+
+    Returns:
+        The decoded document
+
+    Raises:
+        orjson.JSONDecodeError: If the body is malformed or nested too deeply
+    """
+    check_json_depth(body, settings.JSON_MAX_DEPTH)
+    return orjson.loads(body)
+
+
+class ORJSONRequest(Request):
+    """Request whose JSON body is decoded with orjson."""
+
+    async def json(self) -> Any:
+        """
+        Decode the request body with orjson.
+
+        Returns:
+            The decoded JSON body
+
+        Raises:
+            orjson.JSONDecodeError: A json.JSONDecodeError subclass, so FastAPI
+                still reports malformed bodies as validation errors
+        """
+        if not hasattr(self, "_json"):
+            self._json = decode_json(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """API route that hands endpoints an ORJSONRequest."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request) -> Response:
+            return await original_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Read a request body, refusing it once it is larger than ``max_bytes``.
+
+    A Content-Length above the limit is refused before anything is read,
+    and a chunked body as soon as it grows past the limit.
+
+    Args:
+        request: The incoming request
+        max_bytes: Largest accepted body
+
+    Returns:
+        The body
+
+    Raises:
+        HTTPException: 413 if the body is too large
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body is larger than {max_bytes} bytes")
+
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    # Cache it like Request.body() does
+    request._body = body
+    return body
+
+
+def validation_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    """
+    Convert a ValidationError into request validation error details.
+
+    Offending values are left out, as they may be large.
+
+    Args:
+        error: Error raised by a pydantic validator
+
+    Returns:
+        Error details located under ``body``
+    """
+    return [
+        {**detail, "loc": ("body", *detail["loc"])}
+        for detail in error.errors(include_url=False, include_input=False)
+    ]
+
+
+def json_body(model: Any, max_bytes: int) -> Callable[[Request], Awaitable[Any]]:
+    """
+    Build a dependency that reads and validates a JSON request body.
+
+    Use it in place of a body parameter: ``body: Model = Depends(json_body(Model, limit))``.
+
+    Args:
+        model: Type of the body; its validator is compiled once, here
+        max_bytes: Largest accepted body
+
+    Returns:
+        The dependency, answering 413 for large bodies and 422 for invalid ones
+    """
+    adapter = TypeAdapter(model)
+
+    async def parse_json_body(request: Request) -> Any:
+        body = await read_body(request, max_bytes)
+        try:
+            return adapter.validate_python(decode_json(body))
+        except orjson.JSONDecodeError as e:
+            raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": f"Invalid JSON: {e}"}])
+        except ValidationError as e:
+            raise RequestValidationError(validation_errors(e))
+
+    return parse_json_body
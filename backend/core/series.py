@@ -0,0 +1,206 @@
+"""
+Compact storage codec for chart data time series.
+
+The numeric series in a chart data document (CHART_SERIES_FIELDS, e.g.
+``daily_call_volume``) grow by one point a day, so they are not stored as
+JSON number arrays. The database layer moves each one into the row's
+``series`` column as a packed string:
+
+- integer series are delta-encoded and stored in the narrowest signed
+  array type (``b``, ``h``, ``i`` or ``q``) that fits every delta
+- float series are stored as ``d`` (float64) arrays
+
+The array bytes are little-endian and zlib-compressed. They are prefixed
+with the one-character type code and base64-encoded so they fit in a
+JSONB value. Series that are empty, mix ints and floats, or hold anything
+but numbers stay in the JSONB document as they are.
+
+Callers of the database layer only ever see plain lists. ``window_series``
+cuts a range out of a series and downsamples it for responses.
+"""
+import base64
+import sys
+import zlib
+from array import array
+from itertools import accumulate, chain
+from operator import sub
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from core.config import get_settings
+
+settings = get_settings()
+
+Number = Union[int, float]
+
+# Signed integer array types from narrowest to widest, with their range
+_INT_TYPES = (
+    ("b", 2 ** 7),
+    ("h", 2 ** 15),
+    ("i", 2 ** 31),
+    ("q", 2 ** 63),
+)
+
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def encode_series(values: Any) -> Optional[str]:
+    """
+    Pack a list of numbers into its compact string form.
+
+    Args:
+        values: A series value from a chart data document
+
+    Returns:
+        The packed series, or None if the value should stay JSON
+    """
+    if not isinstance(values, list) or not values:
+        return None
+
+    if all(type(v) is int for v in values):
+        deltas = list(chain(values[:1], map(sub, values[1:], values)))
+        low, high = min(deltas), max(deltas)
+        for typecode, bound in _INT_TYPES:
+            if -bound <= low and high < bound:
+                data = array(typecode, deltas)
+                break
+        else:
+            return None
+    elif all(type(v) is float for v in values):
+        data = array("d", values)
+    else:
+        return None
+
+    if _BIG_ENDIAN:
+        data.byteswap()
+    packed = data.typecode.encode() + zlib.compress(data.tobytes())
+    return base64.b64encode(packed).decode("ascii")
+
+
+def decode_series(packed: str) -> List[Number]:
+    """
+    Unpack a series packed by ``encode_series``.
+
+    Args:
+        packed: The packed series
+
+    Returns:
+        The series as a list of ints or floats
+
+    Raises:
+        ValueError: If the packed value is malformed
+    """
+    try:
+        raw = base64.b64decode(packed, validate=True)
+        data = array(chr(raw[0]))
+        data.frombytes(zlib.decompress(raw[1:]))
+    except (ValueError, IndexError, zlib.error) as e:
+        raise ValueError(f"Malformed packed series: {e}") from e
+
+    if _BIG_ENDIAN:
+        data.byteswap()
+    if data.typecode == "d":
+        return data.tolist()
+    return list(accumulate(data))
+
+
+def pack_chart_data(chart_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Split the packable series out of a chart data document.
+
+    Args:
+        chart_data: Chart data document as saved by the client
+
+    Returns:
+        Tuple of the document without the packed series and the packed
+        series by field name (the ``chart_data`` and ``series`` columns)
+    """
+    document = dict(chart_data)
+    series = {}
+    for field in settings.CHART_SERIES_FIELDS:
+        packed = encode_series(document.get(field))
+        if packed is not None:
+            series[field] = packed
+            del document[field]
+    return document, series
+
+
+def pack_merge_patch(patch: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Optional[str]]]:
+    """
+    Split a merge patch into patches for the ``chart_data`` and ``series`` columns.
+
+    A series field in the patch is set in exactly one of the two columns
+    and removed (null) from the other, so older copies cannot linger.
+
+    Args:
+        patch: RFC 7396 merge patch for a chart data document
+
+    Returns:
+        Tuple of the document patch and the series patch (empty if the
+        patch does not touch any series field)
+    """
+    document_patch = dict(patch)
+    series_patch: Dict[str, Optional[str]] = {}
+    for field in settings.CHART_SERIES_FIELDS:
+        if field not in patch:
+            continue
+        packed = encode_series(patch[field])
+        series_patch[field] = packed
+        if packed is not None:
+            document_patch[field] = None
+    return document_patch, series_patch
+
+
+def unpack_chart_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge a row's packed series back into its chart data document.
+
+    Args:
+        row: Row as returned by PostgREST, possibly with a ``series`` column
+
+    Returns:
+        The row without ``series`` and with every series as a plain list
+
+    Raises:
+        ValueError: If a packed series is malformed
+    """
+    series = row.pop("series", None)
+    if series:
+        chart_data = dict(row["chart_data"])
+        for field, packed in series.items():
+            chart_data[field] = decode_series(packed)
+        row["chart_data"] = chart_data
+    return row
+
+
+def window_series(
+    values: List[Number],
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    points: Optional[int] = None
+) -> List[Number]:
+    """
+    Cut a range out of a series and downsample it.
+
+    Args:
+        values: The full series
+        start: First point, as a slice index (negative counts from the end)
+        stop: Point to stop before, as a slice index
+        points: Maximum number of points; longer numeric ranges are split
+            into this many equal buckets, each replaced by its mean
+
+    Returns:
+        The selected points
+    """
+    values = values[start:stop]
+    if points is None or len(values) <= points:
+        return values
+    if not all(type(v) in (int, float) for v in values):
+        # Only numeric series can be averaged
+        return values
+
+    total = len(values)
+    bounds = [i * total // points for i in range(points + 1)]
+    return [
+        sum(values[lo:hi]) / (hi - lo)
+        for lo, hi in zip(bounds, bounds[1:])
+    ]
@@ -0,0 +1,282 @@
+"""
+Request tracing for the Transaction Webhook Service.
+
+Sampled requests get OpenTelemetry spans for each stage of handling:
+
+- ``fastapi.dependencies``: body parsing, request validation and
+  dependency resolution (FastAPI runs these together)
+- ``fastapi.endpoint``: the endpoint body, with a ``db.<operation>``
+  child span per PostgREST round trip
+- ``fastapi.serialize``: response model validation and encoding
+
+The same stage durations are returned in a ``Server-Timing`` header so
+they show up in the browser's network panel. Spans are exported to the
+console (or kept in memory) so tracing works without a collector.
+
+Only a TRACING_SAMPLE_RATE fraction of requests is traced; unsampled
+requests skip span creation entirely. Requests carrying a sampled W3C
+``traceparent`` header are always traced, which lets a caller force a
+trace for a single slow request.
+"""
+import asyncio
+import functools
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Dict, Iterator, List, Optional
+
+from fastapi import Request, Response
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased
+from opentelemetry.trace import SpanKind
+
+from core.config import get_settings
+from core.serialization import ORJSONRoute
+
+settings = get_settings()
+tracer = trace.get_tracer("chart_data_service")
+
+# Server-Timing names and descriptions for each stage
+STAGES = {
+    "deps": "Dependencies and request validation",
+    "app": "Endpoint",
+    "db": "Database",
+    "serialize": "Response validation and serialization",
+}
+
+# OpenTelemetry wants wall-clock timestamps; derive them from the
+# monotonic clock so stage durations are immune to clock adjustments
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+_memory_exporter: Optional[InMemorySpanExporter] = None
+
+
+def _now_ns() -> int:
+    """Current wall-clock time in nanoseconds, from the monotonic clock."""
+    return time.perf_counter_ns() + _EPOCH_OFFSET_NS
+
+
+class RequestTrace:
+    """Root span and per-stage durations of one sampled request."""
+
+    __slots__ = ("span", "stages", "handler_started", "endpoint_finished")
+
+    def __init__(self, span: trace.Span):
+        self.span = span
+        self.stages: Dict[str, List[int]] = {}  # stage -> [total ns, count]
+        self.handler_started = 0
+        self.endpoint_finished = 0
+
+    def add(self, stage: str, duration_ns: int) -> None:
+        """
+        Add a duration to a stage's total.
+
+        Args:
+            stage: Stage name (a key of STAGES)
+            duration_ns: Duration in nanoseconds
+        """
+        entry = self.stages.setdefault(stage, [0, 0])
+        entry[0] += duration_ns
+        entry[1] += 1
+
+    def record(self, name: str, stage: str, start_ns: int, end_ns: int) -> None:
+        """
+        Record an already finished stage as a child span of the request.
+
+        Args:
+            name: Span name
+            stage: Stage name (a key of STAGES)
+            start_ns: Stage start from _now_ns()
+            end_ns: Stage end from _now_ns()
+        """
+        context = trace.set_span_in_context(self.span)
+        tracer.start_span(name, context=context, start_time=start_ns).end(end_time=end_ns)
+        self.add(stage, end_ns - start_ns)
+
+    def server_timing(self, total_seconds: float) -> str:
+        """
+        Render the stage durations as a Server-Timing header value.
+
+        Args:
+            total_seconds: Total request handling time
+
+        Returns:
+            str: Header value, e.g. ``deps;dur=0.21;desc="...", total;dur=3.5``
+        """
+        metrics = []
+        for stage, (duration_ns, count) in self.stages.items():
+            description = STAGES.get(stage, stage)
+            if count > 1:
+                description = f"{description} ({count} calls)"
+            metrics.append(f'{stage};dur={duration_ns / 1e6:.3f};desc="{description}"')
+        metrics.append(f"total;dur={total_seconds * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def setup_tracing(exporter: str = "console") -> None:
+    """
+    Install the global tracer provider.
+
+    Args:
+        exporter: "console" to print finished spans from a background
+            thread, or "memory" to keep them in-process (see finished_spans)
+
+    Raises:
+        ValueError: If the exporter name is unknown
+    """
+    global _memory_exporter
+
+    if exporter == "console":
+        processor = BatchSpanProcessor(ConsoleSpanExporter())
+    elif exporter == "memory":
+        _memory_exporter = InMemorySpanExporter()
+        processor = SimpleSpanProcessor(_memory_exporter)
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}")
+
+    # Root requests are sampled in trace_request before any span exists,
+    # so the provider only has to honour the caller's sampling decision
+    provider = TracerProvider(
+        sampler=ParentBased(root=ALWAYS_ON),
+        resource=Resource.create({"service.name": settings.APP_NAME, "service.version": settings.VERSION})
+    )
+    provider.add_span_processor(processor)
+    trace.set_tracer_provider(provider)
+
+
+def finished_spans() -> List[Any]:
+    """
+    Get spans kept by the in-memory exporter.
+
+    Returns:
+        List of finished spans (empty unless TRACING_EXPORTER is "memory")
+    """
+    return list(_memory_exporter.get_finished_spans()) if _memory_exporter else []
+
+
+@contextmanager
+def trace_request(request: Request, route: str) -> Iterator[Optional[RequestTrace]]:
+    """
+    Trace a request if it is sampled.
+
+    Args:
+        request: The incoming request
+        route: The route template handling the request
+
+    Yields:
+        RequestTrace for sampled requests, None otherwise
+    """
+    traceparent = request.headers.get("traceparent")
+    if not settings.TRACING_ENABLED or (
+        traceparent is None and random.random() >= settings.TRACING_SAMPLE_RATE
+    ):
+        yield None
+        return
+
+    span = tracer.start_span(
+        f"{request.method} {route}",
+        context=propagate.extract(request.headers) if traceparent else None,
+        kind=SpanKind.SERVER,
+        attributes={"http.method": request.method, "http.route": route, "http.target": request.url.path},
+        start_time=_now_ns()
+    )
+    if not span.is_recording():
+        # The caller's traceparent asked not to sample this request
+        yield None
+        return
+
+    request_trace = RequestTrace(span)
+    token = _current_trace.set(request_trace)
+    try:
+        with trace.use_span(span, end_on_exit=False):
+            yield request_trace
+    finally:
+        _current_trace.reset(token)
+        span.end(end_time=_now_ns())
+
+
+@contextmanager
+def stage_span(name: str, stage: str, **attributes: Any) -> Iterator[None]:
+    """
+    Time a block as a child span of the current request, if it is traced.
+
+    Args:
+        name: Span name, e.g. ``db.get_user_chart_data``
+        stage: Server-Timing stage the duration counts towards
+        **attributes: Span attributes
+    """
+    request_trace = _current_trace.get()
+    if request_trace is None:
+        yield
+        return
+
+    start_ns = _now_ns()
+    span = tracer.start_span(name, attributes=attributes, start_time=start_ns)
+    try:
+        with trace.use_span(span, end_on_exit=False, record_exception=True, set_status_on_exception=True):
+            yield
+    finally:
+        end_ns = _now_ns()
+        span.end(end_time=end_ns)
+        request_trace.add(stage, end_ns - start_ns)
+
+
+def _trace_endpoint(endpoint: Callable[..., Coroutine[Any, Any, Any]]) -> Callable[..., Coroutine[Any, Any, Any]]:
+    """
+    Wrap an async endpoint so its dependency and body stages are traced.
+
+    ``functools.wraps`` keeps the signature FastAPI inspects for
+    parameters, dependencies and the response model.
+    """
+    if getattr(endpoint, "_traced", False):
+        # include_router() rebuilds routes from already wrapped endpoints
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def traced_endpoint(*args: Any, **kwargs: Any) -> Any:
+        request_trace = _current_trace.get()
+        if request_trace is None:
+            return await endpoint(*args, **kwargs)
+
+        request_trace.record("fastapi.dependencies", "deps", request_trace.handler_started, _now_ns())
+        with stage_span("fastapi.endpoint", "app"):
+            result = await endpoint(*args, **kwargs)
+        request_trace.endpoint_finished = _now_ns()
+        return result
+
+    traced_endpoint._traced = True  # type: ignore[attr-defined]
+    return traced_endpoint
+
+
+class TracedRoute(ORJSONRoute):
+    """ORJSONRoute that splits sampled requests into traced stages."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        # Sync endpoints run in FastAPI's thread pool and are left as they are
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = _trace_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_handler = super().get_route_handler()
+
+        async def traced_route_handler(request: Request) -> Response:
+            request_trace = _current_trace.get()
+            if request_trace is None:
+                return await original_handler(request)
+
+            request_trace.handler_started = _now_ns()
+            response = await original_handler(request)
+            if request_trace.endpoint_finished:
+                request_trace.record("fastapi.serialize", "serialize", request_trace.endpoint_finished, _now_ns())
+            return response
+
+        return traced_route_handler
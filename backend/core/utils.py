@@ -5,10 +5,12 @@ This module contains common utility functions, decorators, and helpers
 that are used across different parts of the application.
 """
 import time
+import json
+import base64
 import hashlib
 import asyncio
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Callable
+from typing import Any, Dict, List, Optional, Callable
 from functools import wraps
 
 
@@ -21,6 +23,167 @@ def get_current_timestamp() -> str:
     """
     return datetime.now(timezone.utc).isoformat()
 
+
+def compute_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from the values that identify a representation.
+
+    Args:
+        *parts: Values such as a key and its last-modified timestamp
+
+    Returns:
+        str: Quoted ETag value suitable for the ETag header
+    """
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def compute_idempotency_key(payload: Dict[str, Any], header: Optional[str] = None) -> str:
+    """
+    Derive the idempotency key of a webhook delivery.
+
+    A sender-supplied Idempotency-Key header wins; otherwise the key is
+    the hash of the canonical (key-sorted) JSON payload, so a retried
+    delivery of the same body maps to the same key. Both are hashed so
+    index entries have a fixed size whatever the header holds.
+
+    Args:
+        payload: Validated request payload
+        header: Value of the Idempotency-Key header, if any
+
+    Returns:
+        str: Hex digest prefixed with its source ("key:" or "body:")
+    """
+    if header:
+        return "key:" + hashlib.sha256(header.encode()).hexdigest()
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return "body:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# Content codings that get their own strong ETag (see encoding_etag)
+ETAG_CONTENT_CODINGS = ("br", "zstd", "gzip")
+
+
+def encoding_etag(etag: str, encoding: str) -> str:
+    """
+    Derive the ETag of a content-coded representation.
+
+    Strong validators must differ between representations (RFC 9110,
+    section 8.8.3), so a compressed body gets ``"<tag>-<encoding>"``.
+    Weak ETags are shared by every encoding and returned unchanged.
+
+    Args:
+        etag: Quoted ETag of the uncompressed representation
+        encoding: Content coding of the body, e.g. "br"
+
+    Returns:
+        str: The ETag to send with the coded body
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(etag: str) -> str:
+    """Undo ``encoding_etag``, giving the ETag of the uncompressed representation."""
+    base, separator, coding = etag[:-1].rpartition("-")
+    if separator and coding in ETAG_CONTENT_CODINGS and etag.endswith('"'):
+        return base + '"'
+    return etag
+
+
+def matching_etag(header: Optional[str], etag: str, weak: bool = True) -> Optional[str]:
+    """
+    Find the entry of an If-None-Match or If-Match header matching the current ETag.
+
+    If-None-Match uses weak comparison, so a ``W/`` prefix on either side
+    is ignored. If-Match requires strong comparison (``weak=False``), where
+    weak validators never match. Either way an encoding suffix added by
+    ``encoding_etag`` is ignored: it names the same version in another
+    content coding.
+
+    Args:
+        header: Raw If-None-Match or If-Match header value
+        etag: Current quoted ETag of the uncompressed representation
+        weak: Use weak instead of strong comparison
+
+    Returns:
+        The listed ETag that matched (``etag`` itself for ``*``), or None
+    """
+    if not header:
+        return None
+    if header.strip() == "*":
+        return etag
+
+    if etag.startswith("W/"):
+        if not weak:
+            return None
+        etag = etag[2:]
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        tag = candidate
+        if tag.startswith("W/"):
+            if not weak:
+                continue
+            tag = tag[2:]
+        if _strip_encoding(tag) == etag:
+            return candidate
+    return None
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """
+    Check an If-None-Match or If-Match header against the current ETag.
+
+    Args:
+        header: Raw If-None-Match or If-Match header value
+        etag: Current quoted ETag
+        weak: Use weak instead of strong comparison (see ``matching_etag``)
+
+    Returns:
+        bool: True if one of the listed ETags matches the current one
+    """
+    return matching_etag(header, etag, weak) is not None
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode keyset pagination values into an opaque URL-safe cursor.
+
+    Args:
+        *values: Sort key values of the last row on the current page
+
+    Returns:
+        str: Opaque cursor string
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Opaque cursor string
+        size: Expected number of sort key values
+
+    Returns:
+        List of sort key values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
 class ResponseFormatter:
     """Helper class for formatting consistent API responses."""
     
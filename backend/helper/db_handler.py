@@ -5,9 +5,10 @@ This module provides specialized database operations and helper functions
 for managing transactions and user data with proper error handling and
 connection management.
 """
+import copy
 from typing import Dict, Any, List, Optional
 from core.db import DatabaseClient
-from core.utils import get_current_timestamp
+from core.defaults import DEFAULT_CHART_DATA
 
 
 class UserDataHandler:
@@ -48,12 +49,12 @@ class UserDataHandler:
                 raise ValueError("Invalid email format")
             
             # Save chart data
-            success = await self.db_client.save_chart_data(email, chart_data)
+            updated_at = await self.db_client.save_chart_data(email, chart_data)
             
             return {
-                "success": success,
+                "success": updated_at is not None,
                 "email": email,
-                "updated_at": get_current_timestamp()
+                "updated_at": updated_at
             }
             
         except Exception as e:
@@ -108,21 +109,6 @@ class UserDataHandler:
         Get default chart data for new users.
         
         Returns:
-            Dict containing default chart configuration
+            Dict containing a copy of the canonical default chart configuration
         """
-        return {
-            "daily_call_volume": [50, 70, 90, 65, 80, 75, 95],
-            "average_call_duration": [120, 135, 110, 145, 130, 125, 140],
-            "call_sentiment": {
-                "positive": 60,
-                "neutral": 25,
-                "negative": 15
-            },
-            "agent_performance": [
-                {"name": "Agent A", "calls": 45, "rating": 4.5},
-                {"name": "Agent B", "calls": 38, "rating": 4.2},
-                {"name": "Agent C", "calls": 52, "rating": 4.8},
-                {"name": "Agent D", "calls": 41, "rating": 4.3}
-            ],
-            "conversion_rate": [12.5, 15.2, 11.8, 14.7, 13.9, 16.1, 15.8]
-        }
\ No newline at end of file
+        return copy.deepcopy(DEFAULT_CHART_DATA)
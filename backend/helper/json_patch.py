@@ -0,0 +1,183 @@
+"""
+JSON Patch helper module.
+
+This module applies RFC 6902 JSON Patch documents to chart data. RFC 7396
+merge patches are applied to stored rows inside Postgres by
+``jsonb_merge_patch``; the in-memory merge patch helpers used by the
+chart data stream live in ``helper.merge_patch``.
+"""
+import copy
+from typing import Any, Dict, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    """Raised when a patch document is malformed or cannot be applied."""
+
+
+def _parse_pointer(pointer: str) -> List[str]:
+    """
+    Split an RFC 6901 JSON Pointer into unescaped reference tokens.
+
+    Args:
+        pointer: JSON Pointer such as ``/agent_performance/0/calls``
+
+    Returns:
+        List of reference tokens
+
+    Raises:
+        JsonPatchError: If the pointer is not empty and lacks a leading slash
+    """
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _array_index(container: List[Any], token: str, allow_end: bool) -> int:
+    """
+    Resolve a reference token to a list index.
+
+    Args:
+        container: The list being addressed
+        token: Reference token
+        allow_end: Whether ``-`` or ``len(container)`` are valid (for add)
+
+    Returns:
+        int: The resolved index
+
+    Raises:
+        JsonPatchError: If the token is not a valid index for the list
+    """
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+
+def _resolve_parent(document: Any, pointer: str) -> Tuple[Any, str]:
+    """
+    Find the container that holds the location a pointer refers to.
+
+    Args:
+        document: Root document
+        pointer: JSON Pointer to the target location
+
+    Returns:
+        Tuple of the parent container and the final reference token
+
+    Raises:
+        JsonPatchError: If the path does not exist
+    """
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError("Operation on the document root is not supported")
+
+    parent = document
+    for token in tokens[:-1]:
+        if isinstance(parent, dict):
+            if token not in parent:
+                raise JsonPatchError(f"Path not found: {pointer}")
+            parent = parent[token]
+        elif isinstance(parent, list):
+            parent = parent[_array_index(parent, token, allow_end=False)]
+        else:
+            raise JsonPatchError(f"Path not found: {pointer}")
+    return parent, tokens[-1]
+
+
+def _get(document: Any, pointer: str) -> Any:
+    """Read the value a pointer refers to."""
+    if pointer == "":
+        return document
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {pointer}")
+        return parent[token]
+    if isinstance(parent, list):
+        return parent[_array_index(parent, token, allow_end=False)]
+    raise JsonPatchError(f"Path not found: {pointer}")
+
+
+def _add(document: Any, pointer: str, value: Any) -> None:
+    """Insert or set a value at a pointer."""
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Path not found: {pointer}")
+
+
+def _remove(document: Any, pointer: str) -> Any:
+    """Remove and return the value at a pointer."""
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {pointer}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, token, allow_end=False))
+    raise JsonPatchError(f"Path not found: {pointer}")
+
+
+def apply_json_patch(document: Dict[str, Any], operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply an RFC 6902 JSON Patch.
+
+    Operations are applied in order to a copy of the document; if any
+    operation fails, the whole patch is rejected.
+
+    Args:
+        document: Document to patch (left unmodified)
+        operations: List of patch operations
+
+    Returns:
+        The patched document
+
+    Raises:
+        JsonPatchError: If an operation is malformed, a path does not exist
+            or a ``test`` operation fails
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("JSON Patch must be an array of operations")
+
+    result = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JsonPatchError(f"Malformed operation: {operation!r}")
+
+        op = operation["op"]
+        path = operation["path"]
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"Operation {op!r} requires a value")
+        if op in ("move", "copy") and "from" not in operation:
+            raise JsonPatchError(f"Operation {op!r} requires a from path")
+
+        if op == "add":
+            _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(result, path)
+        elif op == "replace":
+            _remove(result, path)
+            _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            if path.startswith(operation["from"] + "/"):
+                raise JsonPatchError("Cannot move a value into one of its children")
+            _add(result, path, _remove(result, operation["from"]))
+        elif op == "copy":
+            _add(result, path, copy.deepcopy(_get(result, operation["from"])))
+        elif op == "test":
+            if _get(result, path) != operation["value"]:
+                raise JsonPatchError(f"Test failed at {path}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+
+    return result
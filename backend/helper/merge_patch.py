@@ -0,0 +1,80 @@
+"""
+JSON Merge Patch helper module.
+
+RFC 7396 merge patches are applied to stored rows inside Postgres by
+``jsonb_merge_patch``. This module provides the Python side needed by the
+chart data stream: applying a patch to a document held in memory and
+computing the patch between two versions of a document, so connected
+clients receive only what changed.
+"""
+from typing import Any, Dict, Optional
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """
+    Apply an RFC 7396 merge patch without modifying the target.
+
+    Args:
+        target: Document to patch
+        patch: Merge patch; ``null`` members remove keys
+
+    Returns:
+        The patched document
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def _contains_null(value: Any) -> bool:
+    """Check whether a value holds ``null`` anywhere inside an object."""
+    if value is None:
+        return True
+    if isinstance(value, dict):
+        return any(_contains_null(item) for item in value.values())
+    return False
+
+
+def diff_merge_patch(source: Dict[str, Any], target: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Compute a merge patch that turns ``source`` into ``target``.
+
+    Objects are compared member by member; any other changed value,
+    including arrays, is replaced as a whole.
+
+    Args:
+        source: Document before the change
+        target: Document after the change
+
+    Returns:
+        The merge patch (empty if the documents are equal), or None if the
+        target holds ``null`` object members, which a merge patch cannot set
+    """
+    patch: Dict[str, Any] = {}
+    for key in source:
+        if key not in target:
+            patch[key] = None
+    for key, value in target.items():
+        if key not in source:
+            if _contains_null(value):
+                return None
+            patch[key] = value
+            continue
+        previous = source[key]
+        if isinstance(previous, dict) and isinstance(value, dict):
+            nested = diff_merge_patch(previous, value)
+            if nested is None:
+                return None
+            if nested:
+                patch[key] = nested
+        elif previous != value or type(previous) is not type(value):
+            if _contains_null(value):
+                return None
+            patch[key] = value
+    return patch
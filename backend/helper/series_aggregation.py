@@ -0,0 +1,211 @@
+"""
+Series aggregation helper module.
+
+This module computes the views the dashboard charts plot from a long
+series, so the browser receives a few hundred points instead of the raw
+array: per-bucket statistics, trailing rolling means and
+Largest-Triangle-Three-Buckets (LTTB) downsampling. All of them operate on
+float64 NumPy arrays.
+
+NumPy is imported by the functions that use it rather than at module
+import: it is a large part of the service's import time, and only the
+series aggregation endpoints need it.
+"""
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class SeriesAggregationError(ValueError):
+    """Raised when a series or the aggregation parameters are invalid."""
+
+
+_PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?|100)$")
+
+BASIC_STATS = ("sum", "mean", "min", "max", "count")
+
+
+def parse_stats(stats: str) -> List[str]:
+    """
+    Parse a comma-separated list of bucket statistics.
+
+    Args:
+        stats: Statistic names such as ``"mean,max,p95"``; percentiles are
+            written ``p<0-100>``
+
+    Returns:
+        List of distinct statistic names in request order
+
+    Raises:
+        SeriesAggregationError: If a name is not a known statistic
+    """
+    names = [name.strip() for name in stats.split(",") if name.strip()]
+    if not names:
+        raise SeriesAggregationError("At least one statistic is required")
+    for name in names:
+        if name not in BASIC_STATS and not _PERCENTILE.match(name):
+            raise SeriesAggregationError(f"Unknown statistic: {name!r}")
+    return list(dict.fromkeys(names))
+
+
+def as_float_array(values: List[Any]) -> "np.ndarray":
+    """
+    Convert a stored series to a float64 array.
+
+    Args:
+        values: Series value from a chart data document
+
+    Returns:
+        The series as a one-dimensional float64 array
+
+    Raises:
+        SeriesAggregationError: If the value is not a list of numbers
+    """
+    import numpy as np
+
+    try:
+        array = np.asarray(values)
+    except (ValueError, OverflowError) as e:
+        raise SeriesAggregationError(f"Series is not a list of numbers: {e}")
+    if array.ndim != 1 or (array.size and array.dtype.kind not in "iuf"):
+        raise SeriesAggregationError("Series is not a list of numbers")
+    return array.astype(np.float64)
+
+
+def bucket_bounds(length: int, buckets: int) -> "np.ndarray":
+    """
+    Split ``length`` points into ``buckets`` contiguous buckets.
+
+    Bucket sizes differ by at most one point.
+
+    Args:
+        length: Number of points
+        buckets: Number of buckets (at most ``length``)
+
+    Returns:
+        Array of ``buckets + 1`` boundaries; bucket ``i`` is ``[b[i], b[i+1])``
+    """
+    import numpy as np
+
+    return np.arange(buckets + 1) * length // buckets
+
+
+def bucket_stats(values: "np.ndarray", buckets: int, stats: List[str]) -> Tuple["np.ndarray", Dict[str, "np.ndarray"]]:
+    """
+    Compute statistics over equal-width buckets of a series.
+
+    Sums, minima and maxima are reduced per bucket with ``reduceat``.
+    Bucket sizes take at most two values, so percentiles are computed on
+    one ``buckets x size`` matrix per size and no statistic loops over
+    buckets in Python.
+
+    Args:
+        values: The series
+        buckets: Number of buckets; capped at the series length
+        stats: Statistic names from ``parse_stats``
+
+    Returns:
+        Tuple of each bucket's first index and a dict of statistic name to
+        one value per bucket
+    """
+    import numpy as np
+
+    buckets = max(1, min(buckets, len(values)))
+    bounds = bucket_bounds(len(values), buckets)
+    starts, counts = bounds[:-1], np.diff(bounds)
+
+    result: Dict[str, "np.ndarray"] = {}
+    sums = None
+    for name in stats:
+        if name in ("sum", "mean"):
+            if sums is None:
+                sums = np.add.reduceat(values, starts)
+            result[name] = sums if name == "sum" else sums / counts
+        elif name == "min":
+            result[name] = np.minimum.reduceat(values, starts)
+        elif name == "max":
+            result[name] = np.maximum.reduceat(values, starts)
+        elif name == "count":
+            result[name] = counts
+
+    percentiles = [name for name in stats if name.startswith("p")]
+    if percentiles:
+        quantiles = np.empty((len(percentiles), buckets))
+        for size in np.unique(counts):
+            group = counts == size
+            matrix = values[starts[group][:, None] + np.arange(size)]
+            quantiles[:, group] = np.percentile(matrix, [float(name[1:]) for name in percentiles], axis=1)
+        for name, row in zip(percentiles, quantiles):
+            result[name] = row
+
+    return starts, result
+
+
+def rolling_mean(values: "np.ndarray", window: int) -> "np.ndarray":
+    """
+    Trailing rolling mean with the same length as the series.
+
+    The first ``window - 1`` points average over the points available so far.
+
+    Args:
+        values: The series
+        window: Number of points per window
+
+    Returns:
+        Array of rolling means
+    """
+    import numpy as np
+
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def lttb(values: "np.ndarray", threshold: int) -> "np.ndarray":
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket. This preserves peaks and troughs that
+    bucket averaging would flatten. The next-bucket averages are computed
+    up front; only the argmax over each bucket depends on the previous
+    choice.
+
+    Args:
+        values: The series
+        threshold: Number of points to keep (at least 3)
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    import numpy as np
+
+    length = len(values)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.arange(length, dtype=np.float64)
+    # Buckets cover the points between the first and the last one
+    bounds = np.floor(np.arange(threshold - 1) * (length - 2) / (threshold - 2)).astype(np.int64) + 1
+    bounds[-1] = length - 1
+    sums = np.add.reduceat(values[:-1], bounds[:-1])
+    counts = np.diff(bounds)
+    averages_x = np.append((np.add.reduceat(x[:-1], bounds[:-1]) / counts)[1:], x[-1])
+    averages_y = np.append((sums / counts)[1:], values[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs(
+            (x[a] - averages_x[i]) * (values[lo:hi] - values[a])
+            - (x[a] - x[lo:hi]) * (averages_y[i] - values[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
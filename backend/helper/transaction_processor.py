@@ -0,0 +1,293 @@
+"""
+Background processing for transaction webhooks.
+
+Webhook requests only validate and enqueue a transaction, so they answer
+well within the 500ms budget. A fixed pool of asyncio workers takes
+transactions off a bounded queue, waits out PROCESSING_DELAY_SECONDS
+from the moment each one was received and records it as processed,
+retrying failed writes with exponential backoff.
+
+Senders retry aggressively, so every accepted delivery is remembered in
+a bounded LRU index keyed by its idempotency key. A repeated delivery is
+answered with the original 202 response from that index: no queueing and
+no database write. Deliveries that fall out of the index still collapse
+onto one row through the unique ``transaction_id`` in the database.
+
+The queue and the index are per process. Transactions waiting in the
+queue are reported by the process that accepted them; once processed
+they are in the database and visible to every worker.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from core.cache import TTLCache
+from core.config import get_settings
+from core.db import DatabaseClient, get_db_client
+from core.logger import get_logger
+from core.metrics import WEBHOOK_QUEUE_DEPTH, WEBHOOK_TRANSACTIONS
+from core.utils import get_current_timestamp
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+STATUS_PROCESSING = "PROCESSING"
+STATUS_PROCESSED = "PROCESSED"
+STATUS_FAILED = "FAILED"
+
+
+class TransactionProcessor:
+    """
+    Bounded queue of webhook transactions drained by a pool of workers.
+
+    Transactions are processed in arrival order. Because every
+    transaction waits the same delay, a worker only sleeps while the
+    oldest queued transaction is younger than the delay, so throughput
+    is not limited to one transaction per worker per delay.
+    """
+
+    def __init__(
+        self,
+        db_client: DatabaseClient,
+        workers: int,
+        queue_size: int,
+        delay_seconds: float,
+        max_retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        idempotency_index: TTLCache
+    ):
+        """
+        Initialize the processor.
+
+        Args:
+            db_client: Database client used to record transactions
+            workers: Number of concurrent workers
+            queue_size: Maximum number of queued transactions
+            delay_seconds: Processing delay measured from receipt
+            max_retries: Retries after the first failed attempt
+            retry_base_delay: Backoff before the first retry, doubled each time
+            retry_max_delay: Upper bound for a single backoff
+            idempotency_index: LRU of idempotency key to original 202 response
+        """
+        self.db_client = db_client
+        self.workers = workers
+        self.queue_size = queue_size
+        self.delay_seconds = delay_seconds
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.idempotency_index = idempotency_index
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._draining: Optional[asyncio.Event] = None
+        self._accepting = False
+
+    @property
+    def accepting(self) -> bool:
+        """Whether new transactions are being accepted."""
+        return self._accepting
+
+    def start(self) -> None:
+        """Create the queue and spawn the workers on the running loop."""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._draining = asyncio.Event()
+        self._tasks = [
+            asyncio.ensure_future(self._worker()) for _ in range(max(1, self.workers))
+        ]
+        self._accepting = True
+
+    def submit(self, transaction: Dict[str, Any]) -> bool:
+        """
+        Queue a validated transaction without waiting.
+
+        Args:
+            transaction: Transaction fields from the webhook payload
+
+        Returns:
+            bool: False if the queue is full or the processor is not accepting
+        """
+        if not self._accepting or self._queue is None:
+            return False
+
+        record = {
+            **transaction,
+            "status": STATUS_PROCESSING,
+            "created_at": get_current_timestamp(),
+            "processed_at": None
+        }
+        try:
+            self._queue.put_nowait((time.monotonic(), record))
+        except asyncio.QueueFull:
+            WEBHOOK_TRANSACTIONS.labels("rejected").inc()
+            return False
+
+        self._pending[record["transaction_id"]] = record
+        WEBHOOK_TRANSACTIONS.labels("accepted").inc()
+        WEBHOOK_QUEUE_DEPTH.inc()
+        return True
+
+    def find_accepted(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the response given to an earlier delivery with the same key.
+
+        Args:
+            idempotency_key: Key from compute_idempotency_key
+
+        Returns:
+            The original 202 response body, or None for a new delivery
+        """
+        response = self.idempotency_index.get(idempotency_key)
+        if response is not None:
+            WEBHOOK_TRANSACTIONS.labels("duplicate").inc()
+        return response
+
+    def remember_accepted(self, idempotency_key: str, response: Dict[str, Any]) -> None:
+        """
+        Record the response given to an accepted delivery.
+
+        Args:
+            idempotency_key: Key from compute_idempotency_key
+            response: The 202 response body to replay to duplicates
+        """
+        self.idempotency_index.set(idempotency_key, response)
+
+    def get_status(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a transaction that this process has not finished yet.
+
+        Args:
+            transaction_id: The sender's transaction identifier
+
+        Returns:
+            The transaction record or None if it is not pending here
+        """
+        return self._pending.get(transaction_id)
+
+    async def _worker(self) -> None:
+        """Process queued transactions until cancelled."""
+        while True:
+            received_at, record = await self._queue.get()
+            WEBHOOK_QUEUE_DEPTH.dec()
+            try:
+                remaining = received_at + self.delay_seconds - time.monotonic()
+                if remaining > 0 and not self._draining.is_set():
+                    # Wake early when shutting down so the queue can drain
+                    try:
+                        await asyncio.wait_for(self._draining.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                await self._process(record)
+            except Exception as e:
+                logger.error(
+                    "Unexpected error processing transaction",
+                    extra={"transaction_id": record["transaction_id"], "error": str(e)}
+                )
+            finally:
+                self._pending.pop(record["transaction_id"], None)
+                self._queue.task_done()
+
+    async def _process(self, record: Dict[str, Any]) -> None:
+        """
+        Record a transaction as processed, retrying with exponential backoff.
+
+        After MAX_RETRY_ATTEMPTS failed retries the transaction is recorded
+        as failed (best effort).
+
+        Args:
+            record: The pending transaction record
+        """
+        transaction_id = record["transaction_id"]
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.db_client.save_transaction({
+                    **record,
+                    "status": STATUS_PROCESSED,
+                    "processed_at": get_current_timestamp()
+                })
+                WEBHOOK_TRANSACTIONS.labels("processed").inc()
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    error = str(e)
+                    break
+                backoff = min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)
+                WEBHOOK_TRANSACTIONS.labels("retried").inc()
+                logger.warning(
+                    "Transaction processing failed, retrying",
+                    extra={"transaction_id": transaction_id, "attempt": attempt + 1, "error": str(e)}
+                )
+                # Jitter keeps workers from retrying in lockstep
+                await asyncio.sleep(random.uniform(backoff / 2, backoff))
+
+        WEBHOOK_TRANSACTIONS.labels("failed").inc()
+        logger.error(
+            "Transaction processing failed permanently",
+            extra={"transaction_id": transaction_id, "attempts": self.max_retries + 1, "error": error}
+        )
+        try:
+            await self.db_client.save_transaction({**record, "status": STATUS_FAILED})
+        except Exception as e:
+            logger.error(
+                "Could not record failed transaction",
+                extra={"transaction_id": transaction_id, "error": str(e)}
+            )
+
+    async def stop(self, timeout: float) -> None:
+        """
+        Stop accepting transactions and drain the queue.
+
+        Queued transactions skip the rest of their processing delay. Any
+        still unprocessed after ``timeout`` seconds are logged and dropped.
+
+        Args:
+            timeout: Maximum seconds to wait for the queue to drain
+        """
+        if self._queue is None:
+            return
+
+        self._accepting = False
+        self._draining.set()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Shutdown drain timed out, dropping unprocessed transactions",
+                extra={"transaction_ids": list(self._pending)}
+            )
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+# Global transaction processor instance
+transaction_processor = TransactionProcessor(
+    get_db_client(),
+    workers=settings.WEBHOOK_WORKERS,
+    queue_size=settings.WEBHOOK_QUEUE_MAX_SIZE,
+    delay_seconds=settings.PROCESSING_DELAY_SECONDS,
+    max_retries=settings.MAX_RETRY_ATTEMPTS,
+    retry_base_delay=settings.WEBHOOK_RETRY_BASE_DELAY_SECONDS,
+    retry_max_delay=settings.WEBHOOK_RETRY_MAX_DELAY_SECONDS,
+    idempotency_index=TTLCache(
+        max_entries=settings.WEBHOOK_IDEMPOTENCY_MAX_KEYS,
+        max_bytes=settings.WEBHOOK_IDEMPOTENCY_MAX_BYTES,
+        ttl_seconds=settings.WEBHOOK_IDEMPOTENCY_TTL_SECONDS,
+        negative_ttl_seconds=0
+    )
+)
+
+
+def get_transaction_processor() -> TransactionProcessor:
+    """
+    Dependency function to get the transaction processor instance.
+
+    Returns:
+        TransactionProcessor: The transaction processor instance
+    """
+    return transaction_processor
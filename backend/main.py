@@ -3,16 +3,55 @@ webhooks with proper routing, middleware, and error handling configuration.
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
 from contextlib import asynccontextmanager
-import uvicorn
+from typing import List
+import asyncio
+import importlib
 import time
 
+from core.compression import CompressionMiddleware
 from core.config import get_settings
+from core.logger import setup_logging, get_logger
+from core.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_PROGRESS,
+    mark_worker_exited,
+    record_startup_stage,
+    render_metrics,
+    route_template,
+)
+from core.rate_limit import RateLimitMiddleware, get_rate_limiter
+from core.tracing import setup_tracing, trace_request
+from core.chart_events import get_chart_event_hub
+from core.db import get_db_client
+from helper.transaction_processor import get_transaction_processor
 from api.v1.routes import initialize_v1_routes
 
 settings = get_settings()
+setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+if settings.TRACING_ENABLED:
+    setup_tracing(settings.TRACING_EXPORTER)
+logger = get_logger(__name__)
+
+
+async def preload_modules(names: List[str]) -> None:
+    """
+    Import modules deferred to first use, off the event loop.
+
+    Started once the service is ready, so the first request that needs
+    them does not pay for their import.
+
+    Args:
+        names: Module names (STARTUP_PRELOAD_MODULES)
+    """
+    for name in names:
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except Exception as e:
+            logger.warning("Module preload failed", extra={"module_name": name, "error": str(e)})
 
 
 @asynccontextmanager
@@ -24,9 +63,26 @@ async def lifespan(app: FastAPI):
         app: FastAPI application instance
     """
     # Startup
-    print(f"🚀 Starting {settings.APP_NAME} v{settings.VERSION}")
-    print(f"🔧 Debug mode: {settings.DEBUG}")
+    logger.info(
+        "Starting service",
+        extra={"app": settings.APP_NAME, "version": settings.VERSION, "debug": settings.DEBUG}
+    )
+    await get_db_client().start()
+    await get_chart_event_hub().start()
+    get_transaction_processor().start()
+    ready = record_startup_stage("ready")
+    if ready is not None:
+        logger.info("Service ready", extra={"uptime_seconds": round(ready, 3)})
+    preload = asyncio.ensure_future(preload_modules(settings.STARTUP_PRELOAD_MODULES))
     yield
+    preload.cancel()
+    # Shutdown: drain queued transactions while the database is still open
+    await get_transaction_processor().stop(settings.WEBHOOK_DRAIN_TIMEOUT_SECONDS)
+    await get_chart_event_hub().close()
+    if get_rate_limiter() is not None:
+        await get_rate_limiter().close()
+    await get_db_client().close()
+    mark_worker_exited()
 
 
 
@@ -37,9 +93,15 @@ app = FastAPI(
     description="Production-ready service with background processing",
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Answer 429 to clients over their RATE_LIMIT_RULES budget. Added before
+# CORS so it runs inside it and 429 responses keep their CORS headers
+if get_rate_limiter() is not None:
+    app.add_middleware(RateLimitMiddleware, limiter=get_rate_limiter())
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +111,20 @@ app.add_middleware(
     allow_headers=settings.CORS_ALLOW_HEADERS,
 )
 
+# Compress JSON responses for clients that accept br, zstd or gzip
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        thread_minimum_size=settings.COMPRESSION_THREADPOOL_MIN_SIZE,
+        levels={
+            "br": settings.COMPRESSION_BROTLI_QUALITY,
+            "zstd": settings.COMPRESSION_ZSTD_LEVEL,
+            "gzip": settings.COMPRESSION_GZIP_LEVEL,
+        },
+        threads=settings.COMPRESSION_THREADS
+    )
+
 
 # Response time middleware
 @app.middleware("http")
@@ -56,6 +132,10 @@ async def add_process_time_header(request: Request, call_next):
     """
     Middleware to add response time headers and ensure sub-500ms responses.
     
+    Records the request in the per-route latency histogram and in-flight
+    gauge, labelled by route template rather than raw path. Sampled
+    requests are traced and get a per-stage Server-Timing header.
+    
     Args:
         request: The incoming request
         call_next: The next middleware/endpoint in the chain
@@ -63,20 +143,92 @@ async def add_process_time_header(request: Request, call_next):
     Returns:
         Response with timing headers
     """
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+    route = route_template(request)
+    in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(request.method, route)
+    in_progress.inc()
+    status_code = 500
+    start_time = time.perf_counter()
+    with trace_request(request, route) as request_trace:
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            process_time = time.perf_counter() - start_time
+            in_progress.dec()
+            HTTP_REQUEST_DURATION.labels(request.method, route, str(status_code)).observe(process_time)
+            if request_trace is not None:
+                request_trace.span.set_attribute("http.status_code", status_code)
     
+    first_response = record_startup_stage("first_response")
+    if first_response is not None:
+        logger.info("First response", extra={"route": route, "uptime_seconds": round(first_response, 3)})
+
     # Add response time header
     response.headers["X-Process-Time"] = str(process_time)
+    if request_trace is not None:
+        response.headers["Server-Timing"] = request_trace.server_timing(process_time)
     
     # Log slow responses (webhook should be under 500ms)
     if process_time > settings.WEBHOOK_TIMEOUT_SECONDS:
-        print(f"⚠️  Slow response: {process_time:.3f}s for {request.url.path}")
+        logger.warning(
+            "Slow response",
+            extra={"path": request.url.path, "route": route, "duration_seconds": round(process_time, 3)}
+        )
     
     return response
 
 
+# Prometheus metrics
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """
+        Expose metrics in the Prometheus text format.
+        
+        Returns:
+            Response with request, database and cache metrics
+        """
+        body, content_type = render_metrics()
+        return Response(content=body, headers={"Content-Type": content_type})
+
+
+# Readiness probe
+@app.get("/ready")
+async def readiness():
+    """
+    Report whether the service can reach the database.
+    
+    Runs a cheap query through the shared connection pool and reports the
+    pool's and the database circuit breaker's state alongside it. While
+    the breaker is open the probe fails fast and the service reports 503.
+    
+    Returns:
+        Readiness status with probe latency, pool and breaker state (503 if unreachable)
+    """
+    db_client = get_db_client()
+    try:
+        latency = await db_client.ping()
+    except Exception as e:
+        return ORJSONResponse(
+            status_code=503,
+            content={
+                "status": "unavailable",
+                "error": str(e),
+                "pool": db_client.pool_state(),
+                "circuit_breaker": db_client.breaker.stats() if db_client.breaker else None,
+                "timestamp": time.time()
+            },
+        )
+    
+    return {
+        "status": "ready",
+        "db_latency_ms": round(latency * 1000, 2),
+        "pool": db_client.pool_state(),
+        "circuit_breaker": db_client.breaker.stats() if db_client.breaker else None,
+        "timestamp": time.time()
+    }
+
+
 # Global exception handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -90,14 +242,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     Returns:
         JSON response with validation error details
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={
             "status": "error",
             "error": {
                 "code": "VALIDATION_ERROR",
                 "message": "Request validation failed",
-                "details": exc.errors()
+                "details": jsonable_encoder(exc.errors())
             },
             "timestamp": time.time()
         },
@@ -116,9 +268,13 @@ async def internal_server_error_handler(request: Request, exc: Exception):
     Returns:
         JSON response with error information
     """
-    print(f"💥 Internal server error on {request.url.path}: {str(exc)}")
+    logger.error(
+        "Internal server error",
+        extra={"path": request.url.path},
+        exc_info=(type(exc), exc, exc.__traceback__)
+    )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "status": "error",
@@ -133,10 +289,14 @@ async def internal_server_error_handler(request: Request, exc: Exception):
 
 # Initialize API routes
 initialize_v1_routes(app)
+record_startup_stage("imported")
 
 
 if __name__ == "__main__":
     """Run the application with Uvicorn when executed directly."""
+    # Only needed here; servers that import main:app bring their own
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
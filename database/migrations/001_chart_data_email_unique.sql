@@ -0,0 +1,23 @@
+-- =============================================================================
+-- MIGRATION 001: UNIQUE EMAIL ON CHART_DATA
+-- =============================================================================
+-- Makes chart_data.email a unique key so saves can use a single
+-- INSERT ... ON CONFLICT (email) upsert instead of a read followed by an
+-- update or insert. Run once against databases created from an older
+-- schema.sql; fresh installs already include the constraint.
+
+BEGIN;
+
+-- Keep only the most recently updated row for any duplicated email
+DELETE FROM public.chart_data AS c
+USING public.chart_data AS newer
+WHERE c.email = newer.email
+  AND (c.updated_at, c.id) < (newer.updated_at, newer.id);
+
+ALTER TABLE public.chart_data
+    ADD CONSTRAINT chart_data_email_key UNIQUE (email);
+
+-- The unique constraint's index replaces the plain email index
+DROP INDEX IF EXISTS public.idx_chart_data_email;
+
+COMMIT;
@@ -0,0 +1,53 @@
+-- =============================================================================
+-- MIGRATION 002: SERVER-SIDE MERGE PATCH FOR CHART_DATA
+-- =============================================================================
+-- Adds an RFC 7396 JSON Merge Patch function for jsonb and an RPC that
+-- applies a patch to one user's chart_data in place, so partial updates
+-- do not send or rewrite the whole document from the API server.
+-- p_expected_updated_at enables optimistic concurrency: the update only
+-- applies while the row still carries the version the client read.
+
+CREATE OR REPLACE FUNCTION public.jsonb_merge_patch(target jsonb, patch jsonb)
+RETURNS jsonb AS $$
+DECLARE
+    result jsonb;
+    item record;
+BEGIN
+    IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+        RETURN patch;
+    END IF;
+
+    IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+        result := '{}'::jsonb;
+    ELSE
+        result := target;
+    END IF;
+
+    FOR item IN SELECT key, value FROM jsonb_each(patch) LOOP
+        IF jsonb_typeof(item.value) = 'null' THEN
+            result := result - item.key;
+        ELSE
+            result := jsonb_set(
+                result,
+                ARRAY[item.key],
+                public.jsonb_merge_patch(result -> item.key, item.value)
+            );
+        END IF;
+    END LOOP;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.merge_patch_chart_data(
+    p_email TEXT,
+    p_patch JSONB,
+    p_expected_updated_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS TABLE (updated_at TIMESTAMP WITH TIME ZONE) AS $$
+    UPDATE public.chart_data AS c
+    SET chart_data = public.jsonb_merge_patch(c.chart_data, p_patch)
+    WHERE c.email = p_email
+      AND (p_expected_updated_at IS NULL OR c.updated_at = p_expected_updated_at)
+    RETURNING c.updated_at;
+$$ LANGUAGE sql;
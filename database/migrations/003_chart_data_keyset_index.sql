@@ -0,0 +1,12 @@
+-- =============================================================================
+-- MIGRATION 003: KEYSET PAGINATION INDEX FOR CHART_DATA
+-- =============================================================================
+-- The admin user listing pages through chart_data ordered by
+-- (updated_at, id). A composite index lets every page start with an index
+-- seek instead of scanning and sorting the table. It also serves the
+-- queries the single-column updated_at index was used for.
+
+CREATE INDEX IF NOT EXISTS idx_chart_data_updated_at_id
+    ON public.chart_data(updated_at, id);
+
+DROP INDEX IF EXISTS public.idx_chart_data_updated_at;
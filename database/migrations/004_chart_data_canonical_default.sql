@@ -0,0 +1,14 @@
+-- =============================================================================
+-- MIGRATION 004: CANONICAL CHART_DATA DEFAULT
+-- =============================================================================
+-- Aligns the chart_data column default with the dataset the API serves to
+-- users without saved data. Generated from backend/core/defaults.py with
+-- `python -m core.defaults`; regenerate it whenever that dataset changes.
+
+ALTER TABLE public.chart_data ALTER COLUMN chart_data SET DEFAULT '{
+    "daily_call_volume": [45, 52, 48, 61, 55, 67, 59],
+    "average_call_duration": [120, 135, 142, 128, 151, 139, 145],
+    "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
+    "agent_performance": [{"name": "Agent Alpha", "calls": 245, "rating": 4.8}, {"name": "Agent Beta", "calls": 189, "rating": 4.6}, {"name": "Agent Gamma", "calls": 167, "rating": 4.7}, {"name": "Agent Delta", "calls": 203, "rating": 4.5}],
+    "conversion_rate": [72, 68, 75, 71, 79, 74, 77]
+}'::jsonb;
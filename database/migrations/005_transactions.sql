@@ -0,0 +1,25 @@
+-- =============================================================================
+-- MIGRATION 005: TRANSACTIONS TABLE FOR WEBHOOK PROCESSING
+-- =============================================================================
+-- POST /v1/webhook/transaction queues transactions for background
+-- processing; the workers record each one here once processed (or failed)
+-- and GET /v1/status/{transaction_id} reads it back. Only the backend's
+-- service role may access the table.
+
+CREATE TABLE IF NOT EXISTS public.transactions (
+    id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    transaction_id VARCHAR(128) NOT NULL UNIQUE,
+    source_account VARCHAR(128) NOT NULL,
+    destination_account VARCHAR(128) NOT NULL,
+    amount NUMERIC(18, 2) NOT NULL CHECK (amount > 0),
+    currency CHAR(3) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'PROCESSING'
+        CHECK (status IN ('PROCESSING', 'PROCESSED', 'FAILED')),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    processed_at TIMESTAMP WITH TIME ZONE
+);
+
+ALTER TABLE public.transactions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can access all transactions" ON public.transactions
+    FOR ALL USING (current_setting('role') = 'service_role');
@@ -0,0 +1,37 @@
+-- =============================================================================
+-- MIGRATION 006: PACKED TIME SERIES FOR CHART_DATA
+-- =============================================================================
+-- Numeric series (daily_call_volume, average_call_duration, conversion_rate)
+-- move out of the chart_data document into a series column. Each series is
+-- stored as a base64 string of a delta-encoded, zlib-compressed typed array
+-- (see backend/core/series.py). Long series then take a fraction of their
+-- JSON size, and neither Postgres nor the API parses them point by point.
+-- Existing rows keep their JSON arrays until their next write; the backend
+-- reads both forms.
+--
+-- merge_patch_chart_data gains p_series, a merge patch for the series column.
+-- The old three-argument function is dropped first so calls with named
+-- arguments stay unambiguous.
+
+ALTER TABLE public.chart_data
+    ADD COLUMN IF NOT EXISTS series JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+DROP FUNCTION IF EXISTS public.merge_patch_chart_data(TEXT, JSONB, TIMESTAMP WITH TIME ZONE);
+
+CREATE OR REPLACE FUNCTION public.merge_patch_chart_data(
+    p_email TEXT,
+    p_patch JSONB,
+    p_expected_updated_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_series JSONB DEFAULT NULL
+)
+RETURNS TABLE (updated_at TIMESTAMP WITH TIME ZONE) AS $$
+    UPDATE public.chart_data AS c
+    SET chart_data = public.jsonb_merge_patch(c.chart_data, p_patch),
+        series = CASE
+            WHEN p_series IS NULL THEN c.series
+            ELSE public.jsonb_merge_patch(c.series, p_series)
+        END
+    WHERE c.email = p_email
+      AND (p_expected_updated_at IS NULL OR c.updated_at = p_expected_updated_at)
+    RETURNING c.updated_at;
+$$ LANGUAGE sql;
@@ -27,48 +27,43 @@ CREATE INDEX IF NOT EXISTS idx_users_created_at ON public.users(created_at);
 -- Stores user's customized chart data and dashboard preferences
 CREATE TABLE IF NOT EXISTS public.chart_data (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
-    email VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    -- Generated from backend/core/defaults.py (python -m core.defaults)
     chart_data JSONB NOT NULL DEFAULT '{
-        "daily_call_volume": [120, 132, 101, 134, 90, 230, 210],
-        "call_sentiment": {
-            "positive": 65,
-            "neutral": 25,
-            "negative": 10
-        },
-        "agent_performance": [
-            {"name": "Agent A", "calls": 45, "satisfaction": 4.8},
-            {"name": "Agent B", "calls": 38, "satisfaction": 4.6},
-            {"name": "Agent C", "calls": 52, "satisfaction": 4.9},
-            {"name": "Agent D", "calls": 41, "satisfaction": 4.7}
-        ],
-        "average_call_duration": [185, 190, 175, 188, 195, 182, 178],
-        "conversion_rate": [68, 72, 65, 78, 81, 75, 73],
-        "call_types": {
-            "inbound": 60,
-            "outbound": 40
-        },
-        "peak_hours": [
-            {"hour": "9 AM", "calls": 45},
-            {"hour": "10 AM", "calls": 38},
-            {"hour": "11 AM", "calls": 52},
-            {"hour": "2 PM", "calls": 41},
-            {"hour": "3 PM", "calls": 49},
-            {"hour": "4 PM", "calls": 35}
-        ]
+        "daily_call_volume": [45, 52, 48, 61, 55, 67, 59],
+        "average_call_duration": [120, 135, 142, 128, 151, 139, 145],
+        "call_sentiment": {"positive": 68, "neutral": 24, "negative": 8},
+        "agent_performance": [{"name": "Agent Alpha", "calls": 245, "rating": 4.8}, {"name": "Agent Beta", "calls": 189, "rating": 4.6}, {"name": "Agent Gamma", "calls": 167, "rating": 4.7}, {"name": "Agent Delta", "calls": 203, "rating": 4.5}],
+        "conversion_rate": [72, 68, 75, 71, 79, 74, 77]
     }'::jsonb,
+    -- Packed numeric series by field name (see backend/core/series.py)
+    series JSONB NOT NULL DEFAULT '{}'::jsonb,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
 );
 
 -- Add indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_chart_data_email ON public.chart_data(email);
-CREATE INDEX IF NOT EXISTS idx_chart_data_updated_at ON public.chart_data(updated_at);
+-- (email is covered by the index backing its UNIQUE constraint)
+CREATE INDEX IF NOT EXISTS idx_chart_data_updated_at_id ON public.chart_data(updated_at, id);
 
 -- =============================================================================
--- TRANSACTIONS TABLE - REMOVED
+-- TRANSACTIONS TABLE
 -- =============================================================================
--- This table has been removed as transaction/webhook functionality is no longer needed
--- Keeping only users and chart_data tables for the chart data service
+-- Stores transactions received through POST /v1/webhook/transaction once the
+-- background workers have processed them
+CREATE TABLE IF NOT EXISTS public.transactions (
+    id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    transaction_id VARCHAR(128) NOT NULL UNIQUE,
+    source_account VARCHAR(128) NOT NULL,
+    destination_account VARCHAR(128) NOT NULL,
+    amount NUMERIC(18, 2) NOT NULL CHECK (amount > 0),
+    currency CHAR(3) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'PROCESSING'
+        CHECK (status IN ('PROCESSING', 'PROCESSED', 'FAILED')),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    processed_at TIMESTAMP WITH TIME ZONE
+);
+-- (transaction_id is covered by the index backing its UNIQUE constraint)
 
 -- =============================================================================
 -- UPDATED_AT TRIGGER FUNCTION
@@ -89,12 +84,68 @@ CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON public.users
 CREATE TRIGGER update_chart_data_updated_at BEFORE UPDATE ON public.chart_data
     FOR EACH ROW EXECUTE PROCEDURE update_updated_at_column();
 
+-- =============================================================================
+-- CHART_DATA MERGE PATCH FUNCTIONS
+-- =============================================================================
+-- Apply RFC 7396 merge patches to chart_data in place (see
+-- migrations/002_chart_data_merge_patch.sql and 006_chart_data_series.sql)
+CREATE OR REPLACE FUNCTION public.jsonb_merge_patch(target jsonb, patch jsonb)
+RETURNS jsonb AS $$
+DECLARE
+    result jsonb;
+    item record;
+BEGIN
+    IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+        RETURN patch;
+    END IF;
+
+    IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+        result := '{}'::jsonb;
+    ELSE
+        result := target;
+    END IF;
+
+    FOR item IN SELECT key, value FROM jsonb_each(patch) LOOP
+        IF jsonb_typeof(item.value) = 'null' THEN
+            result := result - item.key;
+        ELSE
+            result := jsonb_set(
+                result,
+                ARRAY[item.key],
+                public.jsonb_merge_patch(result -> item.key, item.value)
+            );
+        END IF;
+    END LOOP;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION public.merge_patch_chart_data(
+    p_email TEXT,
+    p_patch JSONB,
+    p_expected_updated_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_series JSONB DEFAULT NULL
+)
+RETURNS TABLE (updated_at TIMESTAMP WITH TIME ZONE) AS $$
+    UPDATE public.chart_data AS c
+    SET chart_data = public.jsonb_merge_patch(c.chart_data, p_patch),
+        series = CASE
+            WHEN p_series IS NULL THEN c.series
+            ELSE public.jsonb_merge_patch(c.series, p_series)
+        END
+    WHERE c.email = p_email
+      AND (p_expected_updated_at IS NULL OR c.updated_at = p_expected_updated_at)
+    RETURNING c.updated_at;
+$$ LANGUAGE sql;
+
 -- =============================================================================
 -- ROW LEVEL SECURITY (RLS) POLICIES
 -- =============================================================================
 -- Enable RLS on tables for security
 ALTER TABLE public.users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.chart_data ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.transactions ENABLE ROW LEVEL SECURITY;
 
 -- Users can only access their own data
 CREATE POLICY "Users can view own data" ON public.users
@@ -120,6 +171,10 @@ CREATE POLICY "Service role can access all users" ON public.users
 CREATE POLICY "Service role can access all chart data" ON public.chart_data
     FOR ALL USING (current_setting('role') = 'service_role');
 
+-- Transactions are only accessed by the backend
+CREATE POLICY "Service role can access all transactions" ON public.transactions
+    FOR ALL USING (current_setting('role') = 'service_role');
+
 -- =============================================================================
 -- INSERT SAMPLE DATA
 -- =============================================================================
@@ -132,7 +187,7 @@ ON CONFLICT (email) DO NOTHING;
 INSERT INTO public.chart_data (email) VALUES
     ('demo@example.com'),
     ('test@walnut.com')
-ON CONFLICT DO NOTHING;
+ON CONFLICT (email) DO NOTHING;
 
 -- =============================================================================
 -- VERIFICATION QUERIES
@@ -143,11 +198,12 @@ ON CONFLICT DO NOTHING;
 SELECT schemaname, tablename, tableowner
 FROM pg_tables
 WHERE schemaname = 'public'
-AND tablename IN ('users', 'chart_data');
+AND tablename IN ('users', 'chart_data', 'transactions');
 
 -- Check table structures
 \d public.users;
 \d public.chart_data;
+\d public.transactions;
 
 -- Check sample data
 SELECT COUNT(*) as user_count FROM public.users;